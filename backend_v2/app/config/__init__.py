@@ -1,6 +1,6 @@
 """
 配置管理模块
-负责加载提示词和AI配置
+负责加载提示词、AI配置、出价规则和搜索词组合规则
 """
 
 import os
@@ -59,6 +59,7 @@ def get_default_ai_config() -> dict:
             "deepseek": {
                 "api_key_env": "DEEPSEEK_API_KEY",
                 "api_base": "https://api.deepseek.com/v1",
+                "api_base_env": "DEEPSEEK_API_BASE",
                 "model": "deepseek-chat",
                 "max_tokens": 4000,
                 "timeout": 90,
@@ -68,3 +69,80 @@ def get_default_ai_config() -> dict:
         "active_provider": "deepseek",
         "prompt_version": "v1"
     }
+
+
+def load_bid_rules() -> dict:
+    """
+    加载关键词出价规则表
+
+    Returns:
+        规则字典（配置文件不存在时返回默认规则）
+    """
+    config_dir = Path(__file__).parent
+    config_file = config_dir / "bid_rules.yaml"
+
+    if not config_file.exists():
+        return get_default_bid_rules()
+
+    with open(config_file, 'r', encoding='utf-8') as f:
+        return yaml.safe_load(f)
+
+
+def get_default_bid_rules() -> dict:
+    """
+    获取默认出价规则（当配置文件不存在时使用）
+
+    Returns:
+        默认规则字典
+    """
+    return {
+        "stars_source": "min",
+        "stars_multipliers": {1: 0.6, 2: 0.8, 3: 1.0, 4: 1.15, 5: 1.3},
+        "length_rules": [
+            {"max_length": 20, "multiplier": 1.1},
+            {"max_length": 40, "multiplier": 1.0},
+            {"max_length": 60, "multiplier": 0.9},
+            {"max_length": None, "multiplier": 0.8}
+        ],
+        "match_type_multipliers": {"Broad": 1.0, "Phrase": 1.1, "Exact": 1.25},
+        "min_bid": 0.02,
+        "max_bid": 20.0,
+        "bid_increment": 0.01
+    }
+
+
+def load_search_term_rules() -> dict:
+    """
+    加载搜索词组合规则
+
+    Returns:
+        规则字典（配置文件不存在时返回默认规则）
+    """
+    config_dir = Path(__file__).parent
+    config_file = config_dir / "search_term_rules.yaml"
+
+    if not config_file.exists():
+        return get_default_search_term_rules()
+
+    with open(config_file, 'r', encoding='utf-8') as f:
+        return yaml.safe_load(f)
+
+
+def get_default_search_term_rules() -> dict:
+    """
+    获取默认搜索词组合规则（当配置文件不存在时使用）
+
+    Returns:
+        默认规则字典
+    """
+    return {
+        "scoring": {
+            "stars_weight": 1.0,
+            "recommended_bonus": 1.0,
+            "length_penalty": 2.0
+        },
+        "combination": {
+            "default_category": "other",
+            "attribute_categories": []
+        }
+    }
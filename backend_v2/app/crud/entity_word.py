@@ -230,3 +230,28 @@ def get_all_entity_words(db: Session, task_id: str) -> List[EntityWord]:
         EntityWord.task_id == task_id,
         EntityWord.is_deleted == False
     ).all()
+
+
+def get_entity_words_for_tasks(db: Session, task_ids: List[str]) -> Dict[str, List[str]]:
+    """
+    批量获取多个任务的本体词文本（单次查询，用于批量导出的 Negative Keyword）
+
+    Args:
+        db: 数据库会话
+        task_ids: 任务ID列表
+
+    Returns:
+        {task_id: [entity_word, ...]}，按本体词ID排序
+    """
+    if not task_ids:
+        return {}
+
+    rows = db.query(EntityWord.task_id, EntityWord.entity_word).filter(
+        EntityWord.task_id.in_(task_ids),
+        EntityWord.is_deleted == False
+    ).order_by(EntityWord.task_id, EntityWord.id).all()
+
+    words_by_task: Dict[str, List[str]] = {}
+    for task_id, entity_word in rows:
+        words_by_task.setdefault(task_id, []).append(entity_word)
+    return words_by_task
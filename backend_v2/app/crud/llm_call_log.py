@@ -0,0 +1,112 @@
+"""
+LLMCallLog CRUD 操作
+LLM 调用记录的批量写入和汇总统计
+"""
+
+from datetime import datetime
+from typing import Dict, List, Optional
+
+import numpy as np
+from sqlalchemy.orm import Session
+
+from app.models_db import LLMCallLog
+
+
+def create_llm_call_logs(db: Session, records: List[Dict]) -> int:
+    """
+    批量写入 LLM 调用记录
+
+    Args:
+        db: 数据库会话
+        records: LLMCall.to_record 的结果列表
+
+    Returns:
+        写入的数量
+    """
+    db.bulk_insert_mappings(LLMCallLog, records)
+    db.commit()
+    return len(records)
+
+
+def get_llm_call_stats(db: Session, since: Optional[datetime] = None, name: Optional[str] = None) -> List[Dict]:
+    """
+    按提示词名称、提示词版本、模型汇总 LLM 调用
+
+    Args:
+        db: 数据库会话
+        since: 只统计该时间之后的调用
+        name: 只统计指定提示词名称
+
+    Returns:
+        每组一条：调用数、结果分布、降级率和降级原因、重试次数、
+        总耗时分位数、平均首字节/请求/等待连接耗时、token 用量和缓存命中率
+    """
+    query = db.query(
+        LLMCallLog.name,
+        LLMCallLog.prompt_version,
+        LLMCallLog.model,
+        LLMCallLog.outcome,
+        LLMCallLog.attempts,
+        LLMCallLog.fallback_reason,
+        LLMCallLog.queue_wait_ms,
+        LLMCallLog.ttfb_ms,
+        LLMCallLog.request_ms,
+        LLMCallLog.total_ms,
+        LLMCallLog.prompt_tokens,
+        LLMCallLog.completion_tokens,
+        LLMCallLog.cached_tokens,
+        LLMCallLog.cassette_mode
+    )
+    if since is not None:
+        query = query.filter(LLMCallLog.created_at >= since)
+    if name:
+        query = query.filter(LLMCallLog.name == name)
+
+    groups: Dict[tuple, List] = {}
+    for row in query.all():
+        groups.setdefault((row.name, row.prompt_version, row.model), []).append(row)
+
+    def mean(values) -> Optional[float]:
+        values = [value for value in values if value is not None]
+        return round(float(np.mean(values)), 2) if values else None
+
+    results = []
+    for (group_name, prompt_version, model), rows in sorted(groups.items()):
+        calls = len(rows)
+        outcomes: Dict[str, int] = {}
+        fallback_reasons: Dict[str, int] = {}
+        cassette_modes: Dict[str, int] = {}
+        for row in rows:
+            outcomes[row.outcome] = outcomes.get(row.outcome, 0) + 1
+            cassette_modes[row.cassette_mode] = cassette_modes.get(row.cassette_mode, 0) + 1
+            if row.fallback_reason:
+                fallback_reasons[row.fallback_reason] = fallback_reasons.get(row.fallback_reason, 0) + 1
+
+        total_ms = np.array([row.total_ms for row in rows], dtype=np.float64)
+        p50, p95, p99 = np.percentile(total_ms, [50, 95, 99])
+        prompt_tokens = sum(row.prompt_tokens for row in rows)
+        cached_tokens = sum(row.cached_tokens for row in rows)
+
+        results.append({
+            "name": group_name,
+            "prompt_version": prompt_version,
+            "model": model,
+            "calls": calls,
+            "outcomes": outcomes,
+            "fallback_rate": round(outcomes.get("fallback", 0) / calls, 4),
+            "fallback_reasons": dict(sorted(fallback_reasons.items(), key=lambda item: -item[1])),
+            "retries": sum(max(row.attempts - 1, 0) for row in rows),
+            "cassette_modes": cassette_modes,
+            "total_ms": {"p50": round(p50, 2), "p95": round(p95, 2), "p99": round(p99, 2), "mean": mean(total_ms)},
+            "avg_ttfb_ms": mean(row.ttfb_ms for row in rows),
+            "avg_request_ms": mean(row.request_ms for row in rows),
+            "avg_queue_wait_ms": mean(row.queue_wait_ms for row in rows),
+            "tokens": {
+                "prompt": prompt_tokens,
+                "completion": sum(row.completion_tokens for row in rows),
+                "cached": cached_tokens,
+                "cache_hit_ratio": round(cached_tokens / prompt_tokens, 4) if prompt_tokens else 0.0,
+                "avg_prompt_per_call": round(prompt_tokens / calls, 1)
+            }
+        })
+    return results
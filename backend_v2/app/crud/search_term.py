@@ -6,7 +6,7 @@ SearchTerm CRUD 操作
 from sqlalchemy.orm import Session
 from sqlalchemy import and_, delete as sql_delete
 from typing import List, Dict, Tuple, Optional
-from app.models_db import SearchTerm
+from app.models_db import SearchTerm, SearchTermPerformance, TaskAttribute, EntityWord
 
 
 def create_search_terms_batch(db: Session, task_id: str, search_terms: List[Dict]) -> int:
@@ -177,10 +177,20 @@ def delete_existing_search_terms(db: Session, task_id: str) -> None:
     """
     实现幂等操作：删除现有搜索词
 
-    1. 物理删除已软删除的记录
+    1. 物理删除已软删除的记录（连同其广告表现数据）
     2. 软删除现有有效记录
     """
     # 1. 物理删除已软删除的记录
+    # SQLite 默认不启用外键约束，ondelete="CASCADE" 不生效，表现数据需要显式删除
+    deleted_ids = db.query(SearchTerm.id).filter(
+        SearchTerm.task_id == task_id,
+        SearchTerm.is_deleted == True
+    )
+    db.execute(
+        sql_delete(SearchTermPerformance).where(
+            SearchTermPerformance.search_term_id.in_(deleted_ids.scalar_subquery())
+        )
+    )
     db.execute(
         sql_delete(SearchTerm).where(
             and_(
@@ -232,3 +242,98 @@ def get_valid_search_terms(db: Session, task_id: str) -> List[SearchTerm]:
         SearchTerm.is_valid == True,
         SearchTerm.is_deleted == False
     ).all()
+
+
+def get_valid_search_terms_for_tasks(db: Session, task_ids: List[str]) -> Dict[str, List[str]]:
+    """
+    批量获取多个任务的有效搜索词文本（单次查询，用于批量导出）
+
+    Args:
+        db: 数据库会话
+        task_ids: 任务ID列表
+
+    Returns:
+        {task_id: [term, ...]}，按搜索词ID排序；没有有效搜索词的任务不出现在结果中
+    """
+    if not task_ids:
+        return {}
+
+    rows = db.query(SearchTerm.task_id, SearchTerm.term).filter(
+        SearchTerm.task_id.in_(task_ids),
+        SearchTerm.is_valid == True,
+        SearchTerm.is_deleted == False
+    ).order_by(SearchTerm.task_id, SearchTerm.id).all()
+
+    terms_by_task: Dict[str, List[str]] = {}
+    for task_id, term in rows:
+        terms_by_task.setdefault(task_id, []).append(term)
+    return terms_by_task
+
+
+def get_valid_search_term_features(db: Session, task_id: str) -> List[Tuple[str, int, int, int]]:
+    """
+    获取有效搜索词及其出价特征（单次 JOIN 查询，用于按规则计算出价）
+
+    Args:
+        db: 数据库会话
+        task_id: 任务ID
+
+    Returns:
+        [(term, length, 属性词星级, 本体词星级), ...]，按搜索词ID排序
+    """
+    rows = db.query(
+        SearchTerm.term,
+        SearchTerm.length,
+        TaskAttribute.search_value_stars,
+        EntityWord.search_value_stars
+    ).join(
+        TaskAttribute, SearchTerm.attribute_id == TaskAttribute.id
+    ).join(
+        EntityWord, SearchTerm.entity_word_id == EntityWord.id
+    ).filter(
+        SearchTerm.task_id == task_id,
+        SearchTerm.is_valid == True,
+        SearchTerm.is_deleted == False
+    ).order_by(SearchTerm.id).all()
+
+    return [tuple(row) for row in rows]
+
+
+def get_valid_search_term_features_for_tasks(
+    db: Session,
+    task_ids: List[str]
+) -> Dict[str, List[Tuple[str, int, int, int]]]:
+    """
+    批量获取多个任务的有效搜索词及其出价特征（单次 JOIN 查询，用于批量导出按规则出价）
+
+    Args:
+        db: 数据库会话
+        task_ids: 任务ID列表
+
+    Returns:
+        {task_id: [(term, length, 属性词星级, 本体词星级), ...]}，按搜索词ID排序；
+        没有有效搜索词的任务不出现在结果中
+    """
+    if not task_ids:
+        return {}
+
+    rows = db.query(
+        SearchTerm.task_id,
+        SearchTerm.term,
+        SearchTerm.length,
+        TaskAttribute.search_value_stars,
+        EntityWord.search_value_stars
+    ).join(
+        TaskAttribute, SearchTerm.attribute_id == TaskAttribute.id
+    ).join(
+        EntityWord, SearchTerm.entity_word_id == EntityWord.id
+    ).filter(
+        SearchTerm.task_id.in_(task_ids),
+        SearchTerm.is_valid == True,
+        SearchTerm.is_deleted == False
+    ).order_by(SearchTerm.task_id, SearchTerm.id).all()
+
+    features_by_task: Dict[str, List[Tuple[str, int, int, int]]] = {}
+    for task_id, *features in rows:
+        features_by_task.setdefault(task_id, []).append(tuple(features))
+    return features_by_task
@@ -0,0 +1,102 @@
+"""
+SearchTermPerformance CRUD 操作
+搜索词广告表现（Search Term Report 汇总结果）的数据库增删改查
+"""
+
+from sqlalchemy.orm import Session
+from sqlalchemy import case, delete as sql_delete
+from typing import List, Dict, Tuple, Optional
+from app.models_db import SearchTerm, SearchTermPerformance
+
+
+def get_search_term_index(db: Session, task_id: str) -> List[Tuple[int, str]]:
+    """
+    获取任务的有效搜索词（用于关联 Search Term Report）
+
+    Returns:
+        [(search_term_id, term), ...]，按搜索词ID排序
+    """
+    rows = db.query(SearchTerm.id, SearchTerm.term).filter(
+        SearchTerm.task_id == task_id,
+        SearchTerm.is_valid == True,
+        SearchTerm.is_deleted == False
+    ).order_by(SearchTerm.id).all()
+    return [tuple(row) for row in rows]
+
+
+def replace_search_term_performance(db: Session, task_id: str, records: List[Dict]) -> int:
+    """
+    替换任务的搜索词表现数据（每次导入报告覆盖上一次的结果）
+
+    Args:
+        db: 数据库会话
+        task_id: 任务ID
+        records: 每个搜索词一条，包含 search_term_id / impressions / clicks / spend / orders / sales / label
+
+    Returns:
+        写入的数量
+    """
+    db.execute(
+        sql_delete(SearchTermPerformance).where(SearchTermPerformance.task_id == task_id)
+    )
+    db.bulk_insert_mappings(
+        SearchTermPerformance,
+        [{**record, "task_id": task_id} for record in records]
+    )
+    db.commit()
+    return len(records)
+
+
+def get_search_terms_by_performance(
+    db: Session,
+    task_id: str,
+    page: int = 1,
+    page_size: int = 20,
+    label: Optional[str] = None
+) -> Tuple[List[Tuple[SearchTerm, Optional[SearchTermPerformance]]], int]:
+    """
+    按表现排序分页查询搜索词（包含报告中没有数据的搜索词）
+
+    排序：winner → neutral → 无数据 → low_performer，同一标签内按销售额、订单数、点击数降序
+
+    Args:
+        db: 数据库会话
+        task_id: 任务ID
+        page: 页码（从1开始）
+        page_size: 每页数量
+        label: 按表现标签过滤（winner / neutral / low_performer / no_data）
+
+    Returns:
+        ([(search_term, performance 或 None), ...], total_count)
+    """
+    query = db.query(SearchTerm, SearchTermPerformance).outerjoin(
+        SearchTermPerformance, SearchTermPerformance.search_term_id == SearchTerm.id
+    ).filter(
+        SearchTerm.task_id == task_id,
+        SearchTerm.is_valid == True,
+        SearchTerm.is_deleted == False
+    )
+
+    if label == "no_data":
+        query = query.filter(SearchTermPerformance.id == None)
+    elif label:
+        query = query.filter(SearchTermPerformance.label == label)
+
+    total_count = query.count()
+
+    label_order = case(
+        (SearchTermPerformance.label == "winner", 0),
+        (SearchTermPerformance.label == "neutral", 1),
+        (SearchTermPerformance.label == "low_performer", 3),
+        else_=2
+    )
+    offset = (page - 1) * page_size
+    rows = query.order_by(
+        label_order,
+        SearchTermPerformance.sales.desc(),
+        SearchTermPerformance.orders.desc(),
+        SearchTermPerformance.clicks.desc(),
+        SearchTerm.id.asc()
+    ).offset(offset).limit(page_size).all()
+
+    return [tuple(row) for row in rows], total_count
@@ -4,7 +4,7 @@ Task CRUD操作
 
 from sqlalchemy.orm import Session
 from app.models_db import Task
-from typing import Optional
+from typing import List, Optional
 
 
 def create_task(
@@ -149,3 +149,19 @@ def get_product_info(db: Session, task_id: str) -> Optional[dict]:
         "asin": task.asin,
         "model": task.model
     }
+
+
+def get_tasks_by_ids(db: Session, task_ids: List[str]) -> List[Task]:
+    """
+    批量获取任务（单次查询，用于批量导出）
+
+    Args:
+        db: 数据库Session
+        task_ids: 任务ID列表
+
+    Returns:
+        存在的Task对象列表（顺序不保证，不存在的ID被忽略）
+    """
+    if not task_ids:
+        return []
+    return db.query(Task).filter(Task.task_id.in_(task_ids)).all()
@@ -3,11 +3,14 @@
 支持PostgreSQL和SQLite
 """
 
+import logging
 import os
 from sqlalchemy import create_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 
+logger = logging.getLogger(__name__)
+
 # 从环境变量获取数据库URL
 # 注意：Replit Secrets 会自动注入为系统环境变量，不需要 load_dotenv()
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./bulksheet.db")
@@ -66,4 +69,4 @@ def init_db():
 
     # 创建所有表
     Base.metadata.create_all(bind=engine)
-    print("✅ 数据库表初始化完成")
+    logger.info("数据库表初始化完成")
@@ -3,13 +3,17 @@ DeepSeek API客户端
 处理AI生成请求
 """
 
+import logging
 import os
-import aiohttp
 from typing import List, Dict
 from dotenv import load_dotenv
 
+from app.services import llm_cassette, llm_telemetry
+
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
 DEEPSEEK_API_KEY = os.getenv("DEEPSEEK_API_KEY")
 DEEPSEEK_API_BASE = os.getenv("DEEPSEEK_API_BASE", "https://api.deepseek.com/v1")
 DEEPSEEK_MODEL = os.getenv("DEEPSEEK_MODEL", "deepseek-chat")
@@ -442,22 +446,24 @@ async def generate_attributes(concept: str) -> List[Dict[str, any]]:
 现在，针对属性词概念 "{concept}"，结合本体词 "phone case"，生成完整的属性词扩展列表！
 """
 
-    try:
-        # 检查环境变量
-        if not DEEPSEEK_API_KEY:
-            print("❌ 错误：DEEPSEEK_API_KEY 未配置")
-            return get_fallback_attributes(concept)
+    with llm_telemetry.track_call("attribute_expert", "deepseek_client", DEEPSEEK_MODEL, "legacy") as call:
+        try:
+            # 检查环境变量（回放录制的响应时不需要）
+            if not DEEPSEEK_API_KEY and not llm_cassette.cassette.replaying:
+                logger.error("DEEPSEEK_API_KEY 未配置，使用备用属性词")
+                call.fallback("no_api_key")
+                return get_fallback_attributes(concept)
 
-        print(f"🔵 调用 DeepSeek API，概念: {concept}")
+            logger.info("调用 DeepSeek API，概念: %s", concept)
 
-        async with aiohttp.ClientSession() as session:
-            async with session.post(
+            status, body = await llm_cassette.chat_completion(
+                "attribute_expert",
                 f"{DEEPSEEK_API_BASE}/chat/completions",
                 headers={
                     "Authorization": f"Bearer {DEEPSEEK_API_KEY}",
                     "Content-Type": "application/json"
                 },
-                json={
+                payload={
                     "model": DEEPSEEK_MODEL,
                     "messages": [
                         {"role": "system", "content": "You are a helpful assistant that generates JSON."},
@@ -466,46 +472,45 @@ async def generate_attributes(concept: str) -> List[Dict[str, any]]:
                     "temperature": 0.7,
                     "max_tokens": 4000
                 },
-                timeout=aiohttp.ClientTimeout(total=90)
-            ) as response:
-                print(f"🔵 DeepSeek API 响应状态码: {response.status}")
-
-                if response.status == 200:
-                    data = await response.json()
-                    print(f"🔵 API 返回数据结构: {list(data.keys())}")
-
-                    content = data["choices"][0]["message"]["content"]
-                    print(f"🔵 AI 返回内容前100字符: {content[:100]}...")
-
-                    # 解析JSON（去除markdown代码块）
-                    import json
-                    import re
-                    # 提取JSON部分
-                    json_match = re.search(r'```json\s*(.*?)\s*```', content, re.DOTALL)
-                    if json_match:
-                        content = json_match.group(1)
-                        print(f"🔵 提取JSON代码块成功")
-                    else:
-                        print(f"⚠️  未找到JSON代码块，直接解析内容")
-
-                    attributes = json.loads(content)
-                    print(f"✅ 成功解析JSON，属性词数量: {len(attributes)}")
-
-                    # 返回完整的8字段结构
-                    # 新格式包含: 序号, 原始属性词概念, 属性词, 词汇类型,
-                    # 中文翻译说明, 适用场景, 搜索价值, 推荐度
-                    return attributes
+                timeout=90
+            )
+            logger.debug("DeepSeek API 响应状态码: %s", status)
+
+            if status == 200:
+                import json
+                import re
+                data = json.loads(body)
+                logger.debug("API 返回数据结构: %s", list(data.keys()))
+
+                content = data["choices"][0]["message"]["content"]
+                logger.debug("AI 返回内容前100字符: %s...", content[:100])
+
+                # 解析JSON（去除markdown代码块）
+                # 提取JSON部分
+                json_match = re.search(r'```json\s*(.*?)\s*```', content, re.DOTALL)
+                if json_match:
+                    content = json_match.group(1)
+                    logger.debug("提取JSON代码块成功")
                 else:
-                    # API调用失败，返回备用结果
-                    error_text = await response.text()
-                    print(f"❌ API返回错误状态码 {response.status}: {error_text[:200]}")
-                    return get_fallback_attributes(concept)
-
-    except Exception as e:
-        import traceback
-        print(f"❌ DeepSeek API错误: {type(e).__name__}: {str(e)}")
-        print(f"❌ 错误堆栈: {traceback.format_exc()}")
-        return get_fallback_attributes(concept)
+                    logger.debug("未找到JSON代码块，直接解析内容")
+
+                attributes = json.loads(content)
+                logger.info("成功解析JSON，属性词数量: %d", len(attributes))
+
+                # 返回完整的8字段结构
+                # 新格式包含: 序号, 原始属性词概念, 属性词, 词汇类型,
+                # 中文翻译说明, 适用场景, 搜索价值, 推荐度
+                return attributes
+            else:
+                # API调用失败，返回备用结果
+                logger.error("API返回错误状态码 %s: %s", status, body[:200])
+                call.fallback(f"http_{status}")
+                return get_fallback_attributes(concept)
+
+        except Exception as e:
+            logger.exception("DeepSeek API错误: %s: %s", type(e).__name__, e)
+            call.fallback(f"{type(e).__name__}: {e}")
+            return get_fallback_attributes(concept)
 
 
 def get_fallback_attributes(concept: str) -> List[Dict[str, any]]:
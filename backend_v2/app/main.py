@@ -3,13 +3,18 @@ Bulksheet SaaS - Minimal FastAPI Application
 采用TDD方式，从最简单的功能开始
 """
 
-from fastapi import FastAPI, HTTPException, Depends
+from fastapi import FastAPI, HTTPException, Depends, File, Form, Header, Query, Response, UploadFile
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import StreamingResponse
+from fastapi.responses import FileResponse, ORJSONResponse, StreamingResponse
+from starlette.background import BackgroundTask
 from sqlalchemy.orm import Session
-from typing import Dict, List
-from datetime import datetime
+from pydantic import BaseModel, ValidationError
+from typing import Dict, List, Literal, Optional, Tuple, Union
+from datetime import datetime, timedelta, timezone
+from collections import Counter
 import uuid
+import asyncio
+import logging
 
 from app.models import (
     AttributeRequest,
@@ -20,7 +25,12 @@ from app.models import (
     ProductInfoRequest,
     ProductInfoResponse,
     ProductInfo,
-    ExportRequest
+    ExportRequest,
+    BidStrategy,
+    BatchExportItem,
+    BatchExportRequest,
+    BatchExportOutput,
+    BatchExportStatusResponse
 )
 from app.schemas.stage2 import (
     TaskDetailResponse,
@@ -37,6 +47,7 @@ from app.schemas.stage3 import (
     EntityWordListResponse,
     EntityWordSelectionRequest,
     EntityWordSelectionResponse,
+    SearchTermGenerateOptions,
     SearchTermGenerateRequest,
     SearchTermGenerateResponse,
     SearchTermListResponse,
@@ -45,22 +56,80 @@ from app.schemas.stage3 import (
     EntityWordItem,
     EntityWordMetadata,
     SearchTermItem,
-    SearchTermMetadata
+    SearchTermMetadata,
+    SearchTermReportResponse,
+    SearchTermPerformanceItem,
+    SearchTermPerformanceListResponse
 )
-from app.config import load_prompt, load_ai_config
+from app.config import load_prompt, load_ai_config, load_bid_rules, load_search_term_rules
 from app.services.deepseek_provider import DeepSeekProvider
 from app.services.entity_word_provider import EntityWordProvider
-from app.database import get_db, init_db
+from app.services.batch_export import BatchExportManager
+from app.services.llm_telemetry import telemetry_writer
+from app.services import columnar, compression
+from app.services.bid_engine import BidEngine
+from app.services.bulksheet_diff import (
+    BULKSHEET_IMPORT_MAX_BYTES,
+    BulksheetImportError,
+    diff_bulksheet,
+    normalize_keyword
+)
+from app.services.search_term_combiner import (
+    AttributeCategorizer,
+    SearchTermScorer,
+    iter_attribute_combinations,
+    iter_search_terms,
+    select_top_k,
+    select_top_k_combinations,
+    take_combinations
+)
+from app.services.search_term_report import (
+    SEARCH_TERM_REPORT_MAX_BYTES,
+    SearchTermReportError,
+    ingest_search_term_report
+)
+from app.services.export_cache import (
+    EXPORT_CACHE_ENABLED,
+    ExportCache,
+    compute_job_hash,
+    iter_file_chunks
+)
+from app.services.export_executor import (
+    ExportExecutor,
+    ExportQueueFullError,
+    ExportTimeoutError,
+    EXPORT_MAX_ROWS,
+    EXPORT_MAX_TOTAL_ROWS,
+    EXPORT_SHARD_MAX_BYTES,
+    attach_shards,
+    build_campaign,
+    build_export_job,
+    count_job_rows,
+    job_files,
+    plan_shards
+)
+from app.database import engine, get_db, init_db
 from app.crud import task as crud_task
 from app.crud import attribute as crud_attribute
 from app.crud import entity_word as crud_entity_word
 from app.crud import search_term as crud_search_term
+from app.crud import search_term_performance as crud_search_term_performance
+from app.crud import llm_call_log as crud_llm_call_log
+from app.observability import log_config, metrics, profiling, timing
+
+# 日志经队列由后台线程输出（JSON 格式，带请求 ID），需在其他模块输出日志前配置
+log_config.setup_logging()
+logger = logging.getLogger(__name__)
 
 app = FastAPI(
     title="Bulksheet SaaS",
     version="2.0.0",
-    description="AI-powered Amazon Advertising Bulksheet Generator"
+    description="AI-powered Amazon Advertising Bulksheet Generator",
+    # orjson 编码（万级搜索词列表的编码耗时远低于标准库 json，见 benchmarks/bench_responses.py）
+    default_response_class=ORJSONResponse
 )
+# 记录处理函数返回时间（Server-Timing 的 serialize 阶段），需在注册路由前设置
+app.router.route_class = timing.TimedRoute
 
 # ============ AI 服务初始化 ============
 
@@ -74,9 +143,9 @@ prompt_template = load_prompt("attribute_expert", version=prompt_version)
 
 # 初始化 AI 服务提供商（Stage 1 & 2）
 provider_config = ai_config["providers"][active_provider]
-ai_service = DeepSeekProvider(config=provider_config, prompt_template=prompt_template)
+ai_service = DeepSeekProvider(config=provider_config, prompt_template=prompt_template, prompt_version=prompt_version)
 
-print(f"✅ Stage 1 & 2 AI 服务已初始化: {active_provider}, 提示词版本: {prompt_version}")
+logger.info("Stage 1 & 2 AI 服务已初始化: %s, 提示词版本: %s", active_provider, prompt_version)
 
 # 初始化 Stage 3 AI 服务（本体词生成）
 import os
@@ -87,22 +156,45 @@ api_key_env = provider_config.get("api_key_env", "DEEPSEEK_API_KEY")
 deepseek_api_key = os.getenv(api_key_env)
 
 if not deepseek_api_key:
-    print(f"⚠️  警告：环境变量 {api_key_env} 未设置，Stage 3 AI 服务将使用降级策略")
+    logger.warning("环境变量 %s 未设置，Stage 3 AI 服务将使用降级策略", api_key_env)
 
 entity_word_service = EntityWordProvider(
     api_key=deepseek_api_key or "",
-    api_base=provider_config.get("api_base", "https://api.deepseek.com/v1"),
-    prompt_template=entity_word_prompt_template
+    api_base=ai_service.api_base,
+    prompt_template=entity_word_prompt_template,
+    prompt_version="v1"
 )
 
-print(f"✅ Stage 3 AI 服务已初始化: entity_word_expert_v1")
+logger.info("Stage 3 AI 服务已初始化: entity_word_expert_v1")
+
+# 初始化 Stage 4 导出执行器（渲染不占用事件循环）
+export_executor = ExportExecutor()
+batch_export_manager = BatchExportManager(export_executor)
+export_cache = ExportCache() if EXPORT_CACHE_ENABLED else None
+bid_engine = BidEngine(load_bid_rules())
+
+# 搜索词评分（Stage 3 top_k 模式）和属性词类别（多属性词组合）
+search_term_rules = load_search_term_rules()
+search_term_scorer = SearchTermScorer(search_term_rules.get("scoring", {}))
+attribute_categorizer = AttributeCategorizer(search_term_rules.get("combination", {}))
 
 # ============ 数据库初始化 ============
 
 @app.on_event("startup")
 async def startup_event():
-    """应用启动时初始化数据库"""
+    """应用启动时初始化数据库，启动 LLM 调用记录写入器"""
     init_db()
+    await telemetry_writer.start()
+    await metrics.loop_lag_monitor.start()
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """应用关闭时写入剩余的 LLM 调用记录，释放导出线程池/进程池，清理批量导出文件"""
+    await telemetry_writer.stop()
+    await metrics.loop_lag_monitor.stop()
+    batch_export_manager.shutdown()
+    export_executor.shutdown()
 
 # ============ CORS 配置 ============
 
@@ -113,15 +205,15 @@ ALLOWED_ORIGINS = os.getenv(
     "http://localhost:5173,http://localhost:5174"
 ).split(",")
 
-# 调试日志：打印加载的CORS配置
-print("=" * 70)
-print("🔧 CORS 配置加载")
-print("=" * 70)
-print(f"CORS_ALLOWED_ORIGINS 环境变量: {os.getenv('CORS_ALLOWED_ORIGINS')}")
-print(f"解析后的 ALLOWED_ORIGINS 列表 (共 {len(ALLOWED_ORIGINS)} 个):")
-for i, origin in enumerate(ALLOWED_ORIGINS, 1):
-    print(f"  {i}. '{origin.strip()}'")
-print("=" * 70)
+# 调试日志：记录加载的CORS配置
+logger.info(
+    "CORS 配置加载: 共 %d 个允许的源",
+    len(ALLOWED_ORIGINS),
+    extra={
+        "cors_env": os.getenv("CORS_ALLOWED_ORIGINS"),
+        "allowed_origins": [origin.strip() for origin in ALLOWED_ORIGINS]
+    }
+)
 
 app.add_middleware(
     CORSMiddleware,
@@ -129,8 +221,41 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["GET", "POST", "PUT", "DELETE", "OPTIONS"],  # ✅ 明确指定方法
     allow_headers=["Content-Type", "Authorization"],  # ✅ 明确指定头部
+    expose_headers=["Server-Timing", "X-Request-ID"],
 )
 
+# ============ 响应压缩 ============
+
+# 在 Server-Timing / 指标中间件之前注册（位于其内层），压缩耗时计入请求耗时
+if compression.COMPRESSION_ENABLED:
+    app.add_middleware(compression.CompressionMiddleware)
+
+# ============ Prometheus 指标 ============
+
+if metrics.METRICS_ENABLED:
+    app.add_middleware(metrics.MetricsMiddleware)
+    metrics.register_db_pool(engine)
+    metrics.instrument_crud_modules(
+        crud_task,
+        crud_attribute,
+        crud_entity_word,
+        crud_search_term,
+        crud_search_term_performance,
+        crud_llm_call_log
+    )
+
+# ============ 按需请求剖析 ============
+
+# 在 ServerTimingMiddleware 之前注册（位于其内层），剖析结果使用同一个请求 ID
+if profiling.profiling_enabled():
+    app.add_middleware(profiling.ProfilingMiddleware)
+
+# ============ 请求耗时分解（Server-Timing） ============
+
+if timing.SERVER_TIMING_ENABLED:
+    app.add_middleware(timing.ServerTimingMiddleware, timing_allow_origins=ALLOWED_ORIGINS)
+    timing.instrument_engine(engine)
+
 
 # ============ 健康检查 ============
 
@@ -153,6 +278,14 @@ async def health_check():
     }
 
 
+@app.get("/metrics", include_in_schema=False)
+async def prometheus_metrics():
+    """Prometheus 指标（METRICS_ENABLED=false 时返回 404）"""
+    if not metrics.METRICS_ENABLED:
+        raise HTTPException(status_code=404, detail="指标未启用")
+    return Response(content=metrics.render_metrics(), media_type=metrics.CONTENT_TYPE_LATEST)
+
+
 # ============ 辅助函数 ============
 
 def convert_deepseek_to_standard(deepseek_attr: Dict) -> Dict:
@@ -236,6 +369,43 @@ def generate_metadata(attributes: List[AttributeWord]) -> AttributeMetadata:
     )
 
 
+# 列表响应格式：rows（默认，每行一个对象）/ columns（列式编码，见 app/services/columnar.py）
+ListFormat = Literal["rows", "columns"]
+# 列式编码字段（与行格式的列表项模型一致）和字典编码字段（重复度高的字符串列）
+SEARCH_TERM_COLUMNS = list(SearchTermItem.model_fields)
+SEARCH_TERM_DICTIONARY_COLUMNS = ("attribute_word", "entity_word")
+ENTITY_WORD_COLUMNS = list(EntityWordItem.model_fields)
+ENTITY_WORD_DICTIONARY_COLUMNS = ("type", "search_value", "source")
+SEARCH_TERM_PERFORMANCE_COLUMNS = list(SearchTermPerformanceItem.model_fields)
+SEARCH_TERM_PERFORMANCE_DICTIONARY_COLUMNS = ("attribute_word", "entity_word", "label")
+
+
+def columnar_response(
+    response: BaseModel,
+    list_field: str,
+    items,
+    fields: List[str],
+    dictionary_fields=()
+) -> ORJSONResponse:
+    """
+    列式响应（?format=columns）
+
+    其余字段与行格式一致，list_field 替换为列式编码，并增加 "format": "columns"；
+    items 可直接传入 ORM 对象，跳过逐行的 Pydantic 模型校验
+
+    Args:
+        response: 列表字段为空的响应模型
+        list_field: 列表字段名（如 search_terms）
+        items: 列表项（ORM 对象或 Pydantic 模型）
+        fields: 列式编码的字段
+        dictionary_fields: 字典编码的字段
+    """
+    content = response.model_dump(mode="json")
+    content[list_field] = columnar.to_columns(items, fields, dictionary_fields)
+    content["format"] = "columns"
+    return ORJSONResponse(content)
+
+
 # ============ Stage 1: 属性词生成 ============
 
 @app.post("/api/stage1/generate", response_model=AttributeResponse)
@@ -293,7 +463,7 @@ async def generate_attribute_candidates(
                 attributes=attributes_dict
             )
 
-            print(f"✅ 任务已保存到数据库: task_id={task_id}, 属性词数量={len(attributes)}")
+            logger.info("任务已保存到数据库: task_id=%s, 属性词数量=%d", task_id, len(attributes))
 
             # 从数据库重新查询带ID的属性词（修复：前端需要数据库ID）
             saved_attributes = crud_attribute.get_attributes_by_task(db, task_id)
@@ -313,7 +483,7 @@ async def generate_attribute_candidates(
 
         except Exception as db_error:
             # 数据库保存失败 - 这是关键错误，应该抛出异常
-            print(f"❌ 数据库保存失败: {str(db_error)}")
+            logger.exception("数据库保存失败: %s", db_error)
             raise HTTPException(status_code=500, detail=f"保存任务失败: {str(db_error)}")
         # ============================================
 
@@ -527,10 +697,13 @@ async def generate_entity_words(
 async def get_entity_words(
     task_id: str,
     include_deleted: bool = False,
+    response_format: ListFormat = Query("rows", alias="format"),
     db: Session = Depends(get_db)
 ):
     """
     Stage 3 API 2: 查询本体词列表
+
+    format=columns 时 entity_words 为列式编码（见 columnar_response）
     """
     # 检查任务是否存在
     task = crud_task.get_task(db, task_id)
@@ -544,6 +717,17 @@ async def get_entity_words(
         raise HTTPException(status_code=404, detail="未生成本体词，请先调用生成接口")
 
     stats = crud_entity_word.get_entity_word_stats(db, task_id)
+
+    if response_format == "columns":
+        return columnar_response(
+            EntityWordListResponse(
+                task_id=task_id,
+                entity_words=[],
+                metadata=EntityWordMetadata(**stats)
+            ),
+            "entity_words", entity_words, ENTITY_WORD_COLUMNS, ENTITY_WORD_DICTIONARY_COLUMNS
+        )
+
     entity_word_items = [EntityWordItem.model_validate(ew) for ew in entity_words]
 
     return EntityWordListResponse(
@@ -638,12 +822,23 @@ async def update_entity_word_selection(
 async def generate_search_terms(
     task_id: str,
     request: SearchTermGenerateRequest,
+    response_format: ListFormat = Query("rows", alias="format"),
     db: Session = Depends(get_db)
 ):
     """
     Stage 3 API 4: 生成搜索词组合
 
     笛卡尔积组合：属性词 × 本体词
+
+    组合数超过上限时：
+    - selection = "reject"（默认）：返回 400
+    - selection = "top_k"：按评分（星级、推荐、长度）保留前 max_terms 个有效搜索词，
+      metadata.dropped_count 为未保留的组合数量
+
+    max_attributes > 1 时按属性词类别顺序叠加多个属性词（如 "slim clear protective phone case"），
+    只生成不超过 max_length 的搜索词
+
+    响应包含任务的全部搜索词，format=columns 时 search_terms 为列式编码（见 columnar_response）
     """
     # 检查任务是否存在
     task = crud_task.get_task(db, task_id)
@@ -668,43 +863,57 @@ async def generate_search_terms(
     if not selected_entity_words:
         raise HTTPException(status_code=400, detail="没有选中的本体词，请先选择本体词")
 
-    # 笛卡尔积上限验证
+    # 获取选项
+    options = request.options or SearchTermGenerateOptions()
+    max_length = options.max_length
+    max_terms = options.max_terms
+
     attr_count = len(selected_attributes)
     entity_count = len(selected_entity_words)
     total_combinations = attr_count * entity_count
 
-    MAX_SEARCH_TERMS = 1000
-    if total_combinations > MAX_SEARCH_TERMS:
-        raise HTTPException(
-            status_code=400,
-            detail=f"搜索词组合数量超过上限（当前：{attr_count} × {entity_count} = {total_combinations}，上限：{MAX_SEARCH_TERMS}），请减少属性词或本体词的选择数量"
-        )
-
-    # 获取选项
-    max_length = request.options.max_length if request.options else 80
+    # 搜索词组合 / 评分（CPU 密集，计入 Server-Timing 的 combine 阶段）
+    with timing.phase("combine"):
+        if options.max_attributes > 1:
+            # 多属性词组合：惰性枚举，组合总数事先未知
+            combinations = iter_attribute_combinations(
+                selected_attributes, selected_entity_words, max_length,
+                options.max_attributes, attribute_categorizer
+            )
+            if options.selection == "top_k":
+                search_terms_data, dropped_count = select_top_k_combinations(
+                    combinations, max_length, max_terms, search_term_scorer
+                )
+            else:
+                search_terms_data = take_combinations(combinations, max_length, max_terms + 1)
+                if len(search_terms_data) > max_terms:
+                    raise HTTPException(
+                        status_code=400,
+                        detail=f"多属性词搜索词组合数量超过上限（上限：{max_terms}），请减少属性词选择数量或 max_attributes，或使用 top_k 模式按评分保留"
+                    )
+                dropped_count = 0
+        else:
+            # 笛卡尔积上限验证
+            if options.selection == "reject" and total_combinations > max_terms:
+                raise HTTPException(
+                    status_code=400,
+                    detail=f"搜索词组合数量超过上限（当前：{attr_count} × {entity_count} = {total_combinations}，上限：{max_terms}），请减少属性词或本体词的选择数量，或使用 top_k 模式按评分保留"
+                )
+
+            if total_combinations > max_terms:
+                # 按评分保留前 max_terms 个（堆选择，不生成完整组合列表）
+                search_terms_data, dropped_count = select_top_k(
+                    selected_attributes, selected_entity_words, max_length, max_terms, search_term_scorer
+                )
+            else:
+                # 笛卡尔积组合
+                search_terms_data = list(iter_search_terms(selected_attributes, selected_entity_words, max_length))
+                dropped_count = 0
 
     try:
         # 幂等操作：删除现有搜索词
         crud_search_term.delete_existing_search_terms(db, task_id)
 
-        # 笛卡尔积组合
-        search_terms_data = []
-        for attr in selected_attributes:
-            for entity in selected_entity_words:
-                term = f"{attr.word} {entity.entity_word}"
-                length = len(term)
-                is_valid = length <= max_length
-
-                search_terms_data.append({
-                    "term": term,
-                    "attribute_id": attr.id,
-                    "attribute_word": attr.word,
-                    "entity_word_id": entity.id,
-                    "entity_word": entity.entity_word,
-                    "length": length,
-                    "is_valid": is_valid
-                })
-
         # 批量保存
         crud_search_term.create_search_terms_batch(db, task_id, search_terms_data)
 
@@ -714,22 +923,36 @@ async def generate_search_terms(
         # 获取最新数据
         task = crud_task.get_task(db, task_id)
         search_terms, total = crud_search_term.get_search_terms_by_task(
-            db, task_id, page=1, page_size=total_combinations
+            db, task_id, page=1, page_size=max(len(search_terms_data), 1)
         )
         stats = crud_search_term.get_search_term_stats(db, task_id)
+        metadata = SearchTermMetadata(
+            total_terms=stats["total_terms"],
+            valid_terms=stats["valid_terms"],
+            invalid_terms=stats["invalid_terms"],
+            attribute_count=attr_count,
+            entity_word_count=entity_count,
+            dropped_count=dropped_count
+        )
+
+        if response_format == "columns":
+            return columnar_response(
+                SearchTermGenerateResponse(
+                    task_id=task.task_id,
+                    search_terms=[],
+                    metadata=metadata,
+                    status=task.status,
+                    updated_at=task.updated_at
+                ),
+                "search_terms", search_terms, SEARCH_TERM_COLUMNS, SEARCH_TERM_DICTIONARY_COLUMNS
+            )
 
         search_term_items = [SearchTermItem.model_validate(st) for st in search_terms]
 
         return SearchTermGenerateResponse(
             task_id=task.task_id,
             search_terms=search_term_items,
-            metadata=SearchTermMetadata(
-                total_terms=stats["total_terms"],
-                valid_terms=stats["valid_terms"],
-                invalid_terms=stats["invalid_terms"],
-                attribute_count=attr_count,
-                entity_word_count=entity_count
-            ),
+            metadata=metadata,
             status=task.status,
             updated_at=task.updated_at
         )
@@ -746,10 +969,13 @@ async def get_search_terms(
     filter_by_attribute: str = None,
     filter_by_entity: str = None,
     include_deleted: bool = False,
+    response_format: ListFormat = Query("rows", alias="format"),
     db: Session = Depends(get_db)
 ):
     """
     Stage 3 API 5: 查询搜索词列表（分页）
+
+    format=columns 时 search_terms 为列式编码（见 columnar_response）
     """
     # 检查任务是否存在
     task = crud_task.get_task(db, task_id)
@@ -761,6 +987,20 @@ async def get_search_terms(
         db, task_id, page, page_size, filter_by_attribute, filter_by_entity, include_deleted
     )
 
+    if response_format == "columns":
+        return columnar_response(
+            SearchTermListResponse(
+                task_id=task_id,
+                search_terms=[],
+                total=total,
+                page=page,
+                page_size=page_size,
+                filter_by_attribute=filter_by_attribute,
+                filter_by_entity=filter_by_entity
+            ),
+            "search_terms", search_terms, SEARCH_TERM_COLUMNS, SEARCH_TERM_DICTIONARY_COLUMNS
+        )
+
     search_term_items = [SearchTermItem.model_validate(st) for st in search_terms]
 
     return SearchTermListResponse(
@@ -810,6 +1050,152 @@ async def batch_delete_search_terms(
         raise HTTPException(status_code=500, detail=f"删除搜索词失败: {str(e)}")
 
 
+async def _check_upload_size(file: UploadFile, max_bytes: int) -> None:
+    """
+    上传文件大小检查（UploadFile 已落盘到临时文件，seek 到末尾即可得到大小）
+
+    Raises:
+        HTTPException: 413 超过大小上限
+    """
+    file_size = await asyncio.to_thread(file.file.seek, 0, os.SEEK_END)
+    await asyncio.to_thread(file.file.seek, 0)
+    if file_size > max_bytes:
+        raise HTTPException(
+            status_code=413,
+            detail=f"上传文件过大（{file_size} 字节，上限：{max_bytes} 字节）"
+        )
+
+
+@app.post("/api/stage3/tasks/{task_id}/search-terms/performance-report", response_model=SearchTermReportResponse)
+async def import_search_term_report(
+    task_id: str,
+    file: UploadFile = File(..., description="亚马逊 Sponsored Products Search Term Report（xlsx / csv / tsv）"),
+    prune: bool = Form(default=False, description="是否直接删除（软删除）low_performer 搜索词"),
+    db: Session = Depends(get_db)
+):
+    """
+    Stage 3 API 7: 导入 Search Term Report，按表现标记搜索词
+
+    报告按搜索词汇总展示/点击/花费/订单/销售额，只保留任务中存在的搜索词，
+    标记为 winner / neutral / low_performer（覆盖上一次导入的结果）
+    """
+    # 检查任务是否存在
+    task = crud_task.get_task(db, task_id)
+    if not task:
+        raise HTTPException(status_code=404, detail=f"任务不存在: {task_id}")
+
+    await _check_upload_size(file, SEARCH_TERM_REPORT_MAX_BYTES)
+
+    # 规范化搜索词 → 搜索词ID（与报告中的 Customer Search Term 按不区分大小写匹配）
+    search_terms = crud_search_term_performance.get_search_term_index(db, task_id)
+    if not search_terms:
+        raise HTTPException(status_code=400, detail="没有有效的搜索词，请先生成搜索词")
+    term_index: Dict[str, int] = {}
+    for search_term_id, term in search_terms:
+        term_index.setdefault(normalize_keyword(term), search_term_id)
+
+    try:
+        # 解析和汇总是 CPU 密集操作，放到线程池
+        records, stats = await asyncio.to_thread(
+            ingest_search_term_report, file.file, file.filename, term_index
+        )
+        crud_search_term_performance.replace_search_term_performance(db, task_id, records)
+
+        label_counts = {"winner": 0, "neutral": 0, "low_performer": 0}
+        for record in records:
+            label_counts[record["label"]] += 1
+        label_counts["no_data"] = len(search_terms) - len(records)
+
+        pruned_count = 0
+        if prune:
+            low_performer_ids = [
+                record["search_term_id"] for record in records if record["label"] == "low_performer"
+            ]
+            if low_performer_ids:
+                pruned_count = crud_search_term.soft_delete_search_terms(db, task_id, low_performer_ids)
+
+        return SearchTermReportResponse(
+            task_id=task_id,
+            report_rows=stats["report_rows"],
+            matched_rows=stats["matched_rows"],
+            matched_terms=stats["matched_terms"],
+            label_counts=label_counts,
+            pruned_count=pruned_count,
+            message=f"已导入 {stats['report_rows']} 行报告，匹配 {stats['matched_terms']} 个搜索词"
+        )
+
+    except (SearchTermReportError, BulksheetImportError) as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"导入 Search Term Report 失败: {str(e)}")
+
+
+@app.get("/api/stage3/tasks/{task_id}/search-terms/performance", response_model=SearchTermPerformanceListResponse)
+async def get_search_terms_by_performance(
+    task_id: str,
+    page: int = 1,
+    page_size: int = 20,
+    label: Optional[Literal["winner", "neutral", "low_performer", "no_data"]] = None,
+    response_format: ListFormat = Query("rows", alias="format"),
+    db: Session = Depends(get_db)
+):
+    """
+    Stage 3 API 8: 按表现排序查询搜索词（分页）
+
+    排序：winner → neutral → 无数据 → low_performer，同一标签内按销售额、订单数、点击数降序
+    format=columns 时 search_terms 为列式编码（见 columnar_response）
+    """
+    # 检查任务是否存在
+    task = crud_task.get_task(db, task_id)
+    if not task:
+        raise HTTPException(status_code=404, detail=f"任务不存在: {task_id}")
+
+    rows, total = crud_search_term_performance.get_search_terms_by_performance(
+        db, task_id, page, page_size, label
+    )
+
+    items = []
+    for search_term, performance in rows:
+        item = SearchTermPerformanceItem(
+            id=search_term.id,
+            term=search_term.term,
+            attribute_word=search_term.attribute_word,
+            entity_word=search_term.entity_word,
+            label=performance.label if performance else "no_data"
+        )
+        if performance:
+            item.impressions = performance.impressions
+            item.clicks = performance.clicks
+            item.spend = performance.spend
+            item.orders = performance.orders
+            item.sales = performance.sales
+            item.ctr = round(performance.clicks / performance.impressions, 4) if performance.impressions else None
+            item.acos = round(performance.spend / performance.sales, 4) if performance.sales else None
+        items.append(item)
+
+    if response_format == "columns":
+        return columnar_response(
+            SearchTermPerformanceListResponse(
+                task_id=task_id,
+                search_terms=[],
+                total=total,
+                page=page,
+                page_size=page_size,
+                label=label
+            ),
+            "search_terms", items, SEARCH_TERM_PERFORMANCE_COLUMNS, SEARCH_TERM_PERFORMANCE_DICTIONARY_COLUMNS
+        )
+
+    return SearchTermPerformanceListResponse(
+        task_id=task_id,
+        search_terms=items,
+        total=total,
+        page=page,
+        page_size=page_size,
+        label=label
+    )
+
+
 # ============================================
 # Stage 4: Bulksheet 导出
 # ============================================
@@ -853,13 +1239,26 @@ async def save_product_info(
         raise HTTPException(status_code=500, detail=f"保存产品信息失败: {str(e)}")
 
 
-@app.post("/api/stage4/export")
-async def export_bulksheet(
-    request: ExportRequest,
-    db: Session = Depends(get_db)
-):
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """If-None-Match 是否匹配（支持多个值、弱校验前缀 W/ 和 *）"""
+    if not if_none_match:
+        return False
+    candidates = [value.strip() for value in if_none_match.split(",")]
+    return any(
+        candidate == "*" or candidate.removeprefix("W/") == etag
+        for candidate in candidates
+    )
+
+
+async def _build_export_campaigns(request: ExportRequest, db: Session):
     """
-    Stage 4 API 2: 导出 Bulksheet Excel 文件
+    按导出请求构建每个型号的 Campaign（导出与差异导出共用）
+
+    Returns:
+        (Task, [build_campaign 的结果, ...])
+
+    Raises:
+        HTTPException: 任务不存在 / 产品信息未保存 / 没有可导出的搜索词
     """
     # 1. 检查任务是否存在
     task = crud_task.get_task(db, request.task_id)
@@ -874,9 +1273,14 @@ async def export_bulksheet(
             detail="产品信息未保存，请先调用 /api/stage4/save-product-info"
         )
 
-    # 3. 获取有效搜索词
-    search_terms = crud_search_term.get_valid_search_terms(db, request.task_id)
-    if not search_terms:
+    # 3. 获取有效搜索词（按规则出价时同时取出属性词/本体词星级）
+    term_features = None
+    if request.bid_strategy == BidStrategy.RULES:
+        term_features = crud_search_term.get_valid_search_term_features(db, request.task_id)
+        keywords = [feature[0] for feature in term_features]
+    else:
+        keywords = [st.term for st in crud_search_term.get_valid_search_terms(db, request.task_id)]
+    if not keywords:
         raise HTTPException(
             status_code=400,
             detail="没有可导出的搜索词，请先完成 Stage 3"
@@ -884,50 +1288,562 @@ async def export_bulksheet(
 
     # 4. 获取本体词（用于 Campaign Negative Keywords）
     entity_words = crud_entity_word.get_all_entity_words(db, request.task_id)
+    negative_keywords = [ew.entity_word for ew in entity_words]
 
+    campaigns = await _campaigns_for_task(
+        request, task.concept, product_info, keywords, negative_keywords, term_features
+    )
+    return task, campaigns
+
+
+async def _campaigns_for_task(
+    options: Union[ExportRequest, BatchExportItem],
+    concept: str,
+    product_info: Dict,
+    keywords: List[str],
+    negative_keywords: List[str],
+    term_features: Optional[List[Tuple[str, int, int, int]]] = None
+) -> List[Dict]:
+    """
+    按导出选项（预算、型号、匹配类型、出价方式）构建一个任务的每个型号的 Campaign
+    （单任务导出与批量导出共用；数据由调用方查询）
+
+    Args:
+        options: ExportRequest 或 BatchExportItem
+        concept: 任务概念词
+        product_info: {"sku", "asin", "model"}
+        keywords: 有效搜索词
+        negative_keywords: 本体词（Campaign Negative Keywords）
+        term_features: 按规则出价时的搜索词特征（与 keywords 一一对应），固定出价时为 None
+
+    Returns:
+        [build_campaign 的结果, ...]
+    """
+    budget_info = {
+        "daily_budget": options.daily_budget,
+        "ad_group_default_bid": options.ad_group_default_bid,
+        "keyword_bid": options.keyword_bid
+    }
+
+    # 多型号导出：每个型号一个 Campaign（去重并保持顺序）
+    if options.models:
+        models = list(dict.fromkeys(model.value for model in options.models))
+    else:
+        models = [product_info["model"]]
+
+    # 匹配类型去重并保持顺序；每种匹配类型一行
+    match_types = list(dict.fromkeys(match_type.value for match_type in options.match_types))
+    bid_multipliers = {
+        match_type.value: multiplier
+        for match_type, multiplier in (options.match_type_bid_multipliers or {}).items()
+    }
+
+    # 按规则出价：一次性向量化计算所有搜索词 × 匹配类型的出价（放到线程池，不占用事件循环）
+    keyword_bids = None
+    if term_features is not None:
+        keyword_bids = await asyncio.to_thread(
+            bid_engine.compute_rows, options.keyword_bid, term_features, match_types, bid_multipliers
+        )
+
+    return [
+        build_campaign(
+            concept, {**product_info, "model": model}, budget_info, keywords, negative_keywords,
+            match_types=match_types,
+            bid_multipliers=bid_multipliers,
+            keyword_bids=keyword_bids
+        )
+        for model in models
+    ]
+
+
+@app.post("/api/stage4/export")
+async def export_bulksheet(
+    request: ExportRequest,
+    if_none_match: Optional[str] = Header(default=None),
+    accept_encoding: Optional[str] = Header(default=None),
+    db: Session = Depends(get_db)
+):
+    """
+    Stage 4 API 2: 导出 Bulksheet 文件（xlsx / csv / tsv）
+
+    传入 models 时，每个型号生成一个独立的 Campaign/Ad Group，合并到同一个文件中；
+    超过单文件行数/大小上限时自动分片，以 zip 返回（每个分片可单独上传，被拆分的 Campaign 在后续分片中以 " partNN" 后缀的名称创建）
+
+    响应带 ETag（导出内容哈希）；If-None-Match 匹配时返回 304，
+    相同内容的重复导出直接返回缓存文件；csv / tsv 按 Accept-Encoding 返回预压缩的缓存副本
+    （副本在首次请求后于后台生成）
+    """
     try:
+        # 1-4. 检查任务和产品信息，获取搜索词/本体词，构建每个型号的 Campaign
+        task, campaigns = await _build_export_campaigns(request, db)
+
         # 5. 生成 Bulksheet
         from app.services.bulksheet_generator import BulksheetGenerator
-
-        budget_info = {
-            "daily_budget": request.daily_budget,
-            "ad_group_default_bid": request.ad_group_default_bid,
-            "keyword_bid": request.keyword_bid
-        }
+        from app.services.bulksheet_writers import get_writer
 
         generator = BulksheetGenerator(
             task=task,
-            product_info=product_info,
-            budget_info=budget_info
+            product_info=campaigns[0]["product_info"],
+            budget_info=campaigns[0]["budget_info"]
         )
 
-        # 生成 Excel 文件到内存
-        excel_buffer = generator.generate_excel(search_terms, entity_words)
+        # 导出任务只包含普通数据，可交给线程池或进程池渲染
+        export_format = request.format.value
+        job = build_export_job(
+            campaigns=campaigns,
+            export_format=export_format,
+            max_rows_per_file=request.max_rows_per_file or EXPORT_MAX_ROWS,
+            max_bytes_per_file=request.max_bytes_per_file or EXPORT_SHARD_MAX_BYTES
+        )
+
+        # 行数上限验证（超过单文件上限时自动分片，这里只限制总量）
+        total_rows = count_job_rows(job)
+        if total_rows > EXPORT_MAX_TOTAL_ROWS:
+            raise HTTPException(
+                status_code=400,
+                detail=f"导出行数超过上限（当前：{len(campaigns)} 个型号 × 每个 Campaign {total_rows // len(campaigns)} 行 = {total_rows}，上限：{EXPORT_MAX_TOTAL_ROWS}），请减少型号或搜索词数量"
+            )
+
+        # 内容哈希在挂载分片前计算（分片文件名含时间戳，不参与哈希）
+        content_hash = compute_job_hash(job)
 
         # 生成文件名
-        filename = generator.generate_filename()
+        writer = get_writer(export_format)
+        filename = generator.generate_filename(extension=writer.extension, campaign_count=len(campaigns))
+
+        # 超过单文件行数/大小上限时分片（按大小分片需要逐行估算，放到线程池）
+        shards = await asyncio.to_thread(plan_shards, job)
+        attach_shards(job, shards, filename)
+        if len(shards) > 1:
+            filename = os.path.splitext(filename)[0] + f"_{len(shards)}_parts.zip"
+            extension = "zip"
+            media_type = "application/zip"
+        else:
+            extension = writer.extension
+            media_type = writer.media_type
 
         # 对文件名进行 URL 编码以支持中文字符（RFC 5987）
         from urllib.parse import quote
         encoded_filename = quote(filename)
 
+        # 内容哈希作为 ETag：内容未变化时客户端可直接使用本地副本
+        etag = f'"{content_hash}"'
+        if _etag_matches(if_none_match, etag):
+            return Response(status_code=304, headers={"ETag": etag})
+
+        headers = {
+            "Content-Disposition": f"attachment; filename*=UTF-8''{encoded_filename}",
+            "ETag": etag
+        }
+
+        # 文本格式协商预压缩编码（响应发送完成后在后台生成该编码的副本）
+        cache_key = ExportCache.make_key(content_hash, extension)
+        encoding = None
+        if export_cache is not None and compression.COMPRESSION_ENABLED and compression.is_compressible(media_type):
+            headers["Vary"] = "Accept-Encoding"
+            encoding = compression.negotiate(accept_encoding, compression.available_encodings())
+        background = BackgroundTask(export_cache.precompress, cache_key, encoding) if encoding else None
+
+        # 命中缓存：直接返回已渲染的文件（有预压缩副本时返回副本）；打开文件在线程池中进行
+        cached = await asyncio.to_thread(export_cache.open, cache_key) if export_cache is not None else None
+        if cached is not None:
+            cached_file, size = cached
+            variant = await asyncio.to_thread(export_cache.open_variant, cache_key, encoding) if encoding else None
+            if variant is not None:
+                cached_file.close()
+                variant_file, variant_size = variant
+                return StreamingResponse(
+                    iter_file_chunks(variant_file),
+                    media_type=media_type,
+                    headers={
+                        **headers,
+                        "ETag": compression.weak_etag(etag),
+                        "Content-Encoding": encoding,
+                        "Content-Length": str(variant_size),
+                        "X-Export-Cache": "HIT"
+                    }
+                )
+            return StreamingResponse(
+                iter_file_chunks(cached_file),
+                media_type=media_type,
+                headers={**headers, "Content-Length": str(size), "X-Export-Cache": "HIT"},
+                background=background
+            )
+
+        # 在执行器中渲染（边生成边发送，不设置 Content-Length），同时写入缓存
+        file_stream = await export_executor.open_stream(job)
+        if export_cache is not None:
+            file_stream = export_cache.tee(cache_key, file_stream)
+            headers["X-Export-Cache"] = "MISS"
+
         # 6. 返回文件流
         return StreamingResponse(
-            excel_buffer,
-            media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+            file_stream,
+            media_type=media_type,
+            headers=headers,
+            background=background
+        )
+
+    except HTTPException:
+        raise
+    except ExportQueueFullError as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "5"})
+    except ExportTimeoutError as e:
+        raise HTTPException(status_code=504, detail=str(e))
+    except Exception as e:
+        logger.exception("导出 Bulksheet 失败")
+        raise HTTPException(status_code=500, detail=f"生成 Bulksheet 失败: {str(e)}")
+
+
+@app.post("/api/stage4/export/diff")
+async def export_bulksheet_diff(
+    file: UploadFile = File(..., description="从亚马逊广告后台下载的 Bulksheet（xlsx / csv / tsv）"),
+    request: str = Form(..., description="导出参数（ExportRequest 的 JSON）"),
+    archive_missing: bool = Form(default=True, description="是否归档任务中已删除的关键词和否定词"),
+    db: Session = Depends(get_db)
+):
+    """
+    Stage 4 API 7: 差异导出（update / archive Bulksheet）
+
+    解析已上线的 Bulksheet，与任务当前的搜索词/本体词对比，只导出变化的行：
+    新关键词 create、出价变化 update、已删除的关键词 archive。
+    响应头 X-Diff-Created / X-Diff-Updated / X-Diff-Archived / X-Diff-Unchanged 为各类行数
+    """
+    try:
+        export_request = ExportRequest.model_validate_json(request)
+    except ValidationError as e:
+        raise HTTPException(status_code=422, detail=e.errors(include_url=False, include_context=False))
+
+    await _check_upload_size(file, BULKSHEET_IMPORT_MAX_BYTES)
+
+    try:
+        # 1-4. 检查任务和产品信息，获取搜索词/本体词，构建每个型号的 Campaign
+        task, campaigns = await _build_export_campaigns(export_request, db)
+
+        # 5. 解析上传文件并对比（CPU 密集，放到线程池）
+        rows, counts = await asyncio.to_thread(
+            diff_bulksheet, file.file, file.filename, campaigns, archive_missing
+        )
+
+        from app.services.bulksheet_generator import BulksheetGenerator
+        from app.services.bulksheet_writers import get_writer
+        from urllib.parse import quote
+
+        writer = get_writer(export_request.format.value)
+        generator = BulksheetGenerator(
+            task=task,
+            product_info=campaigns[0]["product_info"],
+            budget_info=campaigns[0]["budget_info"]
+        )
+        filename = generator.generate_filename(extension=writer.extension, campaign_count=len(campaigns))
+        filename = filename.replace("bulksheet_", "bulksheet_diff_", 1)
+        encoded_filename = quote(filename)
+
+        # 6. 返回差异文件（只含变化的行，行数较少，直接流式编码）
+        return StreamingResponse(
+            writer.stream(rows),
+            media_type=writer.media_type,
             headers={
-                "Content-Disposition": f"attachment; filename*=UTF-8''{encoded_filename}"
+                "Content-Disposition": f"attachment; filename*=UTF-8''{encoded_filename}",
+                "X-Diff-Created": str(counts["created"]),
+                "X-Diff-Updated": str(counts["updated"]),
+                "X-Diff-Archived": str(counts["archived"]),
+                "X-Diff-Unchanged": str(counts["unchanged"])
             }
         )
 
+    except HTTPException:
+        raise
+    except BulksheetImportError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
-        import traceback
-        print("=" * 70)
-        print("❌ 导出 Bulksheet 失败，错误详情:")
-        print("=" * 70)
-        print(traceback.format_exc())
-        print("=" * 70)
-        raise HTTPException(status_code=500, detail=f"生成 Bulksheet 失败: {str(e)}")
+        logger.exception("差异导出 Bulksheet 失败")
+        raise HTTPException(status_code=500, detail=f"差异导出失败: {str(e)}")
+
+
+@app.get("/api/stage4/export/stats")
+async def get_export_stats():
+    """
+    Stage 4 API 3: 导出执行器状态
+
+    返回线程池/进程池配置、进行中的导出数、拒绝/超时次数、耗时统计和导出缓存命中情况
+    """
+    return {
+        **export_executor.stats(),
+        "cache": export_cache.stats() if export_cache is not None else None
+    }
+
+
+@app.get("/api/telemetry/llm")
+async def get_llm_telemetry(
+    hours: int = 24,
+    name: Optional[str] = None,
+    db: Session = Depends(get_db)
+):
+    """
+    LLM 调用遥测汇总
+
+    按提示词名称、提示词版本、模型分组，返回最近 hours 小时内的调用数、降级率和降级原因、
+    重试次数、耗时分位数（总耗时 / 首字节 / 等待连接）、token 用量和提示词缓存命中率
+
+    Args:
+        hours: 统计最近多少小时（1-720）
+        name: 只统计指定提示词（如 attribute_expert、entity_word_expert）
+    """
+    if hours < 1 or hours > 720:
+        raise HTTPException(status_code=400, detail="hours 必须在 1-720 之间")
+
+    since = datetime.now(timezone.utc) - timedelta(hours=hours)
+    return {
+        "since": since.isoformat(),
+        "groups": crud_llm_call_log.get_llm_call_stats(db, since=since, name=name),
+        "writer": telemetry_writer.stats()
+    }
+
+
+def _require_profile_token(token: Optional[str]):
+    """剖析结果可能包含内部实现细节，只对持有 PROFILE_TOKEN 的请求开放"""
+    if not profiling.token_matches(token):
+        raise HTTPException(status_code=404, detail="Not Found")
+
+
+@app.get("/api/debug/profiles", include_in_schema=False)
+async def list_profiles(
+    limit: int = 50,
+    x_profile_token: Optional[str] = Header(None)
+):
+    """
+    最近的请求剖析结果
+
+    请求头 X-Profile-Token 需与 PROFILE_TOKEN 一致；带该请求头访问任意接口即可剖析该请求，
+    响应头 X-Profile-Id 为剖析结果 ID
+    """
+    _require_profile_token(x_profile_token)
+    return {
+        "profiler": profiling.profiler_name(),
+        "sample_rate": profiling.PROFILE_SAMPLE_RATE,
+        "profiles": await asyncio.to_thread(profiling.profile_store.list, max(1, min(limit, 500)))
+    }
+
+
+@app.get("/api/debug/profiles/{profile_id}", include_in_schema=False)
+async def download_profile(
+    profile_id: str,
+    x_profile_token: Optional[str] = Header(None)
+):
+    """下载剖析结果（pyinstrument 为 .html，cProfile 为 .prof）"""
+    _require_profile_token(x_profile_token)
+    path = await asyncio.to_thread(profiling.profile_store.get_path, profile_id)
+    if path is None:
+        raise HTTPException(status_code=404, detail=f"剖析结果不存在: {profile_id}")
+    media_type = "text/html" if path.suffix == ".html" else "application/octet-stream"
+    return FileResponse(path, media_type=media_type, filename=path.name)
+
+
+def _to_batch_status_response(batch: Dict) -> BatchExportStatusResponse:
+    """批次状态快照 → 响应模型（时间戳转 ISO 8601）"""
+    def to_iso(timestamp):
+        if timestamp is None:
+            return None
+        return datetime.fromtimestamp(timestamp, tz=timezone.utc).isoformat().replace("+00:00", "Z")
+
+    return BatchExportStatusResponse(
+        batch_id=batch["batch_id"],
+        status=batch["status"],
+        progress=batch["progress"],
+        task_count=batch["task_count"],
+        file_count=batch["file_count"],
+        total_campaigns=batch["total_campaigns"],
+        completed_campaigns=batch["completed_campaigns"],
+        total_rows=batch["total_rows"],
+        filename=batch["filename"],
+        output_bytes=batch["output_bytes"],
+        error=batch["error"],
+        created_at=to_iso(batch["created_at"]),
+        finished_at=to_iso(batch["finished_at"])
+    )
+
+
+@app.post("/api/stage4/export/batch", response_model=BatchExportStatusResponse, status_code=202)
+async def batch_export_bulksheet(
+    request: BatchExportRequest,
+    db: Session = Depends(get_db)
+):
+    """
+    Stage 4 API 4: 批量导出多个任务
+
+    - output=single：所有任务的 Campaign 合并到一个 Bulksheet
+    - output=zip：每个任务一个 Bulksheet，打包为 zip
+
+    文件超过单文件行数/大小上限时与单任务导出一样自动分片（每个分片可单独上传），
+    分片作为 zip 中的各项；single 模式的合并文件被分片时以 zip 返回
+
+    任务、搜索词、本体词各用一次集合查询取回；渲染在后台进行，
+    返回批次ID，通过 API 5 查询进度、API 6 下载
+    """
+    from app.services.bulksheet_generator import BulksheetGenerator
+    from app.services.bulksheet_writers import get_writer
+
+    # 1. 检查任务ID是否重复
+    task_ids = [item.task_id for item in request.items]
+    duplicated = sorted(task_id for task_id, count in Counter(task_ids).items() if count > 1)
+    if duplicated:
+        raise HTTPException(status_code=400, detail=f"任务ID重复: {', '.join(duplicated)}")
+
+    # 2. 检查任务是否存在、产品信息是否已保存
+    tasks = {task.task_id: task for task in crud_task.get_tasks_by_ids(db, task_ids)}
+    missing = [task_id for task_id in task_ids if task_id not in tasks]
+    if missing:
+        raise HTTPException(status_code=404, detail=f"任务不存在: {', '.join(missing)}")
+
+    no_product_info = [
+        task_id for task_id in task_ids
+        if not (tasks[task_id].sku and tasks[task_id].asin and tasks[task_id].model)
+    ]
+    if no_product_info:
+        raise HTTPException(
+            status_code=400,
+            detail=f"以下任务的产品信息未保存，请先调用 /api/stage4/save-product-info: {', '.join(no_product_info)}"
+        )
+
+    # 3. 获取有效搜索词和本体词（按规则出价的任务同时取出属性词/本体词星级）
+    terms_by_task = crud_search_term.get_valid_search_terms_for_tasks(db, task_ids)
+    rules_task_ids = [item.task_id for item in request.items if item.bid_strategy == BidStrategy.RULES]
+    features_by_task = crud_search_term.get_valid_search_term_features_for_tasks(db, rules_task_ids)
+    for task_id in rules_task_ids:
+        terms_by_task[task_id] = [feature[0] for feature in features_by_task.get(task_id, [])]
+    no_terms = [task_id for task_id in task_ids if not terms_by_task.get(task_id)]
+    if no_terms:
+        raise HTTPException(
+            status_code=400,
+            detail=f"以下任务没有可导出的搜索词，请先完成 Stage 3: {', '.join(no_terms)}"
+        )
+    words_by_task = crud_entity_word.get_entity_words_for_tasks(db, task_ids)
+
+    try:
+        # 4. 每个任务一个文件（zip 中的一项）；single 模式再合并为一个
+        export_format = request.format.value
+        writer = get_writer(export_format)
+        files = []
+        for index, item in enumerate(request.items, start=1):
+            task = tasks[item.task_id]
+            product_info = {"sku": task.sku, "asin": task.asin, "model": task.model}
+            campaigns = await _campaigns_for_task(
+                item,
+                task.concept,
+                product_info,
+                terms_by_task[item.task_id],
+                words_by_task.get(item.task_id, []),
+                features_by_task.get(item.task_id)
+            )
+            generator = BulksheetGenerator(
+                task=task,
+                product_info=campaigns[0]["product_info"],
+                budget_info=campaigns[0]["budget_info"]
+            )
+            # 序号前缀保证 zip 内文件名唯一且保持请求顺序
+            name = f"{index:03d}_" + generator.generate_filename(
+                extension=writer.extension, campaign_count=len(campaigns)
+            )
+            files.append((name, build_export_job(campaigns, export_format)))
+
+        # single 模式：所有任务的 Campaign 合并为一个文件
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        as_zip = request.output == BatchExportOutput.ZIP
+        if not as_zip:
+            files = [(
+                f"bulksheet_batch_{len(files)}_tasks_{timestamp}.{writer.extension}",
+                build_export_job(
+                    [campaign for _, job in files for campaign in job["campaigns"]],
+                    export_format
+                )
+            )]
+
+        # 5. 行数上限验证（超过单文件上限时自动分片，这里只限制总量）
+        total_rows = sum(count_job_rows(job) for _, job in files)
+        if total_rows > EXPORT_MAX_TOTAL_ROWS:
+            raise HTTPException(
+                status_code=400,
+                detail=f"导出行数超过上限（当前：{total_rows}，上限：{EXPORT_MAX_TOTAL_ROWS}），请减少任务、型号或搜索词数量"
+            )
+
+        # 超过单文件行数/大小上限的文件分片，每个分片作为 zip 中的一项（按大小分片需要逐行估算，放到线程池）
+        output_files = []
+        for name, job in files:
+            shards = await asyncio.to_thread(plan_shards, job)
+            attach_shards(job, shards, name)
+            shard_files, _ = job_files(job)
+            output_files += [(shard_name or name, shard_job) for shard_name, shard_job in shard_files]
+
+        if as_zip:
+            filename = f"bulksheet_batch_{len(request.items)}_tasks_{timestamp}.zip"
+            media_type = "application/zip"
+        elif len(output_files) > 1:
+            # single 模式的合并文件被分片：以 zip 返回
+            as_zip = True
+            filename = f"bulksheet_batch_{len(request.items)}_tasks_{timestamp}_{len(output_files)}_parts.zip"
+            media_type = "application/zip"
+        else:
+            filename = output_files[0][0]
+            media_type = writer.media_type
+        files = output_files
+
+        # 6. 后台渲染
+        batch = batch_export_manager.submit(
+            files,
+            filename=filename,
+            as_zip=as_zip,
+            media_type=media_type,
+            task_count=len(request.items)
+        )
+        return _to_batch_status_response(batch)
+
+    except HTTPException:
+        raise
+    except ExportQueueFullError as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "5"})
+    except Exception as e:
+        logger.exception("批量导出 Bulksheet 失败")
+        raise HTTPException(status_code=500, detail=f"批量导出失败: {str(e)}")
+
+
+@app.get("/api/stage4/export/batch/{batch_id}", response_model=BatchExportStatusResponse)
+async def get_batch_export_status(batch_id: str):
+    """
+    Stage 4 API 5: 查询批量导出进度
+    """
+    batch = batch_export_manager.get(batch_id)
+    if not batch:
+        raise HTTPException(status_code=404, detail=f"批次不存在或已过期: {batch_id}")
+    return _to_batch_status_response(batch)
+
+
+@app.get("/api/stage4/export/batch/{batch_id}/download")
+async def download_batch_export(batch_id: str):
+    """
+    Stage 4 API 6: 下载批量导出结果（批次完成后可用）
+    """
+    batch = batch_export_manager.get(batch_id)
+    if not batch:
+        raise HTTPException(status_code=404, detail=f"批次不存在或已过期: {batch_id}")
+    if batch["status"] == "failed":
+        raise HTTPException(status_code=409, detail=f"批量导出失败: {batch['error']}")
+    if batch["status"] != "completed":
+        raise HTTPException(
+            status_code=409,
+            detail=f"批量导出尚未完成（{batch['status']}，{batch['progress']}%）"
+        )
+
+    from urllib.parse import quote
+    encoded_filename = quote(batch["filename"])
+
+    return FileResponse(
+        batch["path"],
+        media_type=batch["media_type"],
+        headers={
+            "Content-Disposition": f"attachment; filename*=UTF-8''{encoded_filename}"
+        }
+    )
 
 
 if __name__ == "__main__":
@@ -3,7 +3,7 @@
 使用Pydantic进行数据验证
 """
 
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, field_validator
 from typing import List, Optional, Literal, Dict, Any
 from datetime import datetime
 from enum import Enum
@@ -128,6 +128,21 @@ class ProductInfoResponse(BaseModel):
 class ExportFormat(str, Enum):
     """导出格式枚举"""
     XLSX = "xlsx"
+    CSV = "csv"
+    TSV = "tsv"
+
+
+class MatchType(str, Enum):
+    """关键词匹配类型（值与 Bulksheet 中的写法一致）"""
+    BROAD = "Broad"
+    PHRASE = "Phrase"
+    EXACT = "Exact"
+
+
+class BidStrategy(str, Enum):
+    """关键词出价方式"""
+    FIXED = "fixed"  # 所有关键词使用 keyword_bid（× 匹配类型倍数）
+    RULES = "rules"  # 按出价规则表（星级、长度、匹配类型）逐词计算，keyword_bid 为基础出价
 
 
 class ExportRequest(BaseModel):
@@ -137,3 +152,110 @@ class ExportRequest(BaseModel):
     ad_group_default_bid: float = Field(..., gt=0, description="广告组默认出价（美元）")
     keyword_bid: float = Field(..., gt=0, description="关键词出价（美元）")
     format: ExportFormat = Field(default=ExportFormat.XLSX, description="导出格式")
+    models: Optional[List[PhoneModel]] = Field(
+        default=None,
+        min_length=1,
+        description="多型号导出：每个型号生成一个 Campaign/Ad Group（不传则使用已保存的型号）"
+    )
+    match_types: List[MatchType] = Field(
+        default=[MatchType.BROAD],
+        min_length=1,
+        description="每个搜索词生成的匹配类型（如 Broad + Phrase + Exact，每种一行）"
+    )
+    match_type_bid_multipliers: Optional[Dict[MatchType, float]] = Field(
+        default=None,
+        description="各匹配类型的出价倍数（出价 = keyword_bid × 倍数，未指定的为 1.0）"
+    )
+    bid_strategy: BidStrategy = Field(
+        default=BidStrategy.FIXED,
+        description="关键词出价方式：fixed（统一出价）/ rules（按 app/config/bid_rules.yaml 逐词计算）"
+    )
+    max_rows_per_file: Optional[int] = Field(
+        default=None,
+        ge=10,
+        le=1048575,
+        description="单个文件的数据行上限，超过则自动分片并打包为 zip（不传则使用服务端配置）"
+    )
+    max_bytes_per_file: Optional[int] = Field(
+        default=None,
+        ge=64 * 1024,
+        description="单个文件的大小上限（字节，按未压缩行数据估算），超过则自动分片并打包为 zip"
+    )
+
+    @field_validator('match_type_bid_multipliers')
+    @classmethod
+    def validate_bid_multipliers(cls, v: Optional[Dict[MatchType, float]]) -> Optional[Dict[MatchType, float]]:
+        """验证出价倍数范围"""
+        return _check_bid_multipliers(v)
+
+
+def _check_bid_multipliers(v: Optional[Dict[MatchType, float]]) -> Optional[Dict[MatchType, float]]:
+    """出价倍数必须在 (0, 10] 之间（ExportRequest / BatchExportItem 共用）"""
+    if v is None:
+        return v
+    for match_type, multiplier in v.items():
+        if not 0 < multiplier <= 10:
+            raise ValueError(f"{match_type.value} 的出价倍数必须在 (0, 10] 之间")
+    return v
+
+
+class BatchExportOutput(str, Enum):
+    """批量导出输出方式"""
+    SINGLE = "single"  # 所有任务合并到一个 Bulksheet
+    ZIP = "zip"        # 每个任务一个 Bulksheet，打包为 zip
+
+
+class BatchExportItem(BaseModel):
+    """批量导出中的单个任务（预算、匹配类型和出价方式按任务单独设置，与单任务导出一致）"""
+    task_id: str = Field(..., description="任务ID")
+    daily_budget: float = Field(..., gt=0, description="每日预算（美元）")
+    ad_group_default_bid: float = Field(..., gt=0, description="广告组默认出价（美元）")
+    keyword_bid: float = Field(..., gt=0, description="关键词出价（美元）")
+    models: Optional[List[PhoneModel]] = Field(
+        default=None,
+        min_length=1,
+        description="多型号导出：每个型号生成一个 Campaign/Ad Group（不传则使用已保存的型号）"
+    )
+    match_types: List[MatchType] = Field(
+        default=[MatchType.BROAD],
+        min_length=1,
+        description="每个搜索词生成的匹配类型（如 Broad + Phrase + Exact，每种一行）"
+    )
+    match_type_bid_multipliers: Optional[Dict[MatchType, float]] = Field(
+        default=None,
+        description="各匹配类型的出价倍数（出价 = keyword_bid × 倍数，未指定的为 1.0）"
+    )
+    bid_strategy: BidStrategy = Field(
+        default=BidStrategy.FIXED,
+        description="关键词出价方式：fixed（统一出价）/ rules（按 app/config/bid_rules.yaml 逐词计算）"
+    )
+
+    @field_validator('match_type_bid_multipliers')
+    @classmethod
+    def validate_bid_multipliers(cls, v: Optional[Dict[MatchType, float]]) -> Optional[Dict[MatchType, float]]:
+        """验证出价倍数范围"""
+        return _check_bid_multipliers(v)
+
+
+class BatchExportRequest(BaseModel):
+    """批量导出 Bulksheet 请求"""
+    items: List[BatchExportItem] = Field(..., min_length=1, max_length=200, description="要导出的任务列表")
+    format: ExportFormat = Field(default=ExportFormat.XLSX, description="导出格式")
+    output: BatchExportOutput = Field(default=BatchExportOutput.SINGLE, description="输出方式")
+
+
+class BatchExportStatusResponse(BaseModel):
+    """批量导出批次状态"""
+    batch_id: str
+    status: str = Field(..., description="queued / rendering / merging / completed / failed")
+    progress: float = Field(..., description="进度百分比（0-100）")
+    task_count: int
+    file_count: int
+    total_campaigns: int
+    completed_campaigns: int
+    total_rows: int
+    filename: str
+    output_bytes: Optional[int] = None
+    error: Optional[str] = None
+    created_at: str = Field(..., description="创建时间（ISO 8601）")
+    finished_at: Optional[str] = Field(default=None, description="结束时间（ISO 8601）")
@@ -3,7 +3,7 @@ SQLAlchemy ORM 数据库模型
 定义tasks和task_attributes表
 """
 
-from sqlalchemy import Column, String, Integer, Boolean, Text, DateTime, ForeignKey
+from sqlalchemy import Column, String, Integer, Boolean, Text, DateTime, Float, ForeignKey
 from sqlalchemy.dialects.postgresql import UUID as PG_UUID
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
@@ -215,3 +215,87 @@ class SearchTerm(Base):
 
     def __repr__(self):
         return f"<SearchTerm(id={self.id}, term={self.term}, valid={self.is_valid})>"
+
+
+class SearchTermPerformance(Base):
+    """搜索词广告表现表（由亚马逊 Search Term Report 汇总，每个搜索词一行）"""
+    __tablename__ = "search_term_performance"
+
+    id = Column(Integer, primary_key=True, autoincrement=True, comment="主键ID")
+    task_id = Column(
+        String(36),
+        ForeignKey("tasks.task_id", ondelete="CASCADE"),
+        nullable=False,
+        index=True,
+        comment="任务ID"
+    )
+    search_term_id = Column(
+        Integer,
+        ForeignKey("search_terms.id", ondelete="CASCADE"),
+        nullable=False,
+        unique=True,
+        comment="搜索词ID"
+    )
+
+    # 报告汇总指标（同一搜索词在报告中的所有行求和）
+    impressions = Column(Integer, nullable=False, default=0, comment="展示次数")
+    clicks = Column(Integer, nullable=False, default=0, comment="点击次数")
+    spend = Column(Float, nullable=False, default=0.0, comment="花费（美元）")
+    orders = Column(Integer, nullable=False, default=0, comment="订单数")
+    sales = Column(Float, nullable=False, default=0.0, comment="销售额（美元）")
+    label = Column(
+        String(20),
+        nullable=False,
+        comment="表现标签：winner/neutral/low_performer"
+    )
+
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), comment="创建时间")
+    updated_at = Column(
+        DateTime(timezone=True),
+        server_default=func.now(),
+        onupdate=func.now(),
+        comment="更新时间"
+    )
+
+    # 关系
+    search_term = relationship("SearchTerm", foreign_keys=[search_term_id])
+
+    def __repr__(self):
+        return f"<SearchTermPerformance(search_term_id={self.search_term_id}, clicks={self.clicks}, orders={self.orders}, label={self.label})>"
+
+
+class LLMCallLog(Base):
+    """LLM 调用记录（每次 Provider 调用一行，含重试）"""
+    __tablename__ = "llm_call_logs"
+
+    id = Column(Integer, primary_key=True, autoincrement=True, comment="主键ID")
+    call_id = Column(String(36), nullable=False, comment="调用ID")
+
+    # 调用信息
+    name = Column(String(50), nullable=False, index=True, comment="提示词名称：attribute_expert/entity_word_expert")
+    prompt_version = Column(String(20), nullable=False, comment="提示词版本")
+    provider = Column(String(50), nullable=False, comment="调用方：DeepSeekProvider/EntityWordProvider/deepseek_client")
+    model = Column(String(100), nullable=False, comment="模型名称")
+    cassette_mode = Column(String(10), nullable=False, default="off", comment="录制/回放模式：off/record/replay")
+
+    # 结果
+    outcome = Column(String(20), nullable=False, comment="结果：ok/fallback/error")
+    status_code = Column(Integer, comment="最后一次请求的 HTTP 状态码")
+    attempts = Column(Integer, nullable=False, default=0, comment="HTTP 请求次数（含重试）")
+    fallback_reason = Column(String(200), comment="降级原因")
+
+    # 耗时（毫秒）
+    queue_wait_ms = Column(Float, comment="等待连接的时间（所有请求合计）")
+    ttfb_ms = Column(Float, comment="最后一次请求收到响应头的时间")
+    request_ms = Column(Float, comment="HTTP 请求耗时（所有请求合计）")
+    total_ms = Column(Float, nullable=False, comment="调用总耗时（含重试等待和解析）")
+
+    # token 用量（usage 字段，所有请求合计）
+    prompt_tokens = Column(Integer, nullable=False, default=0, comment="输入 token")
+    completion_tokens = Column(Integer, nullable=False, default=0, comment="输出 token")
+    cached_tokens = Column(Integer, nullable=False, default=0, comment="命中提示词缓存的输入 token")
+
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), index=True, comment="创建时间")
+
+    def __repr__(self):
+        return f"<LLMCallLog(name={self.name}, outcome={self.outcome}, total_ms={self.total_ms})>"
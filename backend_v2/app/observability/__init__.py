@@ -0,0 +1,4 @@
+"""
+可观测性
+Prometheus 指标、请求级耗时分解等运行时观测工具
+"""
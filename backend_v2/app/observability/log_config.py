@@ -0,0 +1,151 @@
+"""
+日志配置
+应用日志统一经 logging 输出，不在请求路径上同步写 stdout / stderr：
+
+- 非阻塞：根 logger 只挂一个 QueueHandler，格式化和写出由 QueueListener 后台线程完成；
+  队列满（LOG_QUEUE_SIZE）时丢弃并计数，不阻塞请求
+- JSON 格式（LOG_FORMAT=json，默认）：每行一个 JSON 对象，包含时间、级别、logger、消息、
+  请求 ID（与 X-Request-ID 响应头一致）、extra 传入的字段和异常堆栈；LOG_FORMAT=text 为单行文本
+- 级别：LOG_LEVEL 为默认级别，LOG_LEVELS 按模块覆盖，如
+  "app.services.deepseek_provider=DEBUG,sqlalchemy.engine=WARNING"
+
+用法：
+    logger = logging.getLogger(__name__)
+    logger.info("任务已保存", extra={"task_id": task_id})
+"""
+
+import atexit
+import copy
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+from datetime import datetime, timezone
+from typing import Dict, Optional
+
+from app.observability import timing
+
+# 默认日志级别
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+# 按模块覆盖日志级别：logger=LEVEL，逗号分隔
+LOG_LEVELS = os.getenv("LOG_LEVELS", "")
+# 输出格式：json / text
+LOG_FORMAT = os.getenv("LOG_FORMAT", "json").lower()
+# 日志队列上限（超过则丢弃）
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+
+# LogRecord 自带的属性，其余属性视为 extra 字段
+_RECORD_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime", "request_id"}
+
+
+class JsonFormatter(logging.Formatter):
+    """每条日志格式化为一行 JSON"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        request_id = getattr(record, "request_id", None)
+        if request_id and request_id != "-":
+            entry["request_id"] = request_id
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRS and not key.startswith("_"):
+                entry[key] = value
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class RequestIdFilter(logging.Filter):
+    """在调用方的上下文中记录当前请求 ID（QueueListener 线程中已无法获取）"""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.request_id = timing.get_request_id() or "-"
+        return True
+
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """队列满时丢弃日志并计数（QueueHandler 默认会把异常打印到 stderr）"""
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        """
+        在调用方线程中展开消息参数和异常堆栈（参数对象可能在之后被修改），
+        保留 extra 字段，由后台线程的 Formatter 负责最终格式
+        """
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+_queue_handler: Optional[DroppingQueueHandler] = None
+_listener: Optional[logging.handlers.QueueListener] = None
+
+
+def parse_levels(spec: str) -> Dict[str, str]:
+    """解析 LOG_LEVELS（"a=DEBUG,b.c=WARNING"），忽略格式不正确的项"""
+    levels = {}
+    for item in spec.split(","):
+        name, sep, level = item.partition("=")
+        if sep and name.strip() and level.strip():
+            levels[name.strip()] = level.strip().upper()
+    return levels
+
+
+def setup_logging():
+    """配置根 logger（幂等，应用导入时调用）"""
+    global _queue_handler, _listener
+    if _listener is not None:
+        return
+
+    output = logging.StreamHandler(sys.stderr)
+    if LOG_FORMAT == "text":
+        output.setFormatter(logging.Formatter(
+            "%(asctime)s %(levelname)s %(name)s [%(request_id)s] %(message)s"
+        ))
+    else:
+        output.setFormatter(JsonFormatter())
+
+    _queue_handler = DroppingQueueHandler(queue.Queue(maxsize=LOG_QUEUE_SIZE))
+    _queue_handler.addFilter(RequestIdFilter())
+    _listener = logging.handlers.QueueListener(_queue_handler.queue, output, respect_handler_level=False)
+    _listener.start()
+
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(_queue_handler)
+    root.setLevel(LOG_LEVEL)
+    for name, level in parse_levels(LOG_LEVELS).items():
+        logging.getLogger(name).setLevel(level)
+
+    atexit.register(stop_logging)
+
+
+def stop_logging():
+    """写出队列中剩余的日志并停止后台线程（进程退出时由 atexit 调用）"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
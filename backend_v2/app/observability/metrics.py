@@ -0,0 +1,284 @@
+"""
+Prometheus 指标
+GET /metrics 以 Prometheus 文本格式输出，METRICS_ENABLED=false 时整体关闭（不注册中间件、
+不包装 CRUD 函数、不启动事件循环延迟监控，/metrics 返回 404）
+
+- HTTP：每个路由（按路由模板，如 /api/stage3/tasks/{task_id}/search-terms）的耗时和请求数
+- CRUD：每个 CRUD 函数的耗时（instrument_crud_modules 在导入时包装模块函数）
+- 数据库连接池：连接池大小、已借出、空闲、溢出连接数（抓取时读取，不占用请求路径）
+- LLM：每次 Provider 调用的耗时、结果（ok / fallback / error）、重试次数和 token 用量
+- 导出：每次导出的耗时、行数、字节数（按 thread / process 模式和结果）
+- 响应压缩：按编码的压缩次数、压缩前后字节数，以及跳过压缩的原因（CPU 保护 / 无收益）
+- 事件循环延迟：后台任务定时 sleep，实际唤醒时间与预期的差值
+
+指标保存在进程内存中；多个 uvicorn worker 时每个 worker 单独抓取
+"""
+
+import asyncio
+import functools
+import os
+import time
+from typing import Callable, Dict, Optional
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    disable_created_metrics,
+    generate_latest
+)
+from prometheus_client.core import GaugeMetricFamily
+
+# 是否启用 Prometheus 指标
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() == "true"
+# 事件循环延迟的采样间隔（秒）
+METRICS_LOOP_LAG_INTERVAL = float(os.getenv("METRICS_LOOP_LAG_INTERVAL", "0.5"))
+
+# LLM 调用和导出耗时较长，使用单独的分桶（秒）
+_LONG_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 90, 120, 300, 600)
+_ROW_BUCKETS = (10, 100, 1000, 10000, 100000, 1000000, 10000000)
+_BYTE_BUCKETS = tuple(1024 * 4 ** i for i in range(11))  # 1 KB - 1 GB
+_LAG_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5)
+
+# 不输出 *_created 序列（每个标签组合一行时间戳，抓取内容翻倍）
+disable_created_metrics()
+
+registry = CollectorRegistry(auto_describe=True)
+
+http_request_duration = Histogram(
+    "http_request_duration_seconds", "HTTP 请求耗时", ["method", "route", "status"], registry=registry
+)
+http_requests_in_progress = Gauge(
+    "http_requests_in_progress", "进行中的 HTTP 请求数", ["method"], registry=registry
+)
+crud_duration = Histogram(
+    "crud_duration_seconds", "CRUD 函数耗时（含 ORM 开销）", ["function"], registry=registry
+)
+crud_errors = Counter(
+    "crud_errors_total", "CRUD 函数抛出的异常数", ["function"], registry=registry
+)
+llm_call_duration = Histogram(
+    "llm_call_duration_seconds", "LLM Provider 调用耗时（含重试）", ["name", "outcome"],
+    buckets=_LONG_BUCKETS, registry=registry
+)
+llm_call_attempts = Counter(
+    "llm_call_attempts_total", "发出的 LLM HTTP 请求数（含重试）", ["name"], registry=registry
+)
+llm_tokens = Counter(
+    "llm_tokens_total", "LLM token 用量", ["name", "kind"], registry=registry
+)
+export_duration = Histogram(
+    "export_duration_seconds", "Bulksheet 导出耗时", ["mode", "outcome"],
+    buckets=_LONG_BUCKETS, registry=registry
+)
+export_rows = Histogram(
+    "export_rows", "每次导出的数据行数", ["mode"], buckets=_ROW_BUCKETS, registry=registry
+)
+export_bytes = Histogram(
+    "export_bytes", "每次导出的文件大小（字节）", ["mode"], buckets=_BYTE_BUCKETS, registry=registry
+)
+export_rejected = Counter(
+    "export_rejected_total", "导出队列已满被拒绝的次数", registry=registry
+)
+compression_responses = Counter(
+    "http_compressed_responses_total", "压缩的响应数", ["encoding"], registry=registry
+)
+compression_bytes = Counter(
+    "http_compression_bytes_total", "压缩前（in）和压缩后（out）的响应体字节数", ["encoding", "kind"],
+    registry=registry
+)
+compression_skipped = Counter(
+    "http_compression_skipped_total", "符合条件但未压缩的响应数（busy / load / no_gain）", ["reason"],
+    registry=registry
+)
+event_loop_lag = Histogram(
+    "event_loop_lag_seconds", "事件循环延迟（定时器实际唤醒时间 - 预期时间）",
+    buckets=_LAG_BUCKETS, registry=registry
+)
+event_loop_lag_last = Gauge(
+    "event_loop_lag_last_seconds", "最近一次采样的事件循环延迟", registry=registry
+)
+
+
+class DBPoolCollector:
+    """抓取时读取 SQLAlchemy 连接池状态（SQLite 内存库等没有计数的连接池时不输出）"""
+
+    def __init__(self, engine):
+        self.engine = engine
+
+    def collect(self):
+        pool = self.engine.pool
+        for name, attr, documentation in (
+            ("db_pool_size", "size", "连接池大小"),
+            ("db_pool_checked_out", "checkedout", "已借出的连接数"),
+            ("db_pool_checked_in", "checkedin", "空闲连接数"),
+            ("db_pool_overflow", "overflow", "溢出连接数"),
+        ):
+            method = getattr(pool, attr, None)
+            if method is None:
+                continue
+            yield GaugeMetricFamily(name, documentation, value=method())
+
+
+def register_db_pool(engine) -> None:
+    """注册数据库连接池指标"""
+    if METRICS_ENABLED:
+        registry.register(DBPoolCollector(engine))
+
+
+def render_metrics() -> bytes:
+    """Prometheus 文本格式"""
+    return generate_latest(registry)
+
+
+class MetricsMiddleware:
+    """
+    HTTP 请求耗时中间件（纯 ASGI 实现，不经过 BaseHTTPMiddleware 的额外任务和队列）
+
+    路由标签使用匹配到的路由模板，未匹配的请求归为 "unmatched"，避免路径参数导致标签爆炸
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        status = {"code": 500}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            await send(message)
+
+        in_progress = http_requests_in_progress.labels(method)
+        in_progress.inc()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            route = scope.get("route")
+            http_request_duration.labels(
+                method, getattr(route, "path", "unmatched"), str(status["code"])
+            ).observe(time.perf_counter() - start)
+            in_progress.dec()
+
+
+def _timed_crud(func: Callable, label: str) -> Callable:
+    histogram = crud_duration.labels(label)
+    errors = crud_errors.labels(label)
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        except Exception:
+            errors.inc()
+            raise
+        finally:
+            histogram.observe(time.perf_counter() - start)
+
+    return wrapper
+
+
+def instrument_crud_modules(*modules) -> None:
+    """
+    包装 CRUD 模块中定义的所有公开函数，记录耗时（标签为 "模块.函数"，如 task.get_task）
+
+    调用方通过模块属性访问（crud_task.get_task）时生效；
+    METRICS_ENABLED=false 时不做任何包装
+    """
+    if not METRICS_ENABLED:
+        return
+    for module in modules:
+        short_name = module.__name__.rsplit(".", 1)[-1]
+        for name, value in list(vars(module).items()):
+            if name.startswith("_") or not callable(value) or isinstance(value, type):
+                continue
+            if getattr(value, "__module__", None) != module.__name__ or hasattr(value, "__wrapped__"):
+                continue
+            setattr(module, name, _timed_crud(value, f"{short_name}.{name}"))
+
+
+def observe_llm_call(name: str, outcome: str, seconds: float, attempts: int, usage: Dict[str, int]) -> None:
+    """记录一次 LLM Provider 调用（由 llm_telemetry.track_call 调用）"""
+    if not METRICS_ENABLED:
+        return
+    llm_call_duration.labels(name, outcome).observe(seconds)
+    if attempts:
+        llm_call_attempts.labels(name).inc(attempts)
+    for kind, count in usage.items():
+        if count:
+            llm_tokens.labels(name, kind).inc(count)
+
+
+def observe_export(mode: str, outcome: str, rows: int, output_bytes: int, seconds: float) -> None:
+    """记录一次导出结束（由 ExportMetrics.record_finish 调用）"""
+    if not METRICS_ENABLED:
+        return
+    # 部分失败路径不记录耗时（seconds 为 0），只计入完成的和有耗时的导出
+    if seconds or outcome == "completed":
+        export_duration.labels(mode, outcome).observe(seconds)
+    if outcome == "completed":
+        export_rows.labels(mode).observe(rows)
+        export_bytes.labels(mode).observe(output_bytes)
+
+
+def observe_export_rejected() -> None:
+    if METRICS_ENABLED:
+        export_rejected.inc()
+
+
+def observe_compression(encoding: str, input_bytes: int, output_bytes: int) -> None:
+    """记录一次响应压缩（由 CompressionMiddleware 调用）"""
+    if not METRICS_ENABLED:
+        return
+    compression_responses.labels(encoding).inc()
+    compression_bytes.labels(encoding, "in").inc(input_bytes)
+    compression_bytes.labels(encoding, "out").inc(output_bytes)
+
+
+def observe_compression_skipped(reason: str) -> None:
+    if METRICS_ENABLED:
+        compression_skipped.labels(reason).inc()
+
+
+class EventLoopLagMonitor:
+    """事件循环延迟监控（后台任务）"""
+
+    def __init__(self, interval: float = METRICS_LOOP_LAG_INTERVAL):
+        self.interval = interval
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self):
+        """启动监控（应用启动时调用；METRICS_ENABLED=false 时不启动）"""
+        if METRICS_ENABLED and self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            expected = loop.time() + self.interval
+            await asyncio.sleep(self.interval)
+            lag = max(loop.time() - expected, 0.0)
+            event_loop_lag.observe(lag)
+            event_loop_lag_last.set(lag)
+
+
+loop_lag_monitor = EventLoopLagMonitor()
@@ -0,0 +1,209 @@
+"""
+按需请求性能剖析
+在生产环境对单个请求做性能剖析（不需要重新部署），结果按请求 ID 保存到 PROFILE_DIR
+
+触发条件（满足其一）：
+- 请求头 X-Profile-Token 与环境变量 PROFILE_TOKEN 一致
+- 按 PROFILE_SAMPLE_RATE 随机采样（默认 0，不采样）
+
+剖析器：安装了 pyinstrument 时使用 pyinstrument（采样剖析，开销低，按协程上下文
+区分请求，输出 .html）；否则使用标准库 cProfile（确定性剖析，输出 .prof，可用
+python -m pstats 或 snakeviz 查看）。cProfile 统计的是事件循环线程上的全部调用，
+剖析期间并发的其他请求也会计入，线程池中执行的代码不计入。
+
+同一时间只剖析一个请求（cProfile 不支持同一线程上嵌套），其余请求正常处理、不剖析。
+PROFILE_TOKEN 未设置时，剖析结果的查看接口返回 404。
+"""
+
+import asyncio
+import cProfile
+import hmac
+import json
+import logging
+import os
+import random
+import tempfile
+import time
+import uuid
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from app.observability import timing
+
+try:
+    from pyinstrument import Profiler as PyinstrumentProfiler
+except ImportError:
+    PyinstrumentProfiler = None
+
+logger = logging.getLogger(__name__)
+
+# 触发剖析的令牌（请求头 X-Profile-Token），为空时只能通过采样触发
+PROFILE_TOKEN = os.getenv("PROFILE_TOKEN", "")
+# 随机采样比例（0-1）
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+# 剖析结果目录
+PROFILE_DIR = os.getenv("PROFILE_DIR", os.path.join(tempfile.gettempdir(), "bulksheet_profiles"))
+# 最多保留的剖析结果数（超过时删除最早的）
+PROFILE_MAX_FILES = int(os.getenv("PROFILE_MAX_FILES", "200"))
+# 剖析器：auto（有 pyinstrument 时使用）/ pyinstrument / cprofile
+PROFILER = os.getenv("PROFILER", "auto").lower()
+
+
+def profiling_enabled() -> bool:
+    return bool(PROFILE_TOKEN) or PROFILE_SAMPLE_RATE > 0
+
+
+def token_matches(token: Optional[str]) -> bool:
+    """请求中的令牌是否与 PROFILE_TOKEN 一致（PROFILE_TOKEN 为空时总是 False）"""
+    return bool(PROFILE_TOKEN) and token is not None and hmac.compare_digest(token, PROFILE_TOKEN)
+
+
+def profiler_name() -> str:
+    if PROFILER == "cprofile" or PyinstrumentProfiler is None:
+        return "cprofile"
+    return "pyinstrument"
+
+
+class ProfileStore:
+    """剖析结果的保存、列表和清理（每个请求一个结果文件 + 一个 .json 元数据）"""
+
+    def __init__(self, directory: str = PROFILE_DIR, max_files: int = PROFILE_MAX_FILES):
+        self.directory = Path(directory)
+        self.max_files = max_files
+
+    def list(self, limit: int = 50) -> List[Dict]:
+        """最近的剖析结果元数据（按时间倒序）"""
+        if not self.directory.exists():
+            return []
+        metas = []
+        for path in self.directory.glob("*.json"):
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    metas.append(json.load(f))
+            except (OSError, ValueError):
+                continue
+        metas.sort(key=lambda meta: meta.get("created_at", ""), reverse=True)
+        return metas[:limit]
+
+    def get_path(self, profile_id: str) -> Optional[Path]:
+        """剖析结果文件路径（不存在或 ID 不合法时返回 None）"""
+        if not timing.is_valid_request_id(profile_id):
+            return None
+        meta_path = self.directory / f"{profile_id}.json"
+        if not meta_path.exists():
+            return None
+        with open(meta_path, "r", encoding="utf-8") as f:
+            path = self.directory / json.load(f)["file"]
+        return path if path.exists() else None
+
+    def save(self, profiler, meta: Dict):
+        """写入剖析结果和元数据，并清理超出数量上限的旧结果（在线程中调用）"""
+        self.directory.mkdir(parents=True, exist_ok=True)
+        profile_id = meta["profile_id"]
+        if meta["profiler"] == "pyinstrument":
+            filename = f"{profile_id}.html"
+            with open(self.directory / filename, "w", encoding="utf-8") as f:
+                f.write(profiler.output_html())
+        else:
+            filename = f"{profile_id}.prof"
+            profiler.dump_stats(str(self.directory / filename))
+        meta = {**meta, "file": filename, "size": (self.directory / filename).stat().st_size}
+        with open(self.directory / f"{profile_id}.json", "w", encoding="utf-8") as f:
+            json.dump(meta, f, ensure_ascii=False, indent=2)
+        self._prune()
+
+    def _prune(self):
+        metas = sorted(self.directory.glob("*.json"), key=lambda path: path.stat().st_mtime)
+        for meta_path in metas[:max(len(metas) - self.max_files, 0)]:
+            for path in self.directory.glob(f"{meta_path.stem}.*"):
+                try:
+                    path.unlink()
+                except OSError:
+                    pass
+
+
+profile_store = ProfileStore()
+
+
+class ProfilingMiddleware:
+    """
+    请求剖析中间件（纯 ASGI 实现）
+
+    放在 ServerTimingMiddleware 内层，剖析结果以请求 ID 命名，并通过响应头 X-Profile-Id 返回；
+    剖析覆盖整个请求（含流式导出的发送过程）
+    """
+
+    def __init__(self, app, store: ProfileStore = profile_store):
+        self.app = app
+        self.store = store
+        self._active = False
+
+    def _should_profile(self, scope) -> Optional[str]:
+        """返回触发方式（token / sample），不剖析时返回 None"""
+        if self._active or scope["path"].startswith("/api/debug/profiles"):
+            return None
+        for key, value in scope["headers"]:
+            if key == b"x-profile-token":
+                if token_matches(value.decode("latin-1")):
+                    return "token"
+                break
+        if PROFILE_SAMPLE_RATE > 0 and random.random() < PROFILE_SAMPLE_RATE:
+            return "sample"
+        return None
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        trigger = self._should_profile(scope)
+        if trigger is None:
+            await self.app(scope, receive, send)
+            return
+
+        profile_id = timing.get_request_id() or uuid.uuid4().hex
+        status = {"code": 500}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+                message = {
+                    **message,
+                    "headers": [*message.get("headers", []), (b"x-profile-id", profile_id.encode("latin-1"))]
+                }
+            await send(message)
+
+        name = profiler_name()
+        if name == "pyinstrument":
+            profiler = PyinstrumentProfiler(async_mode="enabled")
+            profiler.start()
+        else:
+            profiler = cProfile.Profile()
+            profiler.enable()
+        self._active = True
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            if name == "pyinstrument":
+                profiler.stop()
+            else:
+                profiler.disable()
+            self._active = False
+            route = scope.get("route")
+            meta = {
+                "profile_id": profile_id,
+                "profiler": name,
+                "trigger": trigger,
+                "method": scope["method"],
+                "path": scope["path"],
+                "route": getattr(route, "path", None),
+                "status": status["code"],
+                "duration_ms": round((time.perf_counter() - started) * 1000, 1),
+                "created_at": datetime.now(timezone.utc).isoformat()
+            }
+            try:
+                # 写文件不占用事件循环
+                await asyncio.to_thread(self.store.save, profiler, meta)
+            except Exception:
+                logger.exception("保存剖析结果失败: %s", profile_id)
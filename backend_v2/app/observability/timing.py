@@ -0,0 +1,245 @@
+"""
+请求级耗时分解（Server-Timing）
+每个 HTTP 请求按阶段累计耗时，通过 Server-Timing 响应头（浏览器开发者工具 → Network → Timing）
+和结构化日志输出，定位慢请求的时间花在了哪里
+
+阶段：
+- llm：LLM Provider 调用（llm_telemetry.track_call 自动记录，含重试）
+- db_read / db_write：SQL 执行耗时（instrument_engine 在连接上按语句类型自动记录）
+- serialize：处理函数返回后到响应头发出前（响应模型校验 + JSON 编码，TimedRoute 自动记录）
+- render：导出文件渲染（xlsx / csv / tsv / zip，导出执行器记录）
+- compress：响应压缩（CompressionMiddleware 记录，不计入 serialize）
+- 处理函数内的其他阶段：with timing.phase("名称"): ...
+
+流式响应（导出）的响应头在渲染开始前发出，render 只出现在请求结束时的日志中。
+请求 ID 取自请求头 X-Request-ID（不合法时重新生成），写入响应头并可由 get_request_id() 获取，
+日志记录也会带上该请求 ID（log_config.RequestIdFilter）。
+"""
+
+import contextvars
+import functools
+import inspect
+import logging
+import os
+import re
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional
+
+from fastapi.routing import APIRoute
+from sqlalchemy import event
+
+# 是否启用 Server-Timing 响应头和请求耗时日志
+SERVER_TIMING_ENABLED = os.getenv("SERVER_TIMING_ENABLED", "true").lower() == "true"
+
+logger = logging.getLogger(__name__)
+
+# 客户端传入的请求 ID 只接受这些字符（避免日志注入和超长值）
+_REQUEST_ID_PATTERN = re.compile(r"^[A-Za-z0-9._-]{1,64}$")
+
+# 写语句的首个关键字（其余按读语句统计）
+_WRITE_KEYWORDS = ("INSERT", "UPDATE", "DELETE", "REPLACE", "UPSERT", "MERGE", "CREATE", "DROP", "ALTER")
+
+
+class RequestTiming:
+    """一个请求的各阶段耗时（毫秒）和次数"""
+
+    def __init__(self, request_id: str):
+        self.request_id = request_id
+        self.started = time.perf_counter()
+        self.endpoint_done: Optional[float] = None
+        self.phases: Dict[str, float] = {}
+        self.counts: Dict[str, int] = {}
+        # 同步处理函数在线程池中执行，asyncio.to_thread 也会带上同一个对象
+        self._lock = threading.Lock()
+
+    def record(self, name: str, ms: float):
+        with self._lock:
+            self.phases[name] = self.phases.get(name, 0.0) + ms
+            self.counts[name] = self.counts.get(name, 0) + 1
+
+    def elapsed_ms(self) -> float:
+        return (time.perf_counter() - self.started) * 1000
+
+    def server_timing_header(self) -> str:
+        """Server-Timing 响应头：各阶段耗时 + 截至响应头发出时的总耗时"""
+        with self._lock:
+            items = [
+                f'{name};dur={ms:.1f};desc="count={self.counts[name]}"'
+                for name, ms in self.phases.items()
+            ]
+        items.append(f"total;dur={self.elapsed_ms():.1f}")
+        return ", ".join(items)
+
+
+_current_timing: contextvars.ContextVar = contextvars.ContextVar("request_timing", default=None)
+
+
+def current_timing() -> Optional[RequestTiming]:
+    """当前请求的耗时记录（不在请求中时返回 None）"""
+    return _current_timing.get()
+
+
+def is_valid_request_id(request_id: str) -> bool:
+    """请求 ID 只允许字母、数字和 ._-，最长 64 个字符"""
+    return bool(_REQUEST_ID_PATTERN.match(request_id))
+
+
+def get_request_id() -> Optional[str]:
+    """当前请求的请求 ID（不在请求中时返回 None）"""
+    timing = _current_timing.get()
+    return timing.request_id if timing is not None else None
+
+
+def record(name: str, ms: float):
+    """累计当前请求某个阶段的耗时（不在请求中时忽略）"""
+    timing = _current_timing.get()
+    if timing is not None:
+        timing.record(name, ms)
+
+
+@contextmanager
+def phase(name: str) -> Iterator[None]:
+    """
+    统计一段代码的耗时，计入当前请求的 name 阶段
+
+    用法：
+        with timing.phase("combine"):
+            terms = select_top_k(...)
+    """
+    timing = _current_timing.get()
+    if timing is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timing.record(name, (time.perf_counter() - start) * 1000)
+
+
+def instrument_engine(engine) -> None:
+    """在 SQLAlchemy 引擎上按语句类型记录 db_read / db_write 耗时"""
+    if not SERVER_TIMING_ENABLED:
+        return
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if _current_timing.get() is not None:
+            conn.info.setdefault("timing_started", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        timing = _current_timing.get()
+        started = conn.info.get("timing_started")
+        if timing is None or not started:
+            return
+        keyword = statement.lstrip()[:7].upper()
+        name = "db_write" if keyword.startswith(_WRITE_KEYWORDS) else "db_read"
+        timing.record(name, (time.perf_counter() - started.pop()) * 1000)
+
+
+def _mark_endpoint_done():
+    timing = _current_timing.get()
+    if timing is not None:
+        timing.endpoint_done = time.perf_counter()
+
+
+def _wrap_endpoint(endpoint: Callable) -> Callable:
+    """记录处理函数返回的时间（签名经 functools.wraps 保留，FastAPI 依赖解析不受影响）"""
+    if inspect.iscoroutinefunction(endpoint):
+        @functools.wraps(endpoint)
+        async def async_wrapper(*args, **kwargs):
+            try:
+                return await endpoint(*args, **kwargs)
+            finally:
+                _mark_endpoint_done()
+        return async_wrapper
+
+    @functools.wraps(endpoint)
+    def wrapper(*args, **kwargs):
+        try:
+            return endpoint(*args, **kwargs)
+        finally:
+            _mark_endpoint_done()
+    return wrapper
+
+
+class TimedRoute(APIRoute):
+    """记录处理函数返回时间的路由，用于计算 serialize 阶段（app.router.route_class = TimedRoute）"""
+
+    def __init__(self, path: str, endpoint: Callable, **kwargs):
+        if SERVER_TIMING_ENABLED:
+            endpoint = _wrap_endpoint(endpoint)
+        super().__init__(path, endpoint, **kwargs)
+
+
+class ServerTimingMiddleware:
+    """
+    请求耗时中间件（纯 ASGI 实现）
+
+    为每个请求创建 RequestTiming，在响应头中写入 Server-Timing 和 X-Request-ID，
+    请求结束后输出一条 JSON 日志（含流式响应发送期间的阶段）
+    """
+
+    def __init__(self, app, timing_allow_origins: Optional[List[str]] = None):
+        """
+        Args:
+            app: ASGI 应用
+            timing_allow_origins: 允许读取 Server-Timing 的跨域来源（写入 Timing-Allow-Origin）
+        """
+        self.app = app
+        self.timing_allow_origins = [origin.strip() for origin in timing_allow_origins or [] if origin.strip()]
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request_id = None
+        for key, value in scope["headers"]:
+            if key == b"x-request-id":
+                candidate = value.decode("latin-1")
+                if is_valid_request_id(candidate):
+                    request_id = candidate
+                break
+        timing = RequestTiming(request_id or uuid.uuid4().hex)
+        token = _current_timing.set(timing)
+        status = {"code": 500}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+                if timing.endpoint_done is not None:
+                    # 响应头在压缩完成后才发出，扣除压缩耗时
+                    serialize_ms = (time.perf_counter() - timing.endpoint_done) * 1000 - timing.phases.get("compress", 0.0)
+                    timing.record("serialize", max(serialize_ms, 0.0))
+                headers = list(message.get("headers", []))
+                headers.append((b"server-timing", timing.server_timing_header().encode("latin-1")))
+                headers.append((b"x-request-id", timing.request_id.encode("latin-1")))
+                if self.timing_allow_origins:
+                    headers.append((b"timing-allow-origin", ", ".join(self.timing_allow_origins).encode("latin-1")))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            route = scope.get("route")
+            total_ms = round(timing.elapsed_ms(), 1)
+            logger.info(
+                "%s %s %s %.1fms", scope["method"], scope["path"], status["code"], total_ms,
+                extra={
+                    "event": "request_timing",
+                    "method": scope["method"],
+                    "path": scope["path"],
+                    "route": getattr(route, "path", None),
+                    "status": status["code"],
+                    "total_ms": total_ms,
+                    "phases": {name: round(ms, 1) for name, ms in timing.phases.items()},
+                    "counts": timing.counts
+                }
+            )
+            _current_timing.reset(token)
@@ -4,7 +4,7 @@ Stage 3 Pydantic Schemas
 """
 
 from pydantic import BaseModel, Field, field_validator
-from typing import List, Optional
+from typing import List, Literal, Optional
 from datetime import datetime
 
 
@@ -105,6 +105,15 @@ class SearchTermGenerateOptions(BaseModel):
     """生成搜索词的选项"""
     max_length: int = Field(default=80, ge=50, le=200, description="最大字符长度")
     deduplicate: bool = Field(default=True, description="是否去重")
+    selection: Literal["reject", "top_k"] = Field(
+        default="reject",
+        description="组合数超过上限时的处理方式：reject 拒绝生成；top_k 按评分保留前 max_terms 个"
+    )
+    max_terms: int = Field(default=1000, ge=1, le=1000, description="最多生成的搜索词数量")
+    max_attributes: int = Field(
+        default=1, ge=1, le=4,
+        description="每个搜索词最多叠加的属性词数量（大于 1 时按属性词类别顺序组合多个属性词）"
+    )
 
 
 class SearchTermGenerateRequest(BaseModel):
@@ -132,6 +141,7 @@ class SearchTermMetadata(BaseModel):
     invalid_terms: int
     attribute_count: int
     entity_word_count: int
+    dropped_count: int = 0  # top_k 模式下未保留的组合数量（含超长组合）
 
 
 class SearchTermGenerateResponse(BaseModel):
@@ -165,3 +175,42 @@ class SearchTermBatchDeleteResponse(BaseModel):
     deleted_count: int
     remaining_count: int
     message: str
+
+
+# ========== 搜索词表现（Search Term Report）相关 Schemas ==========
+
+class SearchTermReportResponse(BaseModel):
+    """导入 Search Term Report 的响应"""
+    task_id: str
+    report_rows: int
+    matched_rows: int
+    matched_terms: int
+    label_counts: dict  # {"winner": 3, "neutral": 12, "low_performer": 5, "no_data": 60}
+    pruned_count: int
+    message: str
+
+
+class SearchTermPerformanceItem(BaseModel):
+    """单个搜索词及其广告表现（报告中没有数据的搜索词 label 为 no_data，指标为 0）"""
+    id: int
+    term: str
+    attribute_word: str
+    entity_word: str
+    impressions: int = 0
+    clicks: int = 0
+    spend: float = 0.0
+    orders: int = 0
+    sales: float = 0.0
+    ctr: Optional[float] = None   # 点击率 = clicks / impressions
+    acos: Optional[float] = None  # 花费 / 销售额
+    label: str
+
+
+class SearchTermPerformanceListResponse(BaseModel):
+    """按表现排序的搜索词列表响应"""
+    task_id: str
+    search_terms: List[SearchTermPerformanceItem]
+    total: int
+    page: int
+    page_size: int
+    label: Optional[str] = None
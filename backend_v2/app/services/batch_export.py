@@ -0,0 +1,186 @@
+"""
+批量导出管理
+多个任务一次导出为一个 Bulksheet（或每个任务一个文件打包为 zip）
+
+批量导出耗时较长，不占用 HTTP 连接：提交后在后台渲染到临时文件，
+客户端轮询进度，完成后再下载。批次状态保存在进程内存中，过期后连同文件一起清理。
+"""
+
+import asyncio
+import os
+import tempfile
+import threading
+import time
+import uuid
+from typing import Dict, List, Optional, Tuple
+
+from app.services.export_executor import ExportExecutor, count_job_rows
+
+# 批次结果保留时间（秒），过期后删除文件
+EXPORT_BATCH_TTL_SECONDS = float(os.getenv("EXPORT_BATCH_TTL_SECONDS", "3600"))
+
+
+class BatchExportManager:
+    """批量导出批次登记与后台执行"""
+
+    def __init__(
+        self,
+        executor: ExportExecutor,
+        output_dir: Optional[str] = None,
+        ttl: float = EXPORT_BATCH_TTL_SECONDS
+    ):
+        """
+        Args:
+            executor: 导出执行器（与单任务导出共享名额和进程池）
+            output_dir: 批次输出文件目录
+            ttl: 批次结果保留时间（秒）
+        """
+        self.executor = executor
+        self.output_dir = output_dir or tempfile.gettempdir()
+        self.ttl = ttl
+        self._batches: Dict[str, Dict] = {}
+        self._tasks: Dict[str, asyncio.Task] = {}
+        self._lock = threading.Lock()
+
+    def submit(
+        self,
+        files: List[Tuple[str, Dict]],
+        filename: str,
+        as_zip: bool,
+        media_type: str,
+        task_count: int
+    ) -> Dict:
+        """
+        登记批次并在后台开始渲染
+
+        Args:
+            files: [(zip 内文件名, 导出任务), ...]；非 zip 输出时只有一个
+            filename: 下载文件名
+            as_zip: 是否打包为 zip
+            media_type: 下载文件的 Content-Type
+            task_count: 批次包含的任务数
+
+        Returns:
+            批次状态快照
+
+        Raises:
+            ExportQueueFullError: 进行中的导出数已达上限
+        """
+        self.cleanup_expired()
+
+        # 提交时即占用导出名额，队列已满时由调用方返回 503
+        total_rows = sum(count_job_rows(job) for _, job in files)
+        slot = self.executor.reserve(total_rows)
+
+        batch_id = uuid.uuid4().hex
+        extension = "zip" if as_zip else files[0][1]["format"]
+        batch = {
+            "batch_id": batch_id,
+            "status": "queued",
+            "filename": filename,
+            "media_type": media_type,
+            "path": os.path.join(self.output_dir, f"bulksheet_batch_{batch_id}.{extension}"),
+            "task_count": task_count,
+            "file_count": len(files),
+            "total_campaigns": sum(len(job["campaigns"]) for _, job in files),
+            "completed_campaigns": 0,
+            "total_rows": total_rows,
+            "output_bytes": None,
+            "error": None,
+            "created_at": time.time(),
+            "finished_at": None
+        }
+        with self._lock:
+            self._batches[batch_id] = batch
+
+        # 保留任务引用，避免后台任务被垃圾回收
+        task = asyncio.get_running_loop().create_task(self._run(batch_id, files, as_zip, slot))
+        self._tasks[batch_id] = task
+        task.add_done_callback(lambda _: self._tasks.pop(batch_id, None))
+        return self.get(batch_id)
+
+    async def _run(self, batch_id: str, files: List[Tuple[str, Dict]], as_zip: bool, slot) -> None:
+        """后台渲染批次"""
+        batch = self._batches[batch_id]
+
+        def on_progress(completed: int, total: int) -> None:
+            with self._lock:
+                batch["completed_campaigns"] = completed
+                batch["status"] = "merging" if completed >= total else "rendering"
+
+        with self._lock:
+            batch["status"] = "rendering"
+
+        try:
+            result = await self.executor.render_to_file(
+                files, batch["path"], as_zip=as_zip, on_progress=on_progress, slot=slot
+            )
+        except Exception as e:
+            with self._lock:
+                batch["status"] = "failed"
+                batch["error"] = str(e) or e.__class__.__name__
+                batch["finished_at"] = time.time()
+            return
+
+        with self._lock:
+            batch["status"] = "completed"
+            batch["output_bytes"] = result["bytes"]
+            batch["finished_at"] = time.time()
+
+    def get(self, batch_id: str) -> Optional[Dict]:
+        """
+        获取批次状态快照
+
+        Returns:
+            批次状态（含 progress 百分比），不存在或已过期返回 None
+        """
+        self.cleanup_expired()
+        with self._lock:
+            batch = self._batches.get(batch_id)
+            if batch is None:
+                return None
+            snapshot = dict(batch)
+
+        total = snapshot["total_campaigns"]
+        if snapshot["status"] == "completed":
+            snapshot["progress"] = 100.0
+        else:
+            # 合并阶段按 99% 计，完成后才到 100%
+            snapshot["progress"] = round(min(99.0, snapshot["completed_campaigns"] * 100.0 / total), 1) if total else 0.0
+        return snapshot
+
+    def cleanup_expired(self) -> int:
+        """
+        删除已过期批次（结束超过 ttl 秒）及其文件
+
+        Returns:
+            清理的批次数
+        """
+        now = time.time()
+        with self._lock:
+            expired = [
+                batch for batch in self._batches.values()
+                if batch["finished_at"] is not None and now - batch["finished_at"] > self.ttl
+            ]
+            for batch in expired:
+                del self._batches[batch["batch_id"]]
+
+        for batch in expired:
+            try:
+                os.remove(batch["path"])
+            except OSError:
+                pass
+        return len(expired)
+
+    def shutdown(self) -> None:
+        """取消进行中的批次并删除所有批次文件"""
+        for task in list(self._tasks.values()):
+            task.cancel()
+        with self._lock:
+            batches = list(self._batches.values())
+            self._batches.clear()
+        for batch in batches:
+            try:
+                os.remove(batch["path"])
+            except OSError:
+                pass
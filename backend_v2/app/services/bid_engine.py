@@ -0,0 +1,141 @@
+"""
+关键词出价引擎
+按出价规则表（app/config/bid_rules.yaml）为所有搜索词一次性计算出价
+
+出价 = keyword_bid × 星级系数 × 长度系数 × 匹配类型系数，限制在 [min_bid, max_bid] 并按 bid_increment 取整。
+全部计算在 NumPy 数组上完成（查表 + 广播），不需要逐行执行 Python 规则：
+10 万个搜索词 × 3 种匹配类型的数组计算约 10 毫秒，含输入/输出列表转换约 50 毫秒
+（python -m benchmarks.bench_bids）。
+"""
+
+from operator import itemgetter
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+STARS_SOURCES = ("min", "max", "mean", "attribute", "entity")
+
+
+class BidEngine:
+    """向量化出价引擎"""
+
+    def __init__(self, rules: dict):
+        """
+        Args:
+            rules: 出价规则（load_bid_rules 的结果）
+
+        Raises:
+            ValueError: 规则格式不正确
+        """
+        self.stars_source = rules.get("stars_source", "min")
+        if self.stars_source not in STARS_SOURCES:
+            raise ValueError(f"stars_source 必须是 {STARS_SOURCES} 之一: {self.stars_source}")
+
+        # 星级系数查找表：下标 0-5（0 星按 1 星处理）
+        stars_multipliers = {int(k): float(v) for k, v in rules["stars_multipliers"].items()}
+        self._stars_table = np.array(
+            [stars_multipliers.get(max(stars, 1), 1.0) for stars in range(6)],
+            dtype=np.float64
+        )
+
+        # 长度区间：按上限排序，最后一个区间可以不设上限
+        length_rules = rules["length_rules"]
+        bounded = sorted(
+            (rule for rule in length_rules if rule.get("max_length") is not None),
+            key=lambda rule: rule["max_length"]
+        )
+        unbounded = [rule for rule in length_rules if rule.get("max_length") is None]
+        self._length_bounds = np.array([rule["max_length"] for rule in bounded], dtype=np.int64)
+        self._length_multipliers = np.array(
+            [float(rule["multiplier"]) for rule in bounded]
+            + [float(unbounded[0]["multiplier"]) if unbounded else 1.0],
+            dtype=np.float64
+        )
+
+        self.match_type_multipliers = {
+            str(k): float(v) for k, v in rules.get("match_type_multipliers", {}).items()
+        }
+        self.min_bid = float(rules.get("min_bid", 0.02))
+        self.max_bid = float(rules.get("max_bid", 1000.0))
+        self.bid_increment = float(rules.get("bid_increment", 0.01))
+        if self.min_bid > self.max_bid:
+            raise ValueError(f"min_bid ({self.min_bid}) 不能大于 max_bid ({self.max_bid})")
+
+    def combine_stars(self, attribute_stars: np.ndarray, entity_stars: np.ndarray) -> np.ndarray:
+        """按 stars_source 合并属性词和本体词星级（结果四舍五入为 0-5 的整数）"""
+        if self.stars_source == "min":
+            stars = np.minimum(attribute_stars, entity_stars)
+        elif self.stars_source == "max":
+            stars = np.maximum(attribute_stars, entity_stars)
+        elif self.stars_source == "mean":
+            stars = np.rint((attribute_stars + entity_stars) / 2.0)
+        elif self.stars_source == "attribute":
+            stars = attribute_stars
+        else:
+            stars = entity_stars
+        return np.clip(stars, 0, 5).astype(np.int64)
+
+    def compute(
+        self,
+        base_bid: float,
+        attribute_stars: Sequence[int],
+        entity_stars: Sequence[int],
+        lengths: Sequence[int],
+        match_types: Sequence[str],
+        match_type_multipliers: Optional[Dict[str, float]] = None
+    ) -> np.ndarray:
+        """
+        计算所有搜索词在各匹配类型下的出价
+
+        Args:
+            base_bid: 基础出价（ExportRequest.keyword_bid）
+            attribute_stars: 每个搜索词的属性词星级
+            entity_stars: 每个搜索词的本体词星级
+            lengths: 每个搜索词的字符长度
+            match_types: 导出的匹配类型（列顺序）
+            match_type_multipliers: 请求指定的匹配类型系数（优先于规则表）
+
+        Returns:
+            形状为 (搜索词数, 匹配类型数) 的出价数组
+        """
+        attribute_stars = np.asarray(attribute_stars, dtype=np.float64)
+        entity_stars = np.asarray(entity_stars, dtype=np.float64)
+        lengths = np.asarray(lengths, dtype=np.int64)
+
+        stars_factor = self._stars_table[self.combine_stars(attribute_stars, entity_stars)]
+        # 第一个 max_length >= 长度 的区间；超过所有上限时落到不限长度区间
+        length_factor = self._length_multipliers[np.searchsorted(self._length_bounds, lengths, side="left")]
+
+        multipliers = {**self.match_type_multipliers, **(match_type_multipliers or {})}
+        match_factor = np.array([multipliers.get(mt, 1.0) for mt in match_types], dtype=np.float64)
+
+        bids = (base_bid * stars_factor * length_factor)[:, np.newaxis] * match_factor[np.newaxis, :]
+        bids = np.rint(bids / self.bid_increment) * self.bid_increment
+        return np.clip(np.round(bids, 2), self.min_bid, self.max_bid)
+
+    def compute_rows(
+        self,
+        base_bid: float,
+        features: Sequence[Sequence],
+        match_types: Sequence[str],
+        match_type_multipliers: Optional[Dict[str, float]] = None
+    ) -> List[List[float]]:
+        """
+        由查询结果计算出价，返回普通 Python 列表（可跨进程传递，也可直接写入单元格）
+
+        Args:
+            features: [(term, length, attribute_stars, entity_stars), ...]
+
+        Returns:
+            每个搜索词一行，每行按 match_types 顺序排列的出价
+        """
+        if not features:
+            return []
+        count = len(features)
+        lengths = np.fromiter(map(itemgetter(1), features), dtype=np.int64, count=count)
+        attribute_stars = np.fromiter(map(itemgetter(2), features), dtype=np.float64, count=count)
+        entity_stars = np.fromiter(map(itemgetter(3), features), dtype=np.float64, count=count)
+        bids = self.compute(
+            base_bid, attribute_stars, entity_stars, lengths, match_types, match_type_multipliers
+        )
+        return bids.tolist()
@@ -0,0 +1,533 @@
+"""
+Bulksheet 导入与差异导出
+解析从亚马逊广告后台下载的 Bulksheet，与任务当前的搜索词/本体词对比，
+只导出需要变更的行（create / update / archive），用于调整已上线的 Campaign
+
+- 读取：xlsx 直接用 iterparse 流式解析工作表 XML，只取单元格值（比 openpyxl 只读模式快约 2 倍），
+  csv / tsv 使用 csv 模块逐行读取，都不加载整个工作表；csv 的解析速度约为 xlsx 的 10 倍，大文件建议下载为 csv
+- 索引：关键词按 (Campaign, Ad Group, 文本, 匹配类型) 建哈希表，Campaign 否定词按 (Campaign, 文本)
+- 对比：期望行由 BulksheetGenerator.iter_rows 生成，逐行查表（O(行数)）
+
+update / archive 行需要 Keyword ID，请上传从广告后台下载的 Bulksheet（而不是本系统导出的文件）。
+"""
+
+import csv
+import io
+import os
+import posixpath
+import zipfile
+from operator import itemgetter
+from typing import IO, Dict, Iterable, Iterator, List, NamedTuple, Optional, Sequence, Set, Tuple
+from xml.etree.ElementTree import ParseError, iterparse
+
+from app.services.bulksheet_generator import BulksheetGenerator
+
+# 上传 Bulksheet 的大小上限（字节），默认 200 MB
+BULKSHEET_IMPORT_MAX_BYTES = int(os.getenv("BULKSHEET_IMPORT_MAX_BYTES", str(200 * 1024 * 1024)))
+
+# 包含 Sponsored Products 数据的工作表（按优先顺序，都不存在时使用第一个工作表）
+SHEET_NAMES = ("Sponsored Products Campaigns", "Bulksheet")
+
+# OOXML 命名空间
+_NS_MAIN = "{http://schemas.openxmlformats.org/spreadsheetml/2006/main}"
+_NS_REL = "{http://schemas.openxmlformats.org/officeDocument/2006/relationships}"
+_NS_PKG_REL = "{http://schemas.openxmlformats.org/package/2006/relationships}"
+
+# 需要读取的列（表头规范化后的名称，见 normalize_header）
+_FIELDS = (
+    "entity", "campaign id", "ad group id", "keyword id", "campaign name",
+    "ad group name", "state", "bid", "keyword text", "match type"
+)
+
+# 出价差异小于该值视为未变化（出价保留 2 位小数）
+_BID_TOLERANCE = 0.005
+
+_COLUMN = BulksheetGenerator.COLUMN_INDEX
+
+
+class BulksheetImportError(ValueError):
+    """Bulksheet 无法解析（格式不支持、缺少必需列）"""
+    pass
+
+
+class ExistingKeyword(NamedTuple):
+    """Bulksheet 中已存在的关键词 / Campaign 否定词"""
+    keyword_id: str
+    campaign_id: str
+    ad_group_id: str
+    campaign_name: str
+    ad_group_name: str
+    text: str
+    match_type: str
+    state: str
+    bid: Optional[float]
+
+
+class BulksheetIndex:
+    """已上线实体的哈希索引"""
+
+    def __init__(self):
+        # Campaign Name → Campaign ID
+        self.campaigns: Dict[str, str] = {}
+        # (Campaign Name, Ad Group Name) → Ad Group ID
+        self.ad_groups: Dict[Tuple[str, str], str] = {}
+        # (Campaign Name, Ad Group Name) → {(规范化文本, 规范化匹配类型): 关键词}
+        self.keywords: Dict[Tuple[str, str], Dict[Tuple[str, str], ExistingKeyword]] = {}
+        # Campaign Name → {规范化文本: 否定词}
+        self.negative_keywords: Dict[str, Dict[str, ExistingKeyword]] = {}
+        # 读取的数据行数（不含表头）
+        self.row_count = 0
+
+
+def normalize_header(name) -> str:
+    """表头规范化：小写，去掉亚马逊下载文件中的 "(Informational only)" 后缀"""
+    name = str(name or "").strip()
+    if name.endswith("(Informational only)"):
+        name = name[:-len("(Informational only)")].strip()
+    return name.lower()
+
+
+def normalize_keyword(text) -> str:
+    """关键词规范化：小写并合并空白（亚马逊按不区分大小写匹配关键词）"""
+    return " ".join(str(text).lower().split())
+
+
+def normalize_match_type(match_type) -> str:
+    """匹配类型规范化："Negative Exact" / "negativeExact" → "negativeexact" """
+    return str(match_type or "").replace(" ", "").lower()
+
+
+def _text(value) -> str:
+    """单元格值 → 字符串（数字 ID 不带小数点）"""
+    if value is None:
+        return ""
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value).strip()
+
+
+def _bid(value) -> Optional[float]:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _column_index(reference: str) -> int:
+    """单元格坐标的列下标（"T5" → 19）"""
+    index = 0
+    for char in reference:
+        if char.isdigit():
+            break
+        index = index * 26 + ord(char) - 64
+    return index - 1
+
+
+def _find_sheet_path(archive: zipfile.ZipFile) -> str:
+    """按 SHEET_NAMES 选择工作表，返回其在 zip 中的路径"""
+    with archive.open("xl/workbook.xml") as f:
+        sheets = [
+            (elem.get("name"), elem.get(f"{_NS_REL}id"))
+            for _, elem in iterparse(f)
+            if elem.tag == f"{_NS_MAIN}sheet"
+        ]
+    if not sheets:
+        raise BulksheetImportError("xlsx 文件中没有工作表")
+    with archive.open("xl/_rels/workbook.xml.rels") as f:
+        targets = {
+            elem.get("Id"): elem.get("Target")
+            for _, elem in iterparse(f)
+            if elem.tag == f"{_NS_PKG_REL}Relationship"
+        }
+
+    names = dict(sheets)
+    relation_id = next((names[name] for name in SHEET_NAMES if name in names), sheets[0][1])
+    target = targets[relation_id]
+    if target.startswith("/"):
+        return target.lstrip("/")
+    return posixpath.normpath(posixpath.join("xl", target))
+
+
+def _read_shared_strings(archive: zipfile.ZipFile) -> List[str]:
+    """共享字符串表（富文本按各段文本拼接）"""
+    if "xl/sharedStrings.xml" not in archive.namelist():
+        return []
+    strings = []
+    with archive.open("xl/sharedStrings.xml") as f:
+        for _, elem in iterparse(f):
+            if elem.tag == f"{_NS_MAIN}si":
+                strings.append("".join(t.text or "" for t in elem.iter(f"{_NS_MAIN}t")))
+                elem.clear()
+    return strings
+
+
+def iter_xlsx_rows(file: IO[bytes]) -> Iterator[List]:
+    """
+    流式读取 xlsx 工作表（只取单元格的值，不解析样式）
+
+    支持共享字符串、inlineStr 和带/不带坐标（r 属性）的单元格；
+    数字单元格返回原始文本，由调用方按需转换。
+
+    Yields:
+        每行的单元格值列表（空单元格为 None）
+
+    Raises:
+        BulksheetImportError: 不是有效的 xlsx 文件
+    """
+    try:
+        archive = zipfile.ZipFile(file)
+    except zipfile.BadZipFile as e:
+        raise BulksheetImportError("无法读取 xlsx 文件（不是有效的 zip）") from e
+
+    with archive:
+        try:
+            sheet_path = _find_sheet_path(archive)
+            shared_strings = _read_shared_strings(archive)
+        except (KeyError, ParseError) as e:
+            raise BulksheetImportError(f"无法读取 xlsx 文件（缺少 {e}）") from e
+
+        sheet_data_tag = f"{_NS_MAIN}sheetData"
+        row_tag = f"{_NS_MAIN}row"
+        cell_tag = f"{_NS_MAIN}c"
+        value_tag = f"{_NS_MAIN}v"
+        text_tag = f"{_NS_MAIN}t"
+        columns: Dict[str, int] = {}
+        sheet_data = None
+
+        with archive.open(sheet_path) as f:
+            try:
+                for event, elem in iterparse(f, events=("start", "end")):
+                    if event == "start":
+                        if elem.tag == sheet_data_tag:
+                            sheet_data = elem
+                        continue
+                    if elem.tag != row_tag:
+                        continue
+
+                    row: List = []
+                    for cell in elem.iter(cell_tag):
+                        reference = cell.get("r")
+                        if reference is not None:
+                            letters = reference.rstrip("0123456789")
+                            position = columns.get(letters)
+                            if position is None:
+                                position = columns[letters] = _column_index(letters)
+                            if position > len(row):
+                                row.extend([None] * (position - len(row)))
+
+                        cell_type = cell.get("t")
+                        if cell_type == "inlineStr":
+                            value = "".join(t.text or "" for t in cell.iter(text_tag))
+                        else:
+                            value_elem = cell.find(value_tag)
+                            value = value_elem.text if value_elem is not None else None
+                            if cell_type == "s" and value is not None:
+                                value = shared_strings[int(value)]
+                        row.append(value)
+
+                    # 释放已处理的行，内存占用与行数无关
+                    if sheet_data is not None:
+                        sheet_data.clear()
+                    yield row
+            except ParseError as e:
+                raise BulksheetImportError(f"无法解析 xlsx 工作表: {e}") from e
+
+
+def iter_bulksheet_rows(file: IO[bytes], filename: str) -> Iterator[Sequence]:
+    """
+    逐行读取上传的 Bulksheet（第一行为表头）
+
+    Args:
+        file: 二进制文件对象（需可 seek，xlsx 为 zip 格式）
+        filename: 原始文件名（按扩展名判断格式）
+
+    Yields:
+        每行的单元格值
+
+    Raises:
+        BulksheetImportError: 文件格式不支持或无法读取
+    """
+    extension = os.path.splitext(filename or "")[1].lower().lstrip(".")
+    if extension == "xlsx":
+        yield from iter_xlsx_rows(file)
+    elif extension in ("csv", "tsv"):
+        text = io.TextIOWrapper(file, encoding="utf-8-sig", newline="")
+        try:
+            yield from csv.reader(text, delimiter="\t" if extension == "tsv" else ",")
+        except UnicodeDecodeError as e:
+            raise BulksheetImportError("csv / tsv 文件必须是 UTF-8 编码") from e
+        finally:
+            # 不关闭调用方的文件对象
+            text.detach()
+    else:
+        raise BulksheetImportError(f"不支持的文件格式: {filename}（仅支持 xlsx / csv / tsv）")
+
+
+def index_bulksheet(rows: Iterable[Sequence], campaign_names: Optional[Set[str]] = None) -> BulksheetIndex:
+    """
+    为 Bulksheet 中的 Campaign / Ad Group / 关键词 / Campaign 否定词建立索引
+
+    已归档（archived）的关键词不参与索引：仍需要的关键词会重新创建。
+
+    Args:
+        rows: iter_bulksheet_rows 的结果
+        campaign_names: 只索引这些 Campaign（None 表示全部），减少大文件的内存占用
+
+    Returns:
+        BulksheetIndex
+
+    Raises:
+        BulksheetImportError: 文件为空或缺少必需列
+    """
+    rows = iter(rows)
+    header = next(rows, None)
+    if header is None:
+        raise BulksheetImportError("Bulksheet 为空")
+
+    positions: Dict[str, int] = {}
+    for position, name in enumerate(header):
+        positions.setdefault(normalize_header(name), position)
+    missing = [field for field in _FIELDS if field not in positions]
+    if missing:
+        raise BulksheetImportError(f"Bulksheet 缺少必需列: {', '.join(missing)}")
+
+    entity_position = positions["entity"]
+    get_fields = itemgetter(*(positions[field] for field in _FIELDS))
+    width = max(positions[field] for field in _FIELDS) + 1
+
+    index = BulksheetIndex()
+    campaign_names_by_id: Dict[str, str] = {}
+    ad_group_names_by_id: Dict[str, str] = {}
+
+    for row in rows:
+        index.row_count += 1
+        if len(row) <= entity_position:
+            continue
+        # 先按 Entity 过滤（Product Ad、投放位置等行直接跳过）
+        entity = str(row[entity_position] or "").strip().lower()
+        if entity not in ("keyword", "campaign negative keyword", "campaign", "ad group"):
+            continue
+        if len(row) < width:
+            row = tuple(row) + (None,) * (width - len(row))
+
+        (_, campaign_id, ad_group_id, keyword_id, campaign_name,
+         ad_group_name, state, bid, text, match_type) = map(_text, get_fields(row))
+
+        # 亚马逊下载的关键词行可能只有 ID，按前面的 Campaign / Ad Group 行补全名称
+        campaign_name = campaign_name or campaign_names_by_id.get(campaign_id, "")
+        if campaign_names is not None and campaign_name not in campaign_names:
+            continue
+
+        if entity == "campaign":
+            index.campaigns[campaign_name] = campaign_id or campaign_name
+            campaign_names_by_id[campaign_id] = campaign_name
+            continue
+
+        ad_group_name = ad_group_name or ad_group_names_by_id.get(ad_group_id, "")
+        if entity == "ad group":
+            index.ad_groups[(campaign_name, ad_group_name)] = ad_group_id or ad_group_name
+            ad_group_names_by_id[ad_group_id] = ad_group_name
+            continue
+
+        if state.lower() == "archived":
+            continue
+
+        existing = ExistingKeyword(
+            keyword_id, campaign_id, ad_group_id, campaign_name,
+            ad_group_name, text, match_type, state, _bid(bid)
+        )
+        if entity == "keyword":
+            index.keywords.setdefault((campaign_name, ad_group_name), {})[
+                (normalize_keyword(text), normalize_match_type(match_type))
+            ] = existing
+        else:
+            index.negative_keywords.setdefault(campaign_name, {})[normalize_keyword(text)] = existing
+
+    return index
+
+
+def _replace(row: Tuple, cells: Dict[str, object]) -> Tuple:
+    """替换行中的指定列"""
+    row = list(row)
+    for name, value in cells.items():
+        row[_COLUMN[name]] = value
+    return tuple(row)
+
+
+def _create_update_row(existing: ExistingKeyword, bid: float) -> Tuple:
+    """关键词出价变化：update 行（只修改 Bid，State 保持原值）"""
+    return BulksheetGenerator.compile_row({
+        "Product": "Sponsored Products",
+        "Entity": "Keyword",
+        "Operation": "update",
+        "Campaign ID": existing.campaign_id,
+        "Ad Group ID": existing.ad_group_id,
+        "Keyword ID": existing.keyword_id,
+        "Campaign Name": existing.campaign_name,
+        "Ad Group Name": existing.ad_group_name,
+        "State": existing.state,
+        "Bid": bid,
+        "Keyword Text": existing.text,
+        "Match Type": existing.match_type,
+    })
+
+
+def _create_archive_row(existing: ExistingKeyword, entity: str) -> Tuple:
+    """任务中已不存在的关键词 / 否定词：archive 行"""
+    return BulksheetGenerator.compile_row({
+        "Product": "Sponsored Products",
+        "Entity": entity,
+        "Operation": "archive",
+        "Campaign ID": existing.campaign_id,
+        "Ad Group ID": existing.ad_group_id,
+        "Keyword ID": existing.keyword_id,
+        "Campaign Name": existing.campaign_name,
+        "Ad Group Name": existing.ad_group_name,
+        "State": "archived",
+        "Keyword Text": existing.text,
+        "Match Type": existing.match_type,
+    })
+
+
+def iter_campaign_diff(
+    generator: BulksheetGenerator,
+    index: BulksheetIndex,
+    keywords: Iterable[str],
+    negative_keywords: Iterable[str],
+    keyword_bids: Optional[Iterable[Sequence[float]]] = None,
+    archive_missing: bool = True,
+    counts: Optional[Dict[str, int]] = None
+) -> Iterator[Tuple]:
+    """
+    对比单个 Campaign 的期望行与已上线实体，只生成需要变更的行
+
+    - Campaign 不存在：整体 create（与普通导出相同）
+    - Ad Group 不存在：create Ad Group / Product Ad，引用已有的 Campaign ID
+    - 关键词不存在：create；已存在但出价不同：update；任务中已删除：archive（archive_missing=True 时）
+    - Campaign 否定词没有出价：只有 create / archive
+
+    Args:
+        generator: 该 Campaign 的 BulksheetGenerator
+        index: index_bulksheet 的结果
+        keywords / negative_keywords / keyword_bids: 同 BulksheetGenerator.iter_rows
+        archive_missing: 是否归档任务中已不存在的关键词和否定词
+        counts: 累加 created / updated / archived / unchanged 计数
+
+    Yields:
+        31 元素的行元组（不含表头）
+    """
+    if counts is None:
+        counts = {}
+    for name in ("created", "updated", "archived", "unchanged"):
+        counts.setdefault(name, 0)
+
+    campaign_name = generator.campaign_name
+    ad_group_name = generator.ad_group_name
+    campaign_id = index.campaigns.get(campaign_name)
+    if campaign_id is None:
+        for row in generator.iter_rows(keywords, negative_keywords, keyword_bids=keyword_bids):
+            counts["created"] += 1
+            yield row
+        return
+
+    ad_group_id = index.ad_groups.get((campaign_name, ad_group_name))
+    if ad_group_id is None:
+        # 跳过 Campaign 行，Ad Group / Product Ad 引用已有的 Campaign ID
+        for row in list(generator.iter_rows((), ()))[1:]:
+            counts["created"] += 1
+            yield _replace(row, {"Campaign ID": campaign_id})
+        ad_group_id = ad_group_name
+
+    existing_keywords = index.keywords.get((campaign_name, ad_group_name), {})
+    existing_negatives = index.negative_keywords.get(campaign_name, {})
+    seen_keywords: Set[Tuple[str, str]] = set()
+    seen_negatives: Set[str] = set()
+    ids = {"Campaign ID": campaign_id, "Ad Group ID": ad_group_id}
+
+    entity_column = _COLUMN["Entity"]
+    text_column = _COLUMN["Keyword Text"]
+    match_type_column = _COLUMN["Match Type"]
+    bid_column = _COLUMN["Bid"]
+
+    desired = generator.iter_rows(
+        keywords, negative_keywords, include_structure=False, keyword_bids=keyword_bids
+    )
+    for row in desired:
+        if row[entity_column] == "Keyword":
+            key = (normalize_keyword(row[text_column]), normalize_match_type(row[match_type_column]))
+            existing = existing_keywords.get(key)
+            if existing is None:
+                counts["created"] += 1
+                yield _replace(row, ids)
+                continue
+            seen_keywords.add(key)
+            bid = row[bid_column]
+            if existing.bid is not None and abs(existing.bid - bid) < _BID_TOLERANCE:
+                counts["unchanged"] += 1
+            else:
+                counts["updated"] += 1
+                yield _create_update_row(existing, bid)
+        else:
+            key = normalize_keyword(row[text_column])
+            if key in existing_negatives:
+                seen_negatives.add(key)
+                counts["unchanged"] += 1
+            else:
+                counts["created"] += 1
+                yield _replace(row, ids)
+
+    if not archive_missing:
+        return
+    for key, existing in existing_keywords.items():
+        if key not in seen_keywords:
+            counts["archived"] += 1
+            yield _create_archive_row(existing, "Keyword")
+    for key, existing in existing_negatives.items():
+        if key not in seen_negatives:
+            counts["archived"] += 1
+            yield _create_archive_row(existing, "Campaign negative keyword")
+
+
+def diff_bulksheet(
+    file: IO[bytes],
+    filename: str,
+    campaigns: List[Dict],
+    archive_missing: bool = True
+) -> Tuple[List[Tuple], Dict[str, int]]:
+    """
+    解析上传的 Bulksheet 并生成所有 Campaign 的差异行
+
+    Args:
+        file: 上传的 Bulksheet 文件对象
+        filename: 原始文件名
+        campaigns: build_campaign 的结果（每个型号一个）
+        archive_missing: 是否归档任务中已不存在的关键词和否定词
+
+    Returns:
+        (含表头的差异行列表, 计数 {created, updated, archived, unchanged, existing_rows})
+
+    Raises:
+        BulksheetImportError: 文件无法解析
+    """
+    from app.services.export_executor import make_campaign_generator
+
+    generators = [make_campaign_generator(campaign) for campaign in campaigns]
+    index = index_bulksheet(
+        iter_bulksheet_rows(file, filename),
+        campaign_names={generator.campaign_name for generator in generators}
+    )
+
+    counts: Dict[str, int] = {}
+    rows = [BulksheetGenerator.HEADER]
+    for generator, campaign in zip(generators, campaigns):
+        rows.extend(iter_campaign_diff(
+            generator,
+            index,
+            campaign["keywords"],
+            campaign["negative_keywords"],
+            keyword_bids=campaign.get("keyword_bids"),
+            archive_missing=archive_missing,
+            counts=counts
+        ))
+    counts["existing_rows"] = index.row_count
+    return rows, counts
@@ -3,11 +3,13 @@ Bulksheet生成服务
 生成符合Amazon Advertising规范的Bulksheet Excel文件
 """
 
+import itertools
 import openpyxl
 from io import BytesIO
-from typing import List, Dict
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
 from datetime import datetime
-from app.models_db import Task, SearchTerm, EntityWord
+from app.models_db import Task
+from app.services.bulksheet_writers import get_writer, EXPORT_CHUNK_SIZE
 
 
 class BulksheetGenerator:
@@ -26,48 +28,238 @@ class BulksheetGenerator:
         "Shopper Cohort Percentage", "Shopper Cohort Type"
     ]
 
-    def __init__(self, task: Task, product_info: dict, budget_info: dict):
+    # 表头行（不可变，写入器直接消费）
+    HEADER = tuple(COLUMNS)
+
+    # 列名 → 列下标
+    COLUMN_INDEX = {name: index for index, name in enumerate(COLUMNS)}
+
+    # 关键词匹配类型（Bulksheet 中的写法）
+    MATCH_TYPES = ("Broad", "Phrase", "Exact")
+
+    # 每个 Campaign 开头的结构行数（Campaign / Ad Group / Product Ad）
+    STRUCTURE_ROWS = 3
+    # Amazon 关键词最低出价（美元），keyword_bid × 倍数低于该值时按该值导出
+    MIN_BID = 0.02
+    # Bid / Keyword Text 列下标（相邻）
+    BID_COLUMN = 19
+    KEYWORD_TEXT_COLUMN = 20
+
+    def __init__(
+        self,
+        task: Task,
+        product_info: dict,
+        budget_info: dict,
+        match_types: Optional[Sequence[str]] = None,
+        bid_multipliers: Optional[Dict[str, float]] = None,
+        name_suffix: str = ""
+    ):
         """
         Args:
             task: Task 对象（包含 concept）
             product_info: {sku, asin, model}
             budget_info: {daily_budget, ad_group_default_bid, keyword_bid}
+            match_types: 每个关键词生成的匹配类型（按顺序），默认只有 Broad
+            bid_multipliers: 各匹配类型的出价倍数（未指定的为 1.0），出价 = keyword_bid × 倍数
+            name_suffix: Campaign Name / Ad Group Name 的后缀（分片导出的后续分片，如 " part02"）
         """
         self.task = task
         self.product_info = product_info
         self.budget_info = budget_info
-        self.campaign_name = self._generate_campaign_name()
-        self.ad_group_name = self._generate_ad_group_name()
+        self.match_types = tuple(match_types or ("Broad",))
+        self.bid_multipliers = bid_multipliers or {}
+        self.campaign_name = self._generate_campaign_name() + name_suffix
+        self.ad_group_name = self._generate_ad_group_name() + name_suffix
+        self._build_templates()
 
-    def generate_excel(
+    def _build_templates(self) -> None:
+        """
+        预先生成各实体类型的不可变行模板
+
+        同一 Campaign 内，除 Keyword Text（以及逐词出价时的 Bid）外所有列都相同：
+        - 结构行（Campaign / Ad Group / Product Ad）整行预先生成，直接复用同一个元组
+        - Keyword / Negative Keyword 行拆成 (Keyword Text 之前的列, 之后的列)，
+          每行只需拼接 前缀 + (关键词,) + 后缀，不再逐列填充
+        """
+        self._structure_rows = (
+            self._create_campaign_row(),
+            self._create_ad_group_row(),
+            self._create_product_ad_row()
+        )
+        self._keyword_templates: List[Tuple[Tuple, Tuple]] = [
+            self._split_template(self._create_keyword_row("", match_type, self._keyword_bid(match_type)))
+            for match_type in self.match_types
+        ]
+        # 逐词出价用：前缀再去掉 Bid 列，拼接 (出价, 关键词)
+        self._keyword_bid_templates: List[Tuple[Tuple, Tuple]] = [
+            (prefix[:self.BID_COLUMN], suffix) for prefix, suffix in self._keyword_templates
+        ]
+        self._negative_template = self._split_template(self._create_campaign_negative_keyword_row(""))
+
+    @classmethod
+    def _split_template(cls, row: Tuple) -> Tuple[Tuple, Tuple]:
+        """拆分行模板为 (Keyword Text 之前的列, Keyword Text 之后的列)"""
+        return row[:cls.KEYWORD_TEXT_COLUMN], row[cls.KEYWORD_TEXT_COLUMN + 1:]
+
+    @classmethod
+    def compile_row(cls, cells: Dict[str, object]) -> Tuple:
+        """
+        按列名填充生成 31 列的不可变行
+
+        Args:
+            cells: {列名: 值}，未指定的列为空字符串
+
+        Returns:
+            31 元素的行元组
+        """
+        row = [""] * len(cls.COLUMNS)
+        for name, value in cells.items():
+            row[cls.COLUMN_INDEX[name]] = value
+        return tuple(row)
+
+    def _keyword_bid(self, match_type: str) -> float:
+        """匹配类型对应的关键词出价（保留 2 位小数，不低于 MIN_BID；不设上限，按用户出价导出）"""
+        multiplier = self.bid_multipliers.get(match_type, 1.0)
+        bid = self.budget_info["keyword_bid"]
+        if multiplier != 1.0:
+            bid = round(bid * multiplier, 2)
+        return max(bid, self.MIN_BID)
+
+    def iter_rows(
         self,
-        search_terms: List[SearchTerm],
-        entity_words: List[EntityWord]
-    ) -> BytesIO:
-        """生成 Excel 文件到内存"""
-        workbook = openpyxl.Workbook()
-        sheet = workbook.active
-        sheet.title = "Bulksheet"
+        keywords: Iterable[str],
+        negative_keywords: Iterable[str],
+        include_structure: bool = True,
+        keyword_bids: Optional[Iterable[Sequence[float]]] = None
+    ) -> Iterator[Tuple]:
+        """
+        按 Bulksheet 行顺序逐行生成数据（不含表头）
 
-        # 1. 写入表头
-        sheet.append(self.COLUMNS)
+        每行是 31 个元素的普通元组，由预生成的模板拼接而成，不创建任何 Cell 对象，
+        可被任意写入器（Excel / 流式写入）直接消费。
 
-        # 2. 写入 Campaign 行
-        sheet.append(self._create_campaign_row())
+        Args:
+            keywords: 有效搜索词文本（SearchTerm.term）
+            negative_keywords: 本体词文本（EntityWord.entity_word，用作 Campaign Negative Keyword）
+            include_structure: 是否输出 Campaign / Ad Group / Product Ad 行
+                （只比对关键词行时为 False，见 bulksheet_diff）
+            keyword_bids: 每个关键词在各匹配类型下的出价（与 keywords 一一对应，见 BidEngine）；
+                不传则所有关键词使用 keyword_bid × 匹配类型倍数
 
-        # 3. 写入 Ad Group 行
-        sheet.append(self._create_ad_group_row())
+        Yields:
+            31 元素的行元组
+        """
+        # 1-3. Campaign / Ad Group / Product Ad 行
+        if include_structure:
+            yield from self._structure_rows
 
-        # 4. 写入 Product Ad 行
-        sheet.append(self._create_product_ad_row())
+        # 4. Keyword 行（每个关键词按 match_types 各一行，默认只有 Broad）
+        templates = self._keyword_templates
+        if keyword_bids is not None:
+            bid_templates = self._keyword_bid_templates
+            for keyword, bids in zip(keywords, keyword_bids):
+                for (prefix, suffix), bid in zip(bid_templates, bids):
+                    yield prefix + (bid, keyword) + suffix
+        elif len(templates) == 1:
+            prefix, suffix = templates[0]
+            for keyword in keywords:
+                yield prefix + (keyword,) + suffix
+        else:
+            for keyword in keywords:
+                for prefix, suffix in templates:
+                    yield prefix + (keyword,) + suffix
 
-        # 5. 写入 Keyword 行（Broad match）
-        for st in search_terms:
-            sheet.append(self._create_keyword_row(st.term))
+        # 5. Campaign Negative Keyword 行（Campaign Negative Exact）
+        prefix, suffix = self._negative_template
+        for negative_keyword in negative_keywords:
+            yield prefix + (negative_keyword,) + suffix
 
-        # 6. 写入 Campaign Negative Keyword 行（Campaign Negative Exact）
-        for ew in entity_words:
-            sheet.append(self._create_campaign_negative_keyword_row(ew.entity_word))
+    def iter_sheet_rows(
+        self,
+        keywords: Iterable[str],
+        negative_keywords: Iterable[str],
+        keyword_bids: Optional[Iterable[Sequence[float]]] = None
+    ) -> Iterator[Tuple]:
+        """
+        生成完整工作表的行（表头 + 数据行），可直接交给任意写入器的 stream / iter_fragments
+
+        Args:
+            keywords: 有效搜索词文本
+            negative_keywords: 本体词文本
+            keyword_bids: 每个关键词在各匹配类型下的出价（见 iter_rows）
+
+        Yields:
+            行元组（第一行为表头）
+        """
+        return itertools.chain(
+            (self.HEADER,),
+            self.iter_rows(keywords, negative_keywords, keyword_bids=keyword_bids)
+        )
+
+    def estimate_row_bytes(
+        self,
+        keywords: Iterable[str],
+        negative_keywords: Iterable[str],
+        export_format: str = "xlsx"
+    ) -> Iterator[int]:
+        """
+        按 iter_rows 的顺序估算每行编码后的大小（字节，未压缩，用于按大小分片）
+
+        结构行精确编码；关键词行 = 模板行固定部分 + 文本 UTF-8 长度
+        （忽略 XML 转义/CSV 引号带来的少量差异），不需要逐行编码。
+
+        Yields:
+            每行的估算字节数
+        """
+        writer = get_writer(export_format)
+        for row in self._structure_rows:
+            yield len(writer.encode_rows([row]))
+
+        # 用单字符模板行计算固定部分（空字符串会被编码为空单元格，结构不同）
+        keyword_bases = [
+            len(writer.encode_rows([prefix + ("x",) + suffix])) - 1
+            for prefix, suffix in self._keyword_templates
+        ]
+        for keyword in keywords:
+            text_bytes = len(keyword.encode("utf-8"))
+            for keyword_base in keyword_bases:
+                yield keyword_base + text_bytes
+
+        prefix, suffix = self._negative_template
+        negative_base = len(writer.encode_rows([prefix + ("x",) + suffix])) - 1
+        for negative_keyword in negative_keywords:
+            yield negative_base + len(negative_keyword.encode("utf-8"))
+
+    def generate_excel(
+        self,
+        keywords: Iterable[str],
+        negative_keywords: Iterable[str],
+        write_only: bool = True
+    ) -> BytesIO:
+        """
+        生成 Excel 文件到内存
+
+        Args:
+            keywords: 有效搜索词文本
+            negative_keywords: 本体词文本
+            write_only: 是否使用 openpyxl 只写模式（默认开启）
+                - True: 行数据直接序列化，内存占用与行数无关
+                - False: 普通 Workbook（每个单元格一个对象），仅用于对比基准
+
+        Returns:
+            包含 xlsx 内容的 BytesIO（已 seek 到开头）
+        """
+        if write_only:
+            workbook = openpyxl.Workbook(write_only=True)
+            sheet = workbook.create_sheet(title="Bulksheet")
+        else:
+            workbook = openpyxl.Workbook()
+            sheet = workbook.active
+            sheet.title = "Bulksheet"
+
+        # 写入表头和数据行（Campaign / Ad Group / Product Ad / Keyword / Negative Keyword）
+        for row in self.iter_sheet_rows(keywords, negative_keywords):
+            sheet.append(row)
 
         # 保存到内存
         buffer = BytesIO()
@@ -76,79 +268,104 @@ class BulksheetGenerator:
 
         return buffer
 
-    def _create_campaign_row(self) -> list:
-        """创建 Campaign 行（31个元素的列表）
+    def stream(
+        self,
+        keywords: Iterable[str],
+        negative_keywords: Iterable[str],
+        export_format: str = "xlsx",
+        chunk_size: int = EXPORT_CHUNK_SIZE
+    ) -> Iterator[bytes]:
+        """
+        流式生成 Bulksheet 文件
+
+        行数据边生成边编码输出，不在内存中保留完整文件，也不创建中间 Workbook，
+        适合直接交给 StreamingResponse（首字节无需等待整个文件生成）。
+
+        Args:
+            keywords: 有效搜索词文本
+            negative_keywords: 本体词文本
+            export_format: 导出格式（xlsx / csv / tsv）
+            chunk_size: 每个输出块的目标大小（字节）
+
+        Yields:
+            文件字节块
+        """
+        writer = get_writer(export_format)
+        return writer.stream(self.iter_sheet_rows(keywords, negative_keywords), chunk_size)
+
+    def _create_campaign_row(self) -> Tuple:
+        """创建 Campaign 行（31个元素的元组）
 
         注意：基于成功案例 - Campaign ID 和 Campaign Name 都填写
         """
-        row = [""] * 31
-        row[0] = "Sponsored Products"  # Product
-        row[1] = "Campaign"             # Entity
-        row[2] = "create"               # Operation
-        row[3] = self.campaign_name     # Campaign ID - 填写Campaign Name！
-        row[9] = self.campaign_name     # Campaign Name
-        row[13] = "Manual"              # Targeting Type
-        row[14] = "enabled"             # State
-        row[15] = self.budget_info["daily_budget"]  # Daily Budget
-        return row
-
-    def _create_ad_group_row(self) -> list:
+        return self.compile_row({
+            "Product": "Sponsored Products",
+            "Entity": "Campaign",
+            "Operation": "create",
+            "Campaign ID": self.campaign_name,      # 填写Campaign Name！
+            "Campaign Name": self.campaign_name,
+            "Targeting Type": "Manual",
+            "State": "enabled",
+            "Daily Budget": self.budget_info["daily_budget"],
+        })
+
+    def _create_ad_group_row(self) -> Tuple:
         """创建 Ad Group 行
 
         注意：基于成功案例 - 所有4列都填写（ID和Name都填）
         """
-        row = [""] * 31
-        row[0] = "Sponsored Products"
-        row[1] = "Ad Group"
-        row[2] = "create"
-        row[3] = self.campaign_name     # Campaign ID
-        row[4] = self.ad_group_name     # Ad Group ID
-        row[9] = self.campaign_name     # Campaign Name
-        row[10] = self.ad_group_name    # Ad Group Name
-        row[13] = "Manual"
-        row[14] = "enabled"
-        row[18] = self.budget_info["ad_group_default_bid"]
-        return row
-
-    def _create_product_ad_row(self) -> list:
+        return self.compile_row({
+            "Product": "Sponsored Products",
+            "Entity": "Ad Group",
+            "Operation": "create",
+            "Campaign ID": self.campaign_name,
+            "Ad Group ID": self.ad_group_name,
+            "Campaign Name": self.campaign_name,
+            "Ad Group Name": self.ad_group_name,
+            "Targeting Type": "Manual",
+            "State": "enabled",
+            "Ad Group Default Bid": self.budget_info["ad_group_default_bid"],
+        })
+
+    def _create_product_ad_row(self) -> Tuple:
         """创建 Product Ad 行
 
         注意：基于成功案例 - 所有4列都填写（ID和Name都填）
         """
-        row = [""] * 31
-        row[0] = "Sponsored Products"
-        row[1] = "Product Ad"
-        row[2] = "create"
-        row[3] = self.campaign_name     # Campaign ID
-        row[4] = self.ad_group_name     # Ad Group ID
-        row[9] = self.campaign_name     # Campaign Name
-        row[10] = self.ad_group_name    # Ad Group Name
-        row[13] = "Manual"
-        row[14] = "enabled"
-        row[16] = self.product_info["sku"]   # SKU
-        row[17] = self.product_info["asin"]  # ASIN
-        return row
-
-    def _create_keyword_row(self, keyword_text: str) -> list:
-        """创建 Keyword 行（Broad match）
+        return self.compile_row({
+            "Product": "Sponsored Products",
+            "Entity": "Product Ad",
+            "Operation": "create",
+            "Campaign ID": self.campaign_name,
+            "Ad Group ID": self.ad_group_name,
+            "Campaign Name": self.campaign_name,
+            "Ad Group Name": self.ad_group_name,
+            "Targeting Type": "Manual",
+            "State": "enabled",
+            "SKU": self.product_info["sku"],
+            "ASIN": self.product_info["asin"],
+        })
+
+    def _create_keyword_row(self, keyword_text: str, match_type: str = "Broad", bid: Optional[float] = None) -> Tuple:
+        """创建 Keyword 行（默认 Broad match）
 
         注意：基于成功案例 - 所有4列都填写（ID和Name都填）
         """
-        row = [""] * 31
-        row[0] = "Sponsored Products"
-        row[1] = "Keyword"
-        row[2] = "create"
-        row[3] = self.campaign_name     # Campaign ID
-        row[4] = self.ad_group_name     # Ad Group ID
-        row[9] = self.campaign_name     # Campaign Name
-        row[10] = self.ad_group_name    # Ad Group Name
-        row[14] = "enabled"
-        row[19] = self.budget_info["keyword_bid"]  # Bid
-        row[20] = keyword_text                      # Keyword Text
-        row[23] = "Broad"                           # Match Type (大写B)
-        return row
-
-    def _create_campaign_negative_keyword_row(self, keyword_text: str) -> list:
+        return self.compile_row({
+            "Product": "Sponsored Products",
+            "Entity": "Keyword",
+            "Operation": "create",
+            "Campaign ID": self.campaign_name,
+            "Ad Group ID": self.ad_group_name,
+            "Campaign Name": self.campaign_name,
+            "Ad Group Name": self.ad_group_name,
+            "State": "enabled",
+            "Bid": self.budget_info["keyword_bid"] if bid is None else bid,
+            "Keyword Text": keyword_text,
+            "Match Type": match_type,               # 首字母大写：Broad / Phrase / Exact
+        })
+
+    def _create_campaign_negative_keyword_row(self, keyword_text: str) -> Tuple:
         """创建 Campaign Negative Keyword 行（Negative Exact）
 
         注意：
@@ -158,19 +375,19 @@ class BulksheetGenerator:
         4. Entity使用"Campaign negative keyword"区分campaign级别
         5. Match Type使用"Negative Exact"（不是"Campaign Negative Exact"）
         """
-        row = [""] * 31
-        row[0] = "Sponsored Products"
-        row[1] = "Campaign negative keyword"  # Entity - 明确指定campaign级别
-        row[2] = "create"
-        row[3] = self.campaign_name     # Campaign ID
-        row[4] = self.ad_group_name     # Ad Group ID - 实际必须填写！
-        row[9] = self.campaign_name     # Campaign Name
-        row[10] = self.ad_group_name    # Ad Group Name - 实际必须填写！
-        row[14] = "enabled"
-        # row[19] = Bid 留空（negative keyword 不需要出价）
-        row[20] = keyword_text                  # Keyword Text
-        row[23] = "Negative Exact"              # Match Type - 标准格式
-        return row
+        return self.compile_row({
+            "Product": "Sponsored Products",
+            "Entity": "Campaign negative keyword",  # 明确指定campaign级别
+            "Operation": "create",
+            "Campaign ID": self.campaign_name,
+            "Ad Group ID": self.ad_group_name,      # 实际必须填写！
+            "Campaign Name": self.campaign_name,
+            "Ad Group Name": self.ad_group_name,    # 实际必须填写！
+            "State": "enabled",
+            # Bid 留空（negative keyword 不需要出价）
+            "Keyword Text": keyword_text,
+            "Match Type": "Negative Exact",         # 标准格式
+        })
 
     def _generate_campaign_name(self) -> str:
         """生成 Campaign Name"""
@@ -180,12 +397,18 @@ class BulksheetGenerator:
         """生成 Ad Group Name"""
         return f"{self.task.concept} {self.product_info['model']}"
 
-    def generate_filename(self) -> str:
+    def generate_filename(self, extension: str = "xlsx", campaign_count: int = 1) -> str:
         """
         生成文件名
-        格式：bulksheet_{campaign_name}_{timestamp}.xlsx
+        格式：bulksheet_{campaign_name}_{timestamp}.{extension}
+        多型号导出：bulksheet_{sku}_{concept}_{n}_models_{timestamp}.{extension}
         """
-        # 将 campaign_name 中的空格替换为下划线
-        safe_campaign_name = self.campaign_name.replace(" ", "_")
+        if campaign_count > 1:
+            name = f"{self.product_info['sku']} {self.task.concept} {campaign_count} models"
+        else:
+            name = self.campaign_name
+
+        # 将空格替换为下划线
+        safe_name = name.replace(" ", "_")
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        return f"bulksheet_{safe_campaign_name}_{timestamp}.xlsx"
+        return f"bulksheet_{safe_name}_{timestamp}.{extension}"
@@ -0,0 +1,365 @@
+"""
+Bulksheet 流式写入器
+直接输出 OOXML（xlsx）或 CSV/TSV 字节流，边生成行边发送，内存占用受 chunk_size 限制
+"""
+
+import csv
+import io
+import os
+import re
+import time
+import zipfile
+from typing import Iterable, Iterator, Sequence, Tuple
+
+# 每次向客户端发送的块大小（字节），可通过环境变量调整
+EXPORT_CHUNK_SIZE = int(os.getenv("EXPORT_CHUNK_SIZE", str(64 * 1024)))
+
+# 每批编码的行数：批量拼接字符串比逐行写入 zip 快得多
+ENCODE_BATCH_ROWS = 500
+
+# XML 1.0 不允许的控制字符
+_ILLEGAL_XML_CHARS = re.compile(r"[\x00-\x08\x0b\x0c\x0e-\x1f]")
+
+
+class _ChunkSink(io.RawIOBase):
+    """
+    不可 seek 的内存写入目标
+
+    zipfile 检测到目标不可 seek 时会改用 data descriptor 记录大小，
+    因此压缩数据可以边写边取走，无需先生成完整文件。
+    """
+
+    def __init__(self):
+        self._chunks = []
+        self._pending = 0
+        self._position = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return False
+
+    def tell(self) -> int:
+        return self._position
+
+    def write(self, data) -> int:
+        data = bytes(data)
+        self._chunks.append(data)
+        self._pending += len(data)
+        self._position += len(data)
+        return len(data)
+
+    @property
+    def pending(self) -> int:
+        """尚未取走的字节数"""
+        return self._pending
+
+    def drain(self) -> bytes:
+        """取走所有已写入的字节"""
+        data = b"".join(self._chunks)
+        self._chunks = []
+        self._pending = 0
+        return data
+
+
+def _escape_text(text: str) -> str:
+    """XML 文本转义（并移除非法控制字符）"""
+    text = _ILLEGAL_XML_CHARS.sub("", text)
+    return text.replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;")
+
+
+class XlsxStreamWriter:
+    """
+    轻量级 xlsx 流式写入器
+
+    - 单元格使用 inlineStr，不需要共享字符串表（无需等全部数据写完）
+    - 省略行/列坐标（r 属性），空单元格写为 <c/> 占位，行尾空单元格直接省略
+    - 重复出现的文本单元格（Campaign Name、Entity 等）缓存编码结果
+    """
+
+    media_type = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+    extension = "xlsx"
+
+    # 单元格编码缓存上限（超过后清空，防止唯一值撑大内存）
+    CELL_CACHE_LIMIT = 4096
+
+    CONTENT_TYPES = (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/xl/workbook.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+        '<Override PartName="/xl/worksheets/sheet1.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+        '<Override PartName="/xl/styles.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.styles+xml"/>'
+        '</Types>'
+    )
+
+    ROOT_RELS = (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+        'Target="xl/workbook.xml"/>'
+        '</Relationships>'
+    )
+
+    WORKBOOK_RELS = (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" '
+        'Target="worksheets/sheet1.xml"/>'
+        '<Relationship Id="rId2" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/styles" '
+        'Target="styles.xml"/>'
+        '</Relationships>'
+    )
+
+    STYLES = (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+        '<styleSheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+        '<fonts count="1"><font><sz val="11"/><name val="Calibri"/></font></fonts>'
+        '<fills count="2"><fill><patternFill patternType="none"/></fill>'
+        '<fill><patternFill patternType="gray125"/></fill></fills>'
+        '<borders count="1"><border><left/><right/><top/><bottom/><diagonal/></border></borders>'
+        '<cellStyleXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0"/></cellStyleXfs>'
+        '<cellXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0" xfId="0"/></cellXfs>'
+        '<cellStyles count="1"><cellStyle name="Normal" xfId="0" builtinId="0"/></cellStyles>'
+        '</styleSheet>'
+    )
+
+    SHEET_HEADER = (
+        b'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+        b'<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+        b'<sheetData>'
+    )
+
+    SHEET_FOOTER = b'</sheetData></worksheet>'
+
+    def __init__(self, sheet_name: str = "Bulksheet", compresslevel: int = 6):
+        """
+        Args:
+            sheet_name: 工作表名称
+            compresslevel: deflate 压缩级别（1-9，越低越快）
+        """
+        self.sheet_name = sheet_name
+        self.compresslevel = compresslevel
+        self._cell_cache = {}
+
+    def _workbook_xml(self) -> str:
+        return (
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+            '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+            'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+            f'<sheets><sheet name="{_escape_text(self.sheet_name)}" sheetId="1" r:id="rId1"/></sheets>'
+            '</workbook>'
+        )
+
+    def _encode_cell(self, value) -> str:
+        """编码单个单元格（字符串值带缓存）"""
+        if value is None:
+            return "<c/>"
+        if isinstance(value, bool):
+            return f'<c t="b"><v>{int(value)}</v></c>'
+        if isinstance(value, (int, float)):
+            return f"<c><v>{value!r}</v></c>"
+
+        text = str(value)
+        cached = self._cell_cache.get(text)
+        if cached is not None:
+            return cached
+
+        if text == "":
+            encoded = "<c/>"
+        else:
+            space = ' xml:space="preserve"' if text != text.strip() else ""
+            encoded = f'<c t="inlineStr"><is><t{space}>{_escape_text(text)}</t></is></c>'
+
+        if len(self._cell_cache) >= self.CELL_CACHE_LIMIT:
+            self._cell_cache.clear()
+        self._cell_cache[text] = encoded
+        return encoded
+
+    def encode_rows(self, rows: Iterable[Sequence]) -> bytes:
+        """将一批行编码为 <row> XML 片段"""
+        encode_cell = self._encode_cell
+        parts = []
+        for row in rows:
+            # 行尾空单元格不需要占位
+            end = len(row)
+            while end and (row[end - 1] is None or row[end - 1] == ""):
+                end -= 1
+            parts.append("<row>")
+            parts.extend(encode_cell(row[i]) for i in range(end))
+            parts.append("</row>")
+        return "".join(parts).encode("utf-8")
+
+    def iter_fragments(self, rows: Iterable[Sequence], batch_rows: int = ENCODE_BATCH_ROWS) -> Iterator[bytes]:
+        """按批编码行，产出 sheetData 片段"""
+        batch = []
+        for row in rows:
+            batch.append(row)
+            if len(batch) >= batch_rows:
+                yield self.encode_rows(batch)
+                batch = []
+        if batch:
+            yield self.encode_rows(batch)
+
+    def static_parts(self) -> Tuple[Tuple[str, str], ...]:
+        """除工作表外的固定部件（文件名, 内容）"""
+        return (
+            ("[Content_Types].xml", self.CONTENT_TYPES),
+            ("_rels/.rels", self.ROOT_RELS),
+            ("xl/workbook.xml", self._workbook_xml()),
+            ("xl/_rels/workbook.xml.rels", self.WORKBOOK_RELS),
+            ("xl/styles.xml", self.STYLES),
+        )
+
+    def stream_fragments(self, fragments: Iterable[bytes], chunk_size: int = EXPORT_CHUNK_SIZE) -> Iterator[bytes]:
+        """
+        将已编码的 sheetData 片段封装为 xlsx，并按块产出
+
+        Args:
+            fragments: encode_rows 产出的 XML 片段
+            chunk_size: 每个输出块的目标大小（字节）
+
+        Yields:
+            xlsx 文件字节块（拼接后即完整文件）
+        """
+        sink = _ChunkSink()
+        with zipfile.ZipFile(
+            sink, "w", compression=zipfile.ZIP_DEFLATED, compresslevel=self.compresslevel
+        ) as zf:
+            for name, content in self.static_parts():
+                zf.writestr(name, content)
+
+            with zf.open("xl/worksheets/sheet1.xml", "w") as entry:
+                entry.write(self.SHEET_HEADER)
+                for fragment in fragments:
+                    entry.write(fragment)
+                    if sink.pending >= chunk_size:
+                        yield sink.drain()
+                entry.write(self.SHEET_FOOTER)
+
+        # 剩余压缩数据 + central directory
+        tail = sink.drain()
+        if tail:
+            yield tail
+
+    def stream(self, rows: Iterable[Sequence], chunk_size: int = EXPORT_CHUNK_SIZE) -> Iterator[bytes]:
+        """将行数据（首行为表头）流式写成 xlsx"""
+        return self.stream_fragments(self.iter_fragments(rows), chunk_size)
+
+
+class DelimitedStreamWriter:
+    """
+    CSV / TSV 流式写入器
+
+    与 XlsxStreamWriter 接口一致：行 → 编码片段 → 按块输出。
+    没有 zip/XML 封装，编码成本远低于 xlsx。
+    """
+
+    def __init__(self, delimiter: str = ",", extension: str = "csv", media_type: str = "text/csv"):
+        """
+        Args:
+            delimiter: 分隔符（"," 或 "\t"）
+            extension: 文件扩展名
+            media_type: HTTP Content-Type
+        """
+        self.delimiter = delimiter
+        self.extension = extension
+        self.media_type = f"{media_type}; charset=utf-8"
+
+    def encode_rows(self, rows: Iterable[Sequence]) -> bytes:
+        """将一批行编码为 UTF-8 文本片段"""
+        buffer = io.StringIO()
+        writer = csv.writer(buffer, delimiter=self.delimiter, lineterminator="\r\n")
+        writer.writerows(rows)
+        return buffer.getvalue().encode("utf-8")
+
+    def iter_fragments(self, rows: Iterable[Sequence], batch_rows: int = ENCODE_BATCH_ROWS) -> Iterator[bytes]:
+        """按批编码行，产出文本片段"""
+        batch = []
+        for row in rows:
+            batch.append(row)
+            if len(batch) >= batch_rows:
+                yield self.encode_rows(batch)
+                batch = []
+        if batch:
+            yield self.encode_rows(batch)
+
+    def stream_fragments(self, fragments: Iterable[bytes], chunk_size: int = EXPORT_CHUNK_SIZE) -> Iterator[bytes]:
+        """将编码片段合并为不小于 chunk_size 的输出块"""
+        pending = []
+        pending_size = 0
+        for fragment in fragments:
+            pending.append(fragment)
+            pending_size += len(fragment)
+            if pending_size >= chunk_size:
+                yield b"".join(pending)
+                pending = []
+                pending_size = 0
+        if pending:
+            yield b"".join(pending)
+
+    def stream(self, rows: Iterable[Sequence], chunk_size: int = EXPORT_CHUNK_SIZE) -> Iterator[bytes]:
+        """将行数据（首行为表头）流式写成 CSV/TSV"""
+        return self.stream_fragments(self.iter_fragments(rows), chunk_size)
+
+
+def stream_zip(
+    entries: Iterable[Tuple[str, Iterable[bytes], bool]],
+    chunk_size: int = EXPORT_CHUNK_SIZE
+) -> Iterator[bytes]:
+    """
+    将多个文件流式打包为 zip（用于批量导出 / 分片导出）
+
+    Args:
+        entries: (文件名, 文件字节块迭代器, 是否压缩)；
+            xlsx 本身已是 zip，应设为不压缩，csv/tsv 设为压缩
+        chunk_size: 每个输出块的目标大小（字节）
+
+    Yields:
+        zip 文件字节块
+    """
+    sink = _ChunkSink()
+    with zipfile.ZipFile(sink, "w", compression=zipfile.ZIP_DEFLATED, compresslevel=6) as zf:
+        for name, chunks, compress in entries:
+            info = zipfile.ZipInfo(name, date_time=time.localtime()[:6])
+            info.compress_type = zipfile.ZIP_DEFLATED if compress else zipfile.ZIP_STORED
+            with zf.open(info, "w") as entry:
+                for chunk in chunks:
+                    entry.write(chunk)
+                    if sink.pending >= chunk_size:
+                        yield sink.drain()
+
+    tail = sink.drain()
+    if tail:
+        yield tail
+
+
+def get_writer(export_format: str, sheet_name: str = "Bulksheet"):
+    """
+    根据导出格式创建写入器
+
+    Args:
+        export_format: "xlsx" / "csv" / "tsv"
+        sheet_name: 工作表名称（仅 xlsx 使用）
+
+    Returns:
+        XlsxStreamWriter 或 DelimitedStreamWriter
+
+    Raises:
+        ValueError: 不支持的格式
+    """
+    if export_format == "xlsx":
+        return XlsxStreamWriter(sheet_name=sheet_name)
+    if export_format == "csv":
+        return DelimitedStreamWriter(delimiter=",", extension="csv", media_type="text/csv")
+    if export_format == "tsv":
+        return DelimitedStreamWriter(delimiter="\t", extension="tsv", media_type="text/tab-separated-values")
+    raise ValueError(f"不支持的导出格式: {export_format}")
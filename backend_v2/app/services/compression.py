@@ -0,0 +1,316 @@
+"""
+HTTP 响应压缩
+按 Accept-Encoding 协商 zstd / br / gzip 压缩 JSON 等文本响应（万级搜索词列表压缩后不到原大小的 1/10）
+
+- 编码：gzip 使用标准库；br 需要安装 brotli，zstd 需要安装 zstandard（未安装时不参与协商）
+- 阈值：响应体小于 COMPRESSION_MIN_SIZE 时不压缩（压缩收益小于开销）
+- CPU 保护：同时进行的压缩数超过 COMPRESSION_MAX_CONCURRENT，或 1 分钟平均负载（按 CPU 核数折算）
+  超过 COMPRESSION_MAX_LOAD 时直接发送原始响应；大于 COMPRESSION_THREAD_MIN_SIZE 的响应体在线程池中压缩，
+  不阻塞事件循环
+- 范围：只压缩一次性发送的响应（JSONResponse 等）；流式响应（导出文件）和已带 Content-Encoding 的响应
+  原样发送，导出缓存中的文本文件使用预压缩的副本（compress_file，见 export_cache.ExportCache）
+"""
+
+import asyncio
+import gzip
+import os
+import threading
+import time
+import zlib
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from app.observability import metrics, timing
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# 是否启用响应压缩
+COMPRESSION_ENABLED = os.getenv("COMPRESSION_ENABLED", "true").lower() == "true"
+# 服务端编码优先级（客户端 q 值相同时按此顺序选择），逗号分隔
+COMPRESSION_ENCODINGS = os.getenv("COMPRESSION_ENCODINGS", "zstd,br,gzip")
+# 最小压缩大小（字节）
+COMPRESSION_MIN_SIZE = int(os.getenv("COMPRESSION_MIN_SIZE", "1024"))
+# 超过该大小的响应体在线程池中压缩（字节）
+COMPRESSION_THREAD_MIN_SIZE = int(os.getenv("COMPRESSION_THREAD_MIN_SIZE", str(256 * 1024)))
+# 同时进行的压缩数上限（超过时不压缩）
+COMPRESSION_MAX_CONCURRENT = int(os.getenv("COMPRESSION_MAX_CONCURRENT", str(os.cpu_count() or 4)))
+# 每核 1 分钟平均负载上限（超过时不压缩），0 表示不检查
+COMPRESSION_MAX_LOAD = float(os.getenv("COMPRESSION_MAX_LOAD", "0"))
+# 动态响应的压缩级别（兼顾速度）
+COMPRESSION_GZIP_LEVEL = int(os.getenv("COMPRESSION_GZIP_LEVEL", "6"))
+COMPRESSION_BROTLI_LEVEL = int(os.getenv("COMPRESSION_BROTLI_LEVEL", "4"))
+COMPRESSION_ZSTD_LEVEL = int(os.getenv("COMPRESSION_ZSTD_LEVEL", "3"))
+
+# 预压缩文件只压缩一次，使用较高的压缩级别（br 11 / zstd 19 对上百 MB 的导出文件过慢）
+STATIC_LEVELS = {"gzip": 9, "br": 9, "zstd": 15}
+
+# 可压缩的媒体类型（其余按前缀 text/ 和后缀 +json / +xml 判断）
+_COMPRESSIBLE_TYPES = {
+    "application/json",
+    "application/javascript",
+    "application/xml",
+    "image/svg+xml",
+}
+# 预压缩文件的扩展名
+FILE_SUFFIXES = {"gzip": "gz", "br": "br", "zstd": "zst"}
+
+
+class _Compressor:
+    """统一的流式压缩接口：compress(data) -> bytes，flush() -> bytes"""
+
+    def __init__(self, encoding: str, level: int):
+        if encoding == "gzip":
+            # wbits=31：gzip 头和尾
+            self._obj = zlib.compressobj(level, zlib.DEFLATED, 31)
+        elif encoding == "br":
+            self._obj = brotli.Compressor(quality=level)
+        else:
+            self._obj = zstandard.ZstdCompressor(level=level).compressobj()
+        self._encoding = encoding
+
+    def compress(self, data: bytes) -> bytes:
+        if self._encoding == "br":
+            return self._obj.process(data)
+        return self._obj.compress(data)
+
+    def flush(self) -> bytes:
+        if self._encoding == "br":
+            return self._obj.finish()
+        return self._obj.flush()
+
+
+def available_encodings() -> List[str]:
+    """已安装且已启用的编码（按服务端优先级）"""
+    installed = {"gzip": True, "br": brotli is not None, "zstd": zstandard is not None}
+    encodings = [item.strip().lower() for item in COMPRESSION_ENCODINGS.split(",")]
+    return [encoding for encoding in encodings if installed.get(encoding)]
+
+
+def compress(data: bytes, encoding: str, level: Optional[int] = None) -> bytes:
+    """一次性压缩（level 为空时使用动态响应的压缩级别）"""
+    if encoding == "gzip":
+        return gzip.compress(data, compresslevel=COMPRESSION_GZIP_LEVEL if level is None else level, mtime=0)
+    if encoding == "br":
+        return brotli.compress(data, quality=COMPRESSION_BROTLI_LEVEL if level is None else level)
+    if encoding == "zstd":
+        return zstandard.ZstdCompressor(level=COMPRESSION_ZSTD_LEVEL if level is None else level).compress(data)
+    raise ValueError(f"不支持的编码: {encoding}")
+
+
+def compress_file(src_path: str, dst_path: str, encoding: str, chunk_size: int = 1024 * 1024) -> int:
+    """
+    流式压缩文件（预压缩使用 STATIC_LEVELS 的压缩级别，在线程中调用）
+
+    Returns:
+        压缩后的字节数
+    """
+    compressor = _Compressor(encoding, STATIC_LEVELS[encoding])
+    size = 0
+    with open(src_path, "rb") as src, open(dst_path, "wb") as dst:
+        while True:
+            data = src.read(chunk_size)
+            if not data:
+                break
+            out = compressor.compress(data)
+            dst.write(out)
+            size += len(out)
+        out = compressor.flush()
+        dst.write(out)
+        size += len(out)
+    return size
+
+
+def parse_accept_encoding(header: str) -> Dict[str, float]:
+    """解析 Accept-Encoding（"gzip, br;q=0.8, *;q=0"）为 编码 → q 值"""
+    preferences = {}
+    for item in header.split(","):
+        name, _, params = item.partition(";")
+        name = name.strip().lower()
+        if not name:
+            continue
+        q = 1.0
+        for param in params.split(";"):
+            key, _, value = param.partition("=")
+            if key.strip().lower() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        preferences[name] = q
+    return preferences
+
+
+def negotiate(accept_encoding: Optional[str], encodings: Sequence[str]) -> Optional[str]:
+    """
+    选择响应编码：客户端 q 值最高的编码，q 值相同时按 encodings 的顺序
+
+    Returns:
+        编码名（gzip / br / zstd），客户端不接受任何可用编码时返回 None
+    """
+    if not accept_encoding:
+        return None
+    preferences = parse_accept_encoding(accept_encoding)
+    wildcard = preferences.get("*", 0.0)
+    best, best_q = None, 0.0
+    for encoding in encodings:
+        q = preferences.get(encoding, wildcard)
+        if q > best_q:
+            best, best_q = encoding, q
+    return best
+
+
+def is_compressible(content_type: str) -> bool:
+    media_type = content_type.split(";", 1)[0].strip().lower()
+    return (
+        media_type in _COMPRESSIBLE_TYPES
+        or media_type.startswith("text/")
+        or media_type.endswith(("+json", "+xml"))
+    )
+
+
+def weak_etag(etag: str) -> str:
+    """压缩后的表示与原始字节不同，强 ETag 改为弱 ETag（W/ 前缀）"""
+    return etag if etag.startswith("W/") else f"W/{etag}"
+
+
+class CPUGuard:
+    """压缩前的 CPU 保护：并发压缩数和系统负载（负载每秒最多读取一次）"""
+
+    def __init__(self, max_concurrent: int = COMPRESSION_MAX_CONCURRENT, max_load: float = COMPRESSION_MAX_LOAD):
+        self.max_concurrent = max_concurrent
+        self.max_load = max_load
+        self._active = 0
+        self._lock = threading.Lock()
+        self._load_checked = 0.0
+        self._overloaded = False
+
+    def _load_exceeded(self) -> bool:
+        if self.max_load <= 0 or not hasattr(os, "getloadavg"):
+            return False
+        now = time.monotonic()
+        if now - self._load_checked >= 1.0:
+            self._load_checked = now
+            self._overloaded = os.getloadavg()[0] / (os.cpu_count() or 1) > self.max_load
+        return self._overloaded
+
+    def acquire(self) -> Optional[str]:
+        """占用一个压缩名额，成功返回 None，否则返回跳过原因（busy / load）"""
+        if self._load_exceeded():
+            return "load"
+        with self._lock:
+            if self._active >= self.max_concurrent:
+                return "busy"
+            self._active += 1
+        return None
+
+    def release(self):
+        with self._lock:
+            self._active -= 1
+
+
+class CompressionMiddleware:
+    """
+    响应压缩中间件（纯 ASGI 实现）
+
+    缓存 http.response.start，收到第一个响应体消息后判断是否压缩：
+    一次性发送、可压缩类型、未带 Content-Encoding、不小于阈值时按协商结果压缩，
+    并设置 Content-Encoding / Content-Length / Vary；压缩耗时计入 Server-Timing 的 compress 阶段
+    """
+
+    def __init__(self, app, min_size: int = COMPRESSION_MIN_SIZE, guard: Optional[CPUGuard] = None):
+        self.app = app
+        self.min_size = min_size
+        self.guard = guard or CPUGuard()
+        self.encodings = available_encodings()
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        accept_encoding = None
+        for key, value in scope["headers"]:
+            if key == b"accept-encoding":
+                accept_encoding = value.decode("latin-1")
+                break
+        encoding = negotiate(accept_encoding, self.encodings)
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start_message = None
+        passthrough = False
+
+        async def send_wrapper(message):
+            nonlocal start_message, passthrough
+            if message["type"] == "http.response.start":
+                start_message = message
+                return
+            if message["type"] != "http.response.body" or passthrough:
+                await send(message)
+                return
+
+            passthrough = True
+            start_message, message = await self._encode(start_message, message, encoding)
+            await send(start_message)
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
+
+    async def _encode(self, start_message: Dict, message: Dict, encoding: str) -> Tuple[Dict, Dict]:
+        """判断并压缩第一个响应体消息，返回要发送的 (http.response.start, http.response.body)"""
+        headers = list(start_message.get("headers", []))
+        content_type = ""
+        for key, value in headers:
+            if key == b"content-encoding":
+                return start_message, message
+            if key == b"content-type":
+                content_type = value.decode("latin-1")
+        if start_message["status"] in (204, 304) or not is_compressible(content_type):
+            return start_message, message
+
+        has_vary = any(key == b"vary" and b"accept-encoding" in value.lower() for key, value in headers)
+        vary = [] if has_vary else [(b"vary", b"Accept-Encoding")]
+        body = message.get("body", b"")
+        if message.get("more_body", False) or len(body) < self.min_size:
+            # 流式响应 / 小响应不压缩
+            return {**start_message, "headers": headers + vary}, message
+
+        reason = self.guard.acquire()
+        if reason is not None:
+            metrics.observe_compression_skipped(reason)
+            return {**start_message, "headers": headers + vary}, message
+        start = time.perf_counter()
+        try:
+            if len(body) >= COMPRESSION_THREAD_MIN_SIZE:
+                encoded = await asyncio.to_thread(compress, body, encoding)
+            else:
+                encoded = compress(body, encoding)
+        finally:
+            self.guard.release()
+        timing.record("compress", (time.perf_counter() - start) * 1000)
+        if len(encoded) >= len(body):
+            metrics.observe_compression_skipped("no_gain")
+            return {**start_message, "headers": headers + vary}, message
+        metrics.observe_compression(encoding, len(body), len(encoded))
+
+        encoded_headers = []
+        for key, value in headers:
+            if key == b"content-length":
+                continue
+            if key == b"etag":
+                value = weak_etag(value.decode("latin-1")).encode("latin-1")
+            encoded_headers.append((key, value))
+        encoded_headers += [
+            (b"content-encoding", encoding.encode("latin-1")),
+            (b"content-length", str(len(encoded)).encode("latin-1")),
+            *vary
+        ]
+        return {**start_message, "headers": encoded_headers}, {"type": "http.response.body", "body": encoded}
@@ -4,33 +4,39 @@ DeepSeek AI 提供商实现
 
 import os
 import json
+import logging
 import re
-import aiohttp
-import traceback
 from typing import List, Dict
 from .ai_service import AIService
+from . import llm_cassette, llm_telemetry
+
+logger = logging.getLogger(__name__)
 
 
 class DeepSeekProvider(AIService):
     """DeepSeek API 服务提供商"""
 
-    def __init__(self, config: dict, prompt_template: str):
+    def __init__(self, config: dict, prompt_template: str, prompt_version: str = "v1"):
         """
         初始化 DeepSeek 提供商
 
         Args:
             config: 配置字典（包含 api_key_env, api_base, model 等）
             prompt_template: 提示词模板（包含 {concept} 占位符）
+            prompt_version: 提示词版本（记录在 LLM 调用遥测中）
         """
         self.config = config
         self.prompt_template = prompt_template
+        self.prompt_version = prompt_version
 
         # 从环境变量加载 API Key
         api_key_env = config.get("api_key_env", "DEEPSEEK_API_KEY")
         self.api_key = os.getenv(api_key_env)
 
         # API 配置
-        self.api_base = config.get("api_base", "https://api.deepseek.com/v1")
+        # api_base_env 指定的环境变量优先（如指向本地模拟服务）
+        api_base_env = config.get("api_base_env", "DEEPSEEK_API_BASE")
+        self.api_base = os.getenv(api_base_env) or config.get("api_base", "https://api.deepseek.com/v1")
         self.model = config.get("model", "deepseek-chat")
         self.max_tokens = config.get("max_tokens", 4000)
         self.timeout = config.get("timeout", 90)
@@ -47,25 +53,27 @@ class DeepSeekProvider(AIService):
         Returns:
             属性词列表（中文字段）
         """
-        try:
-            # 检查 API Key
-            if not self.api_key:
-                print("❌ 错误：DEEPSEEK_API_KEY 未配置")
-                return self._get_fallback_attributes(concept)
+        with llm_telemetry.track_call("attribute_expert", "DeepSeekProvider", self.model, self.prompt_version) as call:
+            try:
+                # 检查 API Key（回放录制的响应时不需要）
+                if not self.api_key and not llm_cassette.cassette.replaying:
+                    logger.error("DEEPSEEK_API_KEY 未配置，使用备用属性词")
+                    call.fallback("no_api_key")
+                    return self._get_fallback_attributes(concept)
 
-            # 填充提示词模板
-            prompt = self.prompt_template.format(concept=concept)
+                # 填充提示词模板
+                prompt = self.prompt_template.format(concept=concept)
 
-            print(f"🔵 调用 DeepSeek API，概念: {concept}")
+                logger.info("调用 DeepSeek API，概念: %s", concept)
 
-            async with aiohttp.ClientSession() as session:
-                async with session.post(
+                status, body = await llm_cassette.chat_completion(
+                    "attribute_expert",
                     f"{self.api_base}/chat/completions",
                     headers={
                         "Authorization": f"Bearer {self.api_key}",
                         "Content-Type": "application/json"
                     },
-                    json={
+                    payload={
                         "model": self.model,
                         "messages": [
                             {"role": "system", "content": "You are a helpful assistant that generates JSON."},
@@ -74,39 +82,39 @@ class DeepSeekProvider(AIService):
                         "temperature": self.temperature,
                         "max_tokens": self.max_tokens
                     },
-                    timeout=aiohttp.ClientTimeout(total=self.timeout)
-                ) as response:
-                    print(f"🔵 DeepSeek API 响应状态码: {response.status}")
-
-                    if response.status == 200:
-                        data = await response.json()
-                        print(f"🔵 API 返回数据结构: {list(data.keys())}")
-
-                        content = data["choices"][0]["message"]["content"]
-                        print(f"🔵 AI 返回内容前100字符: {content[:100]}...")
+                    timeout=self.timeout
+                )
+                logger.debug("DeepSeek API 响应状态码: %s", status)
+
+                if status == 200:
+                    data = json.loads(body)
+                    logger.debug("API 返回数据结构: %s", list(data.keys()))
+
+                    content = data["choices"][0]["message"]["content"]
+                    logger.debug("AI 返回内容前100字符: %s...", content[:100])
+
+                    # 解析 JSON（去除 markdown 代码块）
+                    json_match = re.search(r'```json\s*(.*?)\s*```', content, re.DOTALL)
+                    if json_match:
+                        content = json_match.group(1)
+                        logger.debug("提取JSON代码块成功")
+                    else:
+                        logger.debug("未找到JSON代码块，直接解析内容")
 
-                        # 解析 JSON（去除 markdown 代码块）
-                        json_match = re.search(r'```json\s*(.*?)\s*```', content, re.DOTALL)
-                        if json_match:
-                            content = json_match.group(1)
-                            print(f"🔵 提取JSON代码块成功")
-                        else:
-                            print(f"⚠️  未找到JSON代码块，直接解析内容")
+                    attributes = json.loads(content)
+                    logger.info("成功解析JSON，属性词数量: %d", len(attributes))
 
-                        attributes = json.loads(content)
-                        print(f"✅ 成功解析JSON，属性词数量: {len(attributes)}")
+                    return attributes
+                else:
+                    # API 调用失败，返回备用结果
+                    logger.error("API返回错误状态码 %s: %s", status, body[:200])
+                    call.fallback(f"http_{status}")
+                    return self._get_fallback_attributes(concept)
 
-                        return attributes
-                    else:
-                        # API 调用失败，返回备用结果
-                        error_text = await response.text()
-                        print(f"❌ API返回错误状态码 {response.status}: {error_text[:200]}")
-                        return self._get_fallback_attributes(concept)
-
-        except Exception as e:
-            print(f"❌ DeepSeek API错误: {type(e).__name__}: {str(e)}")
-            print(f"❌ 错误堆栈: {traceback.format_exc()}")
-            return self._get_fallback_attributes(concept)
+            except Exception as e:
+                logger.exception("DeepSeek API错误: %s: %s", type(e).__name__, e)
+                call.fallback(f"{type(e).__name__}: {e}")
+                return self._get_fallback_attributes(concept)
 
     def _get_fallback_attributes(self, concept: str) -> List[Dict]:
         """
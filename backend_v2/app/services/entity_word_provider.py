@@ -7,10 +7,11 @@ import json
 import re
 import logging
 import os
-import aiohttp
 from typing import List, Dict, Tuple
 from json.decoder import JSONDecodeError
-from tenacity import retry, stop_after_attempt, wait_fixed, before_log, after_log
+from tenacity import retry, retry_if_not_exception_type, stop_after_attempt, wait_fixed, before_log, after_log
+
+from app.services import llm_cassette, llm_telemetry
 
 logger = logging.getLogger(__name__)
 
@@ -107,15 +108,17 @@ class InsufficientResultsError(Exception):
 class EntityWordProvider:
     """本体词生成服务提供者"""
 
-    def __init__(self, api_key: str, api_base: str, prompt_template: str):
+    def __init__(self, api_key: str, api_base: str, prompt_template: str, prompt_version: str = "v1"):
         self.api_key = api_key
         self.api_base = api_base
         self.model = "deepseek-chat"
         self.prompt_template = prompt_template
+        self.prompt_version = prompt_version
 
     @retry(
         stop=stop_after_attempt(3),
         wait=wait_fixed(2),
+        retry=retry_if_not_exception_type(llm_cassette.CassetteMissError),
         before=before_log(logger, logging.INFO),
         after=after_log(logger, logging.INFO),
         reraise=True
@@ -130,36 +133,35 @@ class EntityWordProvider:
         - Exception（其他异常）
 
         不重试条件：
-        - 无（所有异常都会重试）
+        - CassetteMissError（回放模式下没有录制的响应）
         """
         logger.info(f"调用 DeepSeek API 生成本体词...")
 
-        async with aiohttp.ClientSession() as session:
-            async with session.post(
-                f"{self.api_base}/chat/completions",
-                headers={
-                    "Authorization": f"Bearer {self.api_key}",
-                    "Content-Type": "application/json"
-                },
-                json={
-                    "model": self.model,
-                    "messages": [
-                        {"role": "system", "content": "You are a helpful assistant that generates JSON."},
-                        {"role": "user", "content": prompt}
-                    ],
-                    "temperature": 0.7,
-                    "max_tokens": 4000
-                },
-                timeout=aiohttp.ClientTimeout(total=90)
-            ) as response:
-                if response.status != 200:
-                    error_text = await response.text()
-                    raise Exception(f"API 返回错误状态码 {response.status}: {error_text[:200]}")
-
-                data = await response.json()
-                content = data["choices"][0]["message"]["content"]
-                logger.info(f"API 调用成功，返回长度: {len(content)}")
-                return content
+        status, body = await llm_cassette.chat_completion(
+            "entity_word_expert",
+            f"{self.api_base}/chat/completions",
+            headers={
+                "Authorization": f"Bearer {self.api_key}",
+                "Content-Type": "application/json"
+            },
+            payload={
+                "model": self.model,
+                "messages": [
+                    {"role": "system", "content": "You are a helpful assistant that generates JSON."},
+                    {"role": "user", "content": prompt}
+                ],
+                "temperature": 0.7,
+                "max_tokens": 4000
+            },
+            timeout=90
+        )
+        if status != 200:
+            raise Exception(f"API 返回错误状态码 {status}: {body[:200]}")
+
+        data = json.loads(body)
+        content = data["choices"][0]["message"]["content"]
+        logger.info(f"API 调用成功，返回长度: {len(content)}")
+        return content
 
     def _parse_response(self, response: str) -> List[Dict]:
         """
@@ -337,32 +339,34 @@ class EntityWordProvider:
         if not is_valid:
             raise ValueError(error_msg)
 
-        try:
-            # 2. 尝试 AI 生成（带重试）
-            prompt = self.prompt_template.format(entity_word=entity_word)
-            response = await self._call_api(prompt)
+        with llm_telemetry.track_call("entity_word_expert", "EntityWordProvider", self.model, self.prompt_version) as call:
+            try:
+                # 2. 尝试 AI 生成（带重试）
+                prompt = self.prompt_template.format(entity_word=entity_word)
+                response = await self._call_api(prompt)
 
-            # 3. 解析响应
-            entity_words_cn = self._parse_response(response)
+                # 3. 解析响应
+                entity_words_cn = self._parse_response(response)
 
-            # 4. 验证结果
-            entity_words_cn = self._validate_entity_words(entity_words_cn, entity_word)
+                # 4. 验证结果
+                entity_words_cn = self._validate_entity_words(entity_words_cn, entity_word)
 
-            # 5. 检查结果数量
-            if len(entity_words_cn) < 3:
-                logger.warning(f"AI 返回结果不足（{len(entity_words_cn)}），启用增强降级策略")
-                raise InsufficientResultsError("AI 返回结果不足")
+                # 5. 检查结果数量
+                if len(entity_words_cn) < 3:
+                    logger.warning(f"AI 返回结果不足（{len(entity_words_cn)}），启用增强降级策略")
+                    raise InsufficientResultsError("AI 返回结果不足")
 
-            # 6. 转换为标准格式
-            entity_words = [convert_entity_word_to_standard(ew) for ew in entity_words_cn]
+                # 6. 转换为标准格式
+                entity_words = [convert_entity_word_to_standard(ew) for ew in entity_words_cn]
 
-            return entity_words[:max_count]
+                return entity_words[:max_count]
 
-        except (TimeoutError, ConnectionError, JSONDecodeError, InsufficientResultsError, Exception) as e:
-            logger.error(f"AI 生成失败: {type(e).__name__} - {str(e)}")
-            logger.info("使用增强降级策略生成基础变体")
+            except (TimeoutError, ConnectionError, JSONDecodeError, InsufficientResultsError, Exception) as e:
+                logger.error(f"AI 生成失败: {type(e).__name__} - {str(e)}")
+                logger.info("使用增强降级策略生成基础变体")
+                call.fallback(f"{type(e).__name__}: {e}")
 
-            # 降级：返回增强的基础变体
-            variants_cn = self._get_enhanced_basic_variants(entity_word)
-            variants = [convert_entity_word_to_standard(v) for v in variants_cn]
-            return variants[:max_count]
+                # 降级：返回增强的基础变体
+                variants_cn = self._get_enhanced_basic_variants(entity_word)
+                variants = [convert_entity_word_to_standard(v) for v in variants_cn]
+                return variants[:max_count]
@@ -0,0 +1,269 @@
+"""
+Bulksheet 导出文件缓存
+按导出内容哈希缓存渲染好的文件，重复下载（亚马逊校验失败后重新上传、同事重复下载）
+直接返回磁盘文件，并配合 ETag / If-None-Match 返回 304
+
+- 缓存键：导出任务（Campaign、产品信息、预算、搜索词、本体词、格式）的 SHA-256
+- 写入：边发送边写临时文件，完整发送后原子重命名为缓存文件
+- 淘汰：总大小超过 EXPORT_CACHE_MAX_BYTES 时按最近使用时间（LRU）删除
+- 预压缩：文本格式（csv / tsv）按客户端协商的编码在后台生成压缩副本（<键>.gz / .br / .zst），
+  与原文件一样按 LRU 淘汰；缓存键是内容哈希，副本不会过期
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+import uuid
+from collections import OrderedDict
+from typing import AsyncIterator, Dict, Iterator, Optional, Tuple
+
+from app.services.bulksheet_writers import EXPORT_CHUNK_SIZE
+from app.services.compression import FILE_SUFFIXES, compress_file
+
+logger = logging.getLogger(__name__)
+
+# 是否启用导出缓存
+EXPORT_CACHE_ENABLED = os.getenv("EXPORT_CACHE_ENABLED", "true").lower() == "true"
+# 缓存目录
+EXPORT_CACHE_DIR = os.getenv(
+    "EXPORT_CACHE_DIR",
+    os.path.join(tempfile.gettempdir(), "bulksheet_export_cache")
+)
+# 缓存总大小上限（字节），默认 512 MB
+EXPORT_CACHE_MAX_BYTES = int(os.getenv("EXPORT_CACHE_MAX_BYTES", str(512 * 1024 * 1024)))
+# 渲染格式版本：生成器/写入器输出变化时递增，使旧缓存失效
+EXPORT_CACHE_VERSION = "2"
+
+
+def compute_job_hash(job: Dict) -> str:
+    """
+    计算导出任务的内容哈希
+
+    Args:
+        job: build_export_job 的结果（只含普通数据）
+
+    Returns:
+        64 位十六进制 SHA-256
+    """
+    payload = json.dumps(
+        {"version": EXPORT_CACHE_VERSION, "job": job},
+        ensure_ascii=False,
+        sort_keys=True,
+        separators=(",", ":")
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ExportCache:
+    """按内容哈希的磁盘 LRU 缓存（线程安全）"""
+
+    def __init__(self, cache_dir: str = EXPORT_CACHE_DIR, max_bytes: int = EXPORT_CACHE_MAX_BYTES):
+        """
+        Args:
+            cache_dir: 缓存目录（不存在则创建）
+            max_bytes: 缓存总大小上限（字节）
+        """
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        # 键 → 文件大小，按最近使用顺序排列（最旧在前）
+        self._entries: "OrderedDict[str, int]" = OrderedDict()
+        self._total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.precompressed = 0
+        # 正在生成的预压缩副本
+        self._pending = set()
+
+        os.makedirs(cache_dir, exist_ok=True)
+        self._load_existing()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key)
+
+    def _load_existing(self) -> None:
+        """启动时按修改时间恢复已有缓存文件（清理上次残留的临时文件）"""
+        files = []
+        for name in os.listdir(self.cache_dir):
+            path = self._path(name)
+            if name.endswith(".tmp"):
+                _remove_file(path)
+                continue
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            files.append((stat.st_mtime, name, stat.st_size))
+
+        for _, name, size in sorted(files):
+            self._entries[name] = size
+            self._total_bytes += size
+        self._evict()
+
+    @staticmethod
+    def make_key(content_hash: str, extension: str) -> str:
+        """缓存键（同时是缓存文件名）"""
+        return f"{content_hash}.{extension}"
+
+    @staticmethod
+    def variant_key(key: str, encoding: str) -> str:
+        """预压缩副本的缓存键（如 <哈希>.csv.gz）"""
+        return f"{key}.{FILE_SUFFIXES[encoding]}"
+
+    def open(self, key: str) -> Optional[Tuple[object, int]]:
+        """
+        打开缓存文件
+
+        返回已打开的文件对象，之后即使被淘汰删除也能继续读取完。
+        打开文件和更新修改时间是阻塞的磁盘操作，异步代码中通过 asyncio.to_thread 调用
+
+        Returns:
+            (文件对象, 文件大小)，未命中返回 None
+        """
+        with self._lock:
+            opened = self._open_entry(key)
+            if opened is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return opened
+
+    def open_variant(self, key: str, encoding: str) -> Optional[Tuple[object, int]]:
+        """
+        打开预压缩副本（不计入命中统计）
+
+        Returns:
+            (文件对象, 压缩后大小)，副本未生成时返回 None
+        """
+        with self._lock:
+            return self._open_entry(self.variant_key(key, encoding))
+
+    def _open_entry(self, key: str) -> Optional[Tuple[object, int]]:
+        """打开缓存文件并标记为最近使用（调用方持有锁）"""
+        if key not in self._entries:
+            return None
+        try:
+            f = open(self._path(key), "rb")
+        except OSError:
+            # 文件被外部删除
+            self._total_bytes -= self._entries.pop(key)
+            return None
+        self._entries.move_to_end(key)
+
+        # 更新修改时间，重启后仍能按 LRU 顺序恢复
+        try:
+            os.utime(self._path(key))
+        except OSError:
+            pass
+        return f, self._entries[key]
+
+    def precompress(self, key: str, encoding: str) -> None:
+        """
+        为缓存文件生成 encoding 编码的预压缩副本（在线程中调用，作为响应的后台任务）
+
+        缓存文件不存在（渲染未完成或已淘汰）、副本已存在或正在生成时直接返回
+        """
+        variant = self.variant_key(key, encoding)
+        with self._lock:
+            if key not in self._entries or variant in self._entries or variant in self._pending:
+                return
+            self._pending.add(variant)
+
+        tmp_path = self._path(f"{variant}.{uuid.uuid4().hex}.tmp")
+        try:
+            compress_file(self._path(key), tmp_path, encoding)
+        except FileNotFoundError:
+            # 生成期间缓存文件被淘汰
+            _remove_file(tmp_path)
+        except Exception:
+            logger.exception("生成预压缩副本失败: %s", variant)
+            _remove_file(tmp_path)
+        else:
+            self._commit(variant, tmp_path)
+            with self._lock:
+                self.precompressed += 1
+        finally:
+            with self._lock:
+                self._pending.discard(variant)
+
+    async def tee(self, key: str, stream: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+        """
+        边转发字节流边写入缓存
+
+        只有字节流被完整消费时才写入缓存；出错或客户端中途断开时丢弃临时文件。
+        写文件在线程池中进行，磁盘较慢时不阻塞事件循环。
+        """
+        tmp_path = self._path(f"{key}.{uuid.uuid4().hex}.tmp")
+        completed = False
+        try:
+            with open(tmp_path, "wb") as f:
+                async for chunk in stream:
+                    await asyncio.to_thread(f.write, chunk)
+                    yield chunk
+            completed = True
+        finally:
+            if completed:
+                self._commit(key, tmp_path)
+            else:
+                _remove_file(tmp_path)
+
+    def _commit(self, key: str, tmp_path: str) -> None:
+        """临时文件原子替换为缓存文件，并按需淘汰"""
+        try:
+            size = os.path.getsize(tmp_path)
+            os.replace(tmp_path, self._path(key))
+        except OSError:
+            _remove_file(tmp_path)
+            return
+
+        with self._lock:
+            if key in self._entries:
+                self._total_bytes -= self._entries.pop(key)
+            self._entries[key] = size
+            self._total_bytes += size
+            self._evict()
+
+    def _evict(self) -> None:
+        """删除最久未使用的文件直到总大小不超过上限（调用方持有锁或处于初始化阶段）"""
+        while self._total_bytes > self.max_bytes and self._entries:
+            key, size = self._entries.popitem(last=False)
+            self._total_bytes -= size
+            self.evictions += 1
+            _remove_file(self._path(key))
+
+    def stats(self) -> Dict:
+        """缓存统计"""
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._total_bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "precompressed": self.precompressed
+            }
+
+
+def iter_file_chunks(f, chunk_size: int = EXPORT_CHUNK_SIZE) -> Iterator[bytes]:
+    """分块读取已打开的缓存文件，读完后关闭"""
+    try:
+        while True:
+            data = f.read(chunk_size)
+            if not data:
+                break
+            yield data
+    finally:
+        f.close()
+
+
+def _remove_file(path: str) -> None:
+    try:
+        os.remove(path)
+    except OSError:
+        pass
@@ -0,0 +1,863 @@
+"""
+Bulksheet 导出执行器
+将 CPU 密集的文件渲染移出事件循环，避免大文件导出阻塞 Stage 1-3 的请求
+
+- 小文件（行数 <= EXPORT_PROCESS_ROW_THRESHOLD）：在有界线程池中逐块生成并流式发送
+- 大文件：各 Campaign 提交到有界进程池并行编码为片段文件，完成后按顺序合并并分块发送
+- 批量导出：所有 Campaign 并行编码后合并写入磁盘文件（单个文件或 zip），供后台下载
+- 同时进行中的导出数超过 EXPORT_MAX_PENDING 时直接拒绝（由调用方返回 503）
+"""
+
+import asyncio
+import itertools
+import multiprocessing
+import os
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import AsyncIterator, Callable, Dict, Iterator, List, Optional, Tuple
+
+from app.observability import metrics, timing
+from app.services.bulksheet_writers import EXPORT_CHUNK_SIZE, get_writer, stream_zip
+
+# 进程池大小（大文件渲染）
+EXPORT_PROCESS_WORKERS = int(os.getenv("EXPORT_PROCESS_WORKERS", "2"))
+# 线程池大小（小文件流式生成）
+EXPORT_THREAD_WORKERS = int(os.getenv("EXPORT_THREAD_WORKERS", "4"))
+# 同时进行中的导出上限（排队 + 执行中）
+EXPORT_MAX_PENDING = int(os.getenv("EXPORT_MAX_PENDING", "8"))
+# 超过该行数的导出改用进程池
+EXPORT_PROCESS_ROW_THRESHOLD = int(os.getenv("EXPORT_PROCESS_ROW_THRESHOLD", "50000"))
+# 单次导出的超时时间（秒）
+EXPORT_TIMEOUT_SECONDS = float(os.getenv("EXPORT_TIMEOUT_SECONDS", "120"))
+# 批量导出（写入文件）的超时时间（秒）
+EXPORT_BATCH_TIMEOUT_SECONDS = float(os.getenv("EXPORT_BATCH_TIMEOUT_SECONDS", "600"))
+# 单个文件的数据行上限（Excel 工作表最多 1,048,576 行，含表头），超过则自动分片
+EXPORT_MAX_ROWS = int(os.getenv("EXPORT_MAX_ROWS", "1048575"))
+# 单个文件的大小上限（字节，按未压缩的行数据估算），超过则自动分片；0 表示不限制
+EXPORT_SHARD_MAX_BYTES = int(os.getenv("EXPORT_SHARD_MAX_BYTES", "0"))
+# 单次导出（所有分片合计）的数据行上限
+EXPORT_MAX_TOTAL_ROWS = int(os.getenv("EXPORT_MAX_TOTAL_ROWS", "10000000"))
+
+
+class ExportQueueFullError(Exception):
+    """导出队列已满"""
+    pass
+
+
+class ExportTimeoutError(Exception):
+    """导出超时"""
+    pass
+
+
+def build_campaign(
+    concept: str,
+    product_info: dict,
+    budget_info: dict,
+    keywords: List[str],
+    negative_keywords: List[str],
+    match_types: Optional[List[str]] = None,
+    bid_multipliers: Optional[Dict[str, float]] = None,
+    keyword_bids: Optional[List[List[float]]] = None
+) -> Dict:
+    """
+    构造单个 Campaign 的导出数据（只含普通数据，可跨进程传递）
+
+    Args:
+        concept: 属性概念（Task.concept）
+        product_info: {sku, asin, model}
+        budget_info: {daily_budget, ad_group_default_bid, keyword_bid}
+        keywords: 有效搜索词文本
+        negative_keywords: 本体词文本
+        match_types: 每个关键词生成的匹配类型，默认 ["Broad"]
+        bid_multipliers: 各匹配类型的出价倍数
+        keyword_bids: 逐词出价（BidEngine.compute_rows 的结果，与 keywords 一一对应）；
+            不传则使用 keyword_bid × bid_multipliers
+
+    Returns:
+        Campaign 字典
+    """
+    return {
+        "concept": concept,
+        "product_info": product_info,
+        "budget_info": budget_info,
+        "keywords": keywords,
+        "negative_keywords": negative_keywords,
+        "match_types": match_types or ["Broad"],
+        "bid_multipliers": bid_multipliers or {},
+        "keyword_bids": keyword_bids
+    }
+
+
+def build_export_job(
+    campaigns: List[Dict],
+    export_format: str,
+    max_rows_per_file: int = EXPORT_MAX_ROWS,
+    max_bytes_per_file: int = EXPORT_SHARD_MAX_BYTES
+) -> Dict:
+    """
+    构造导出任务：一个文件，按顺序包含若干 Campaign
+
+    Args:
+        campaigns: build_campaign 的结果列表（多型号 / 多任务时每个一个 Campaign）
+        export_format: 导出格式（xlsx / csv / tsv）
+        max_rows_per_file: 单个文件的数据行上限（plan_shards 使用）
+        max_bytes_per_file: 单个文件的大小上限（字节，0 表示不限制）
+
+    Returns:
+        导出任务字典
+    """
+    return {
+        "campaigns": campaigns,
+        "format": export_format,
+        "max_rows_per_file": max_rows_per_file,
+        "max_bytes_per_file": max_bytes_per_file
+    }
+
+
+def count_campaign_rows(campaign: Dict) -> int:
+    """单个 Campaign 的数据行数（Campaign / Ad Group / Product Ad + 关键词 × 匹配类型 + 否定词）"""
+    from app.services.bulksheet_generator import BulksheetGenerator
+
+    keyword_rows = len(campaign["keywords"]) * len(campaign["match_types"])
+    return BulksheetGenerator.STRUCTURE_ROWS + keyword_rows + len(campaign["negative_keywords"])
+
+
+def count_job_rows(job: Dict) -> int:
+    """导出任务的数据行数（不含表头）"""
+    return sum(count_campaign_rows(campaign) for campaign in job["campaigns"])
+
+
+def _slice_campaign(campaign: Dict, start: int, stop: int, part: int) -> Dict:
+    """
+    取 Campaign 中第 [start, stop) 个关键词，作为分片中的一段
+
+    每一段都是完整的 Campaign（结构行 + 关键词 + 全部否定词）：Amazon 只在同一个上传文件内
+    按名称解析 Campaign ID / Ad Group ID，后续分片不能引用前一分片创建的实体。
+    第 2 段起 Campaign / Ad Group 名称加 " partNN" 后缀，作为独立的 Campaign 创建。
+    """
+    keyword_bids = campaign.get("keyword_bids")
+    return {
+        **campaign,
+        "keywords": campaign["keywords"][start:stop],
+        "keyword_bids": keyword_bids[start:stop] if keyword_bids is not None else None,
+        "name_suffix": f" part{part + 1:02d}" if part else ""
+    }
+
+
+def plan_shards(job: Dict) -> List[List[Dict]]:
+    """
+    按行数/大小上限把导出任务切分为多个分片（每个分片是一个独立文件）
+
+    - 每个分片可单独上传：Campaign 被拆到多个分片时，每一段都包含自己的 Campaign / Ad Group /
+      Product Ad 行和全部否定词（否定词只作用于所在的 Campaign），按每段 3 + 否定词数 行的固定开销计入上限；
+      每段 Campaign 使用完整的每日预算
+    - 同一关键词的多个匹配类型行不会被拆到不同分片
+    - 大小按 BulksheetGenerator.estimate_row_bytes 估算（未压缩，含每个分片的表头行）
+
+    Returns:
+        分片列表，每个分片是一组 Campaign 段（可直接作为 build_export_job 的 campaigns）；
+        不需要分片时只有一个元素
+    """
+    from app.services.bulksheet_generator import BulksheetGenerator
+
+    max_rows = job["max_rows_per_file"]
+    max_bytes = job["max_bytes_per_file"]
+    # 每个分片文件都以表头行开头
+    header_bytes = len(get_writer(job["format"]).encode_rows([BulksheetGenerator.HEADER])) if max_bytes else 0
+    shards = []
+    current = []
+    used_rows = 0
+    used_bytes = header_bytes
+
+    def close_shard():
+        nonlocal current, used_rows, used_bytes
+        if current:
+            shards.append(current)
+        current = []
+        used_rows = 0
+        used_bytes = header_bytes
+
+    def fits(rows: int, size: int) -> bool:
+        return used_rows + rows <= max_rows and used_bytes + size <= max_bytes
+
+    for campaign in job["campaigns"]:
+        keyword_count = len(campaign["keywords"])
+        keyword_rows = len(campaign["match_types"])
+        # 每一段的固定行：结构行 + 否定词
+        overhead_rows = BulksheetGenerator.STRUCTURE_ROWS + len(campaign["negative_keywords"])
+
+        if not max_bytes:
+            # 只按行数切分：每段整体计算，无需逐项
+            index = 0
+            part = 0
+            while True:
+                # 新的一段至少要放下固定行和一个关键词，否则换到下一个分片
+                first_rows = keyword_rows if keyword_count else 0
+                if used_rows and used_rows + overhead_rows + first_rows > max_rows:
+                    close_shard()
+                # 单段超过上限时仍然放入至少一个关键词
+                fit = max((max_rows - used_rows - overhead_rows) // keyword_rows, 1)
+                taken = min(fit, keyword_count - index)
+                current.append(_slice_campaign(campaign, index, index + taken, part))
+                used_rows += overhead_rows + taken * keyword_rows
+                index += taken
+                part += 1
+                if index >= keyword_count:
+                    break
+                close_shard()
+            continue
+
+        # 按行数和大小切分：逐个关键词累计估算大小
+        # 第 2 段起名称带 " partNN" 后缀，行更长，按带后缀的生成器另行估算
+        overheads = []
+        size_streams = []
+        for suffix in ("", " part00"):
+            generator = make_campaign_generator({**campaign, "name_suffix": suffix})
+            overheads.append(sum(generator.estimate_row_bytes([], campaign["negative_keywords"], job["format"])))
+            sizes = iter(generator.estimate_row_bytes(campaign["keywords"], [], job["format"]))
+            # 跳过结构行（已计入固定开销）
+            for _ in itertools.islice(sizes, BulksheetGenerator.STRUCTURE_ROWS):
+                pass
+            size_streams.append(sizes)
+        overhead_bytes = overheads[0]
+
+        if not keyword_count:
+            if used_rows and not fits(overhead_rows, overhead_bytes):
+                close_shard()
+            current.append(_slice_campaign(campaign, 0, 0, 0))
+            used_rows += overhead_rows
+            used_bytes += overhead_bytes
+            continue
+
+        start = 0
+        part = 0
+        for index in range(keyword_count):
+            base_size, suffixed_size = (sum(itertools.islice(sizes, keyword_rows)) for sizes in size_streams)
+            size = suffixed_size if part else base_size
+            if index == 0:
+                if used_rows and not fits(overhead_rows + keyword_rows, overhead_bytes + size):
+                    close_shard()
+                used_rows += overhead_rows
+                used_bytes += overhead_bytes
+            elif not fits(keyword_rows, size):
+                current.append(_slice_campaign(campaign, start, index, part))
+                start = index
+                part += 1
+                close_shard()
+                overhead_bytes = overheads[1]
+                size = suffixed_size
+                used_rows += overhead_rows
+                used_bytes += overhead_bytes
+            used_rows += keyword_rows
+            used_bytes += size
+        current.append(_slice_campaign(campaign, start, keyword_count, part))
+
+    close_shard()
+    return shards or [[]]
+
+
+def make_campaign_generator(campaign: Dict):
+    """为单个 Campaign 创建生成器"""
+    from app.models_db import Task
+    from app.services.bulksheet_generator import BulksheetGenerator
+
+    return BulksheetGenerator(
+        task=Task(concept=campaign["concept"]),
+        product_info=campaign["product_info"],
+        budget_info=campaign["budget_info"],
+        match_types=campaign["match_types"],
+        bid_multipliers=campaign["bid_multipliers"],
+        name_suffix=campaign.get("name_suffix", "")
+    )
+
+
+def iter_campaign_rows(campaign: Dict) -> Iterator[Tuple]:
+    """生成单个 Campaign（或分片中的一段）的数据行"""
+    return make_campaign_generator(campaign).iter_rows(
+        campaign["keywords"],
+        campaign["negative_keywords"],
+        keyword_bids=campaign.get("keyword_bids")
+    )
+
+
+def shard_filename(filename: str, index: int, total: int) -> str:
+    """分片文件名：bulksheet_xxx.xlsx → bulksheet_xxx_part01of03.xlsx"""
+    stem, extension = os.path.splitext(filename)
+    return f"{stem}_part{index + 1:02d}of{total:02d}{extension}"
+
+
+def attach_shards(job: Dict, shards: List[List[Dict]], filename: str) -> None:
+    """
+    将 plan_shards 的结果挂到导出任务上（多于一个分片时输出为 zip）
+
+    Args:
+        job: 导出任务
+        shards: plan_shards 的结果
+        filename: 不分片时的文件名（用于生成分片文件名）
+    """
+    if len(shards) > 1:
+        job["shards"] = [
+            {"name": shard_filename(filename, index, len(shards)), "campaigns": campaigns}
+            for index, campaigns in enumerate(shards)
+        ]
+
+
+def job_files(job: Dict) -> Tuple[List[Tuple[Optional[str], Dict]], bool]:
+    """
+    导出任务包含的文件
+
+    Returns:
+        ([(zip 内文件名, 单文件导出任务), ...], 是否打包为 zip)
+    """
+    if job.get("shards"):
+        return [
+            (shard["name"], build_export_job(shard["campaigns"], job["format"]))
+            for shard in job["shards"]
+        ], True
+    return [(None, job)], False
+
+
+def iter_job_chunks(job: Dict, chunk_size: int = EXPORT_CHUNK_SIZE) -> Iterator[bytes]:
+    """按导出任务顺序生成所有 Campaign 的文件字节块（单线程；分片任务输出 zip）"""
+    from app.services.bulksheet_generator import BulksheetGenerator
+
+    files, as_zip = job_files(job)
+    if as_zip:
+        return stream_zip(
+            (
+                (name, iter_job_chunks(shard_job, chunk_size), shard_job["format"] != "xlsx")
+                for name, shard_job in files
+            ),
+            chunk_size
+        )
+
+    writer = get_writer(job["format"])
+    rows = itertools.chain(
+        (BulksheetGenerator.HEADER,),
+        *(iter_campaign_rows(campaign) for campaign in job["campaigns"])
+    )
+    return writer.stream(rows, chunk_size)
+
+
+def iter_merged_files(
+    files: List[Tuple[Optional[str], Dict]],
+    file_paths: List[List[str]],
+    as_zip: bool,
+    chunk_size: int = EXPORT_CHUNK_SIZE
+) -> Iterator[bytes]:
+    """
+    按顺序拼接各文件的 Campaign 片段文件并封装成最终文件
+
+    Args:
+        files: job_files 的结果
+        file_paths: 每个文件对应的片段文件路径（按 Campaign 顺序）
+        as_zip: 是否把各文件打包为 zip（xlsx 本身已经压缩，zip 中直接存储）
+    """
+    from app.services.bulksheet_generator import BulksheetGenerator
+
+    def file_chunks(job: Dict, part_paths: List[str]) -> Iterator[bytes]:
+        writer = get_writer(job["format"])
+        header = writer.encode_rows([BulksheetGenerator.HEADER])
+        return writer.stream_fragments(iter_part_fragments(part_paths, header, chunk_size), chunk_size)
+
+    if not as_zip:
+        return file_chunks(files[0][1], file_paths[0])
+
+    return stream_zip(
+        (
+            (name, file_chunks(job, part_paths), job["format"] != "xlsx")
+            for (name, job), part_paths in zip(files, file_paths)
+        ),
+        chunk_size
+    )
+
+
+def render_campaign_part(campaign: Dict, export_format: str, path: str) -> Dict:
+    """
+    在工作进程中编码单个 Campaign 的行数据（进程池入口，必须是模块级函数）
+
+    只写出编码后的行片段（xlsx 为 <row> XML，csv/tsv 为文本行），
+    由父进程按顺序拼接并封装成最终文件。只传入该 Campaign 的数据，
+    避免多 Campaign 导出时把整个任务重复序列化到每个工作进程。
+
+    Returns:
+        {"bytes": 片段大小, "started_at": 开始渲染的时间戳}
+    """
+    started_at = time.time()
+    writer = get_writer(export_format)
+    rows = iter_campaign_rows(campaign)
+    written = 0
+    with open(path, "wb") as f:
+        for fragment in writer.iter_fragments(rows):
+            f.write(fragment)
+            written += len(fragment)
+    return {"bytes": written, "started_at": started_at}
+
+
+def iter_part_fragments(paths: List[str], header: bytes, chunk_size: int) -> Iterator[bytes]:
+    """表头片段 + 按顺序读取各 Campaign 片段文件"""
+    yield header
+    for path in paths:
+        with open(path, "rb") as f:
+            while True:
+                data = f.read(chunk_size)
+                if not data:
+                    break
+                yield data
+
+
+def _split_paths(paths: List[str], files: List[Tuple[Optional[str], Dict]]) -> List[List[str]]:
+    """将按顺序排列的片段路径切分到各文件"""
+    file_paths = []
+    offset = 0
+    for _, job in files:
+        file_paths.append(paths[offset:offset + len(job["campaigns"])])
+        offset += len(job["campaigns"])
+    return file_paths
+
+
+def _remove_file(path: str) -> None:
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+class ExportMetrics:
+    """导出执行指标（线程安全）"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.in_flight = 0
+        self.rejected = 0
+        self.by_mode = {
+            mode: {
+                "submitted": 0,
+                "completed": 0,
+                "failed": 0,
+                "timed_out": 0,
+                "rows": 0,
+                "bytes": 0,
+                "total_seconds": 0.0,
+                "max_seconds": 0.0,
+                "total_queue_wait_seconds": 0.0
+            }
+            for mode in ("thread", "process")
+        }
+
+    def record_submit(self, mode: str) -> None:
+        with self._lock:
+            self.in_flight += 1
+            self.by_mode[mode]["submitted"] += 1
+
+    def record_reject(self) -> None:
+        with self._lock:
+            self.rejected += 1
+        metrics.observe_export_rejected()
+
+    def record_finish(
+        self,
+        mode: str,
+        outcome: str,
+        rows: int = 0,
+        output_bytes: int = 0,
+        seconds: float = 0.0,
+        queue_wait: float = 0.0
+    ) -> None:
+        """
+        记录一次导出结束
+
+        Args:
+            mode: thread / process
+            outcome: completed / failed / timed_out
+        """
+        with self._lock:
+            self.in_flight -= 1
+            stats = self.by_mode[mode]
+            stats[outcome] += 1
+            if outcome == "completed":
+                stats["rows"] += rows
+                stats["bytes"] += output_bytes
+                stats["total_seconds"] += seconds
+                stats["max_seconds"] = max(stats["max_seconds"], seconds)
+                stats["total_queue_wait_seconds"] += queue_wait
+        metrics.observe_export(mode, outcome, rows, output_bytes, seconds)
+
+    def snapshot(self) -> Dict:
+        """当前指标快照"""
+        with self._lock:
+            by_mode = {}
+            for mode, stats in self.by_mode.items():
+                completed = stats["completed"]
+                by_mode[mode] = {
+                    **stats,
+                    "avg_seconds": round(stats["total_seconds"] / completed, 4) if completed else 0.0,
+                    "avg_queue_wait_seconds": (
+                        round(stats["total_queue_wait_seconds"] / completed, 4) if completed else 0.0
+                    )
+                }
+            return {
+                "in_flight": self.in_flight,
+                "rejected": self.rejected,
+                "modes": by_mode
+            }
+
+
+class ExportExecutor:
+    """有界导出执行器"""
+
+    def __init__(
+        self,
+        process_workers: int = EXPORT_PROCESS_WORKERS,
+        thread_workers: int = EXPORT_THREAD_WORKERS,
+        max_pending: int = EXPORT_MAX_PENDING,
+        process_row_threshold: int = EXPORT_PROCESS_ROW_THRESHOLD,
+        timeout: float = EXPORT_TIMEOUT_SECONDS,
+        tmp_dir: Optional[str] = None
+    ):
+        """
+        Args:
+            process_workers: 进程池大小
+            thread_workers: 线程池大小
+            max_pending: 同时进行中的导出上限（超过则拒绝）
+            process_row_threshold: 行数超过该值时使用进程池
+            timeout: 单次导出超时（秒）
+            tmp_dir: 进程池渲染的临时文件目录
+        """
+        self.process_workers = process_workers
+        self.thread_workers = thread_workers
+        self.max_pending = max_pending
+        self.process_row_threshold = process_row_threshold
+        self.timeout = timeout
+        self.tmp_dir = tmp_dir or tempfile.gettempdir()
+        self.metrics = ExportMetrics()
+
+        self._thread_pool = ThreadPoolExecutor(max_workers=thread_workers, thread_name_prefix="export")
+        self._process_pool = None
+        self._pending = 0
+        self._lock = threading.Lock()
+
+    def _get_process_pool(self) -> ProcessPoolExecutor:
+        """延迟创建进程池（spawn，避免 fork 带走事件循环和数据库连接）"""
+        if self._process_pool is None:
+            self._process_pool = ProcessPoolExecutor(
+                max_workers=self.process_workers,
+                mp_context=multiprocessing.get_context("spawn")
+            )
+        return self._process_pool
+
+    def choose_mode(self, row_count: int) -> str:
+        """按行数选择执行方式"""
+        return "process" if row_count > self.process_row_threshold else "thread"
+
+    def _admit(self, mode: str) -> "_ExportSlot":
+        with self._lock:
+            if self._pending >= self.max_pending:
+                self.metrics.record_reject()
+                raise ExportQueueFullError(
+                    f"导出任务过多（进行中 {self._pending}，上限 {self.max_pending}），请稍后重试"
+                )
+            self._pending += 1
+        self.metrics.record_submit(mode)
+        return _ExportSlot(self, mode)
+
+    def reserve(self, row_count: int) -> "_ExportSlot":
+        """
+        预占一个导出名额（后台批量导出在提交时调用，队列已满可以立即返回 503）
+
+        Raises:
+            ExportQueueFullError: 进行中的导出数已达上限
+        """
+        return self._admit(self.choose_mode(row_count))
+
+    def _release(self) -> None:
+        with self._lock:
+            self._pending -= 1
+
+    async def open_stream(self, job: Dict, chunk_size: int = EXPORT_CHUNK_SIZE) -> AsyncIterator[bytes]:
+        """
+        提交导出任务，返回文件字节块的异步迭代器
+
+        - 线程池模式：按块生成，超时发生在发送过程中时只能中断连接
+        - 进程池模式：各 Campaign 并行编码，全部完成后再开始合并发送，
+          因此编码阶段的超时可以在响应开始前报告
+
+        Raises:
+            ExportQueueFullError: 进行中的导出数已达上限
+            ExportTimeoutError: 进程池渲染超时
+        """
+        mode = self.choose_mode(count_job_rows(job))
+        slot = self._admit(mode)
+        loop = asyncio.get_running_loop()
+        started = time.time()
+        deadline = loop.time() + self.timeout
+
+        if mode == "thread":
+            return self._pull_in_thread(
+                job, slot, lambda: iter_job_chunks(job, chunk_size), started, deadline, started
+            )
+
+        files, as_zip = job_files(job)
+        parts = [(campaign, job["format"]) for _, file_job in files for campaign in file_job["campaigns"]]
+        # 进程池编码与之后的合并拉取合计为一次 render 阶段（由 _pull_in_thread 记录）
+        parts_started = time.perf_counter()
+        try:
+            paths, render_started = await self._render_parts(parts, slot, deadline, self.timeout)
+        except BaseException:
+            timing.record("render", (time.perf_counter() - parts_started) * 1000)
+            raise
+        file_paths = _split_paths(paths, files)
+
+        return self._pull_in_thread(
+            job,
+            slot,
+            lambda: iter_merged_files(files, file_paths, as_zip, chunk_size),
+            started,
+            deadline,
+            render_started,
+            render_seconds=time.perf_counter() - parts_started
+        )
+
+    async def render_to_file(
+        self,
+        files: List[Tuple[str, Dict]],
+        path: str,
+        as_zip: bool = False,
+        on_progress: Optional[Callable[[int, int], None]] = None,
+        timeout: float = EXPORT_BATCH_TIMEOUT_SECONDS,
+        chunk_size: int = EXPORT_CHUNK_SIZE,
+        slot: Optional["_ExportSlot"] = None
+    ) -> Dict:
+        """
+        渲染一个或多个导出任务并写入磁盘文件（批量导出用，不占用 HTTP 连接）
+
+        所有文件的 Campaign 一起提交到线程池/进程池并行编码，全部完成后在线程池中
+        按顺序合并：as_zip=False 时只允许一个文件，直接写出；as_zip=True 时每个
+        文件作为 zip 中的一项。
+
+        Args:
+            files: [(zip 内文件名, 导出任务), ...]
+            path: 输出文件路径
+            as_zip: 是否打包为 zip
+            on_progress: 每完成一个 Campaign 调用一次 on_progress(已完成数, 总数)（在事件循环线程中调用）
+            timeout: 超时时间（秒）
+            chunk_size: 合并时的块大小
+            slot: 已通过 reserve 预占的名额（不传则在此处申请）
+
+        Returns:
+            {"rows": 数据行数, "bytes": 输出文件大小, "seconds": 总耗时}
+
+        Raises:
+            ExportQueueFullError: 进行中的导出数已达上限
+            ExportTimeoutError: 渲染超时
+        """
+        if not as_zip and len(files) != 1:
+            raise ValueError("非 zip 输出只能包含一个文件")
+
+        total_rows = sum(count_job_rows(job) for _, job in files)
+        if slot is None:
+            slot = self.reserve(total_rows)
+        loop = asyncio.get_running_loop()
+        started = time.time()
+        deadline = loop.time() + timeout
+
+        parts = [(campaign, job["format"]) for _, job in files for campaign in job["campaigns"]]
+        paths, work_started = await self._render_parts(parts, slot, deadline, timeout, on_progress)
+
+        file_paths = _split_paths(paths, files)
+
+        def write_output() -> int:
+            written = 0
+            with open(path, "wb") as f:
+                for chunk in iter_merged_files(files, file_paths, as_zip, chunk_size):
+                    f.write(chunk)
+                    written += len(chunk)
+            return written
+
+        merge_future = loop.run_in_executor(self._thread_pool, write_output)
+        try:
+            output_bytes = await asyncio.wait_for(
+                asyncio.shield(merge_future), timeout=max(0.0, deadline - loop.time())
+            )
+        except asyncio.TimeoutError:
+            # 合并线程无法中断，结束后删除不完整的输出文件
+            merge_future.add_done_callback(lambda _: _remove_file(path))
+            slot.release("timed_out")
+            raise ExportTimeoutError(f"导出超时（超过 {timeout:.0f} 秒）")
+        except BaseException:
+            _remove_file(path)
+            slot.release("failed")
+            raise
+
+        seconds = time.time() - started
+        slot.release(
+            "completed",
+            rows=total_rows,
+            output_bytes=output_bytes,
+            seconds=seconds,
+            queue_wait=max(0.0, work_started - started)
+        )
+        return {"rows": total_rows, "bytes": output_bytes, "seconds": round(seconds, 3)}
+
+    async def _render_parts(
+        self,
+        parts: List[Tuple[Dict, str]],
+        slot: "_ExportSlot",
+        deadline: float,
+        timeout: float,
+        on_progress: Optional[Callable[[int, int], None]] = None
+    ):
+        """
+        并行编码 (Campaign, 格式) 列表，返回 (片段文件路径, 最早开始渲染时间)
+
+        进程模式提交到进程池；线程模式（批量导出的小任务）提交到线程池。
+        片段路径登记到 slot.cleanup_paths，随名额释放一起清理。
+        """
+        loop = asyncio.get_running_loop()
+        pool = self._get_process_pool() if slot.mode == "process" else self._thread_pool
+        token = uuid.uuid4().hex
+        paths = [
+            os.path.join(self.tmp_dir, f"bulksheet_part_{token}_{index}.{export_format}")
+            for index, (_, export_format) in enumerate(parts)
+        ]
+        slot.cleanup_paths = paths
+        futures = [
+            pool.submit(render_campaign_part, campaign, export_format, path)
+            for (campaign, export_format), path in zip(parts, paths)
+        ]
+
+        waiters = [asyncio.wrap_future(f) for f in futures]
+        if on_progress is not None:
+            progress = {"completed": 0}
+
+            def on_done(_):
+                progress["completed"] += 1
+                on_progress(progress["completed"], len(waiters))
+
+            for waiter in waiters:
+                waiter.add_done_callback(on_done)
+
+        try:
+            results = await asyncio.wait_for(
+                asyncio.gather(*waiters),
+                timeout=max(0.0, deadline - loop.time())
+            )
+        except BaseException as e:
+            # 超时或任一片段失败：取消未开始的片段；已开始的工作进程无法中断，
+            # 完成后清理片段文件（名额释放时只能删除此刻已写出的文件）
+            for future, path in zip(futures, paths):
+                future.cancel()
+                future.add_done_callback(lambda _, p=path: _remove_file(p))
+            if isinstance(e, asyncio.TimeoutError):
+                slot.release("timed_out")
+                raise ExportTimeoutError(f"导出超时（超过 {timeout:.0f} 秒）")
+            slot.release("failed")
+            raise
+
+        return paths, min(r["started_at"] for r in results)
+
+    async def _pull_in_thread(
+        self,
+        job: Dict,
+        slot: "_ExportSlot",
+        make_iterator: Callable[[], Iterator[bytes]],
+        started: float,
+        deadline: float,
+        work_started: float,
+        render_seconds: float = 0.0
+    ) -> AsyncIterator[bytes]:
+        """
+        在线程池中逐块拉取字节块（同步迭代器的每一步都不占用事件循环）
+
+        render_seconds（进程池编码耗时）加上等待线程池生成字节块的时间（不含发送），
+        结束时作为请求的 render 阶段记录一次
+        """
+        loop = asyncio.get_running_loop()
+        output_bytes = 0
+        outcome = "failed"
+        try:
+            # 迭代器构造本身也放到线程池（导入/初始化不占用事件循环）
+            pull_started = time.perf_counter()
+            iterator = await loop.run_in_executor(self._thread_pool, make_iterator)
+            render_seconds += time.perf_counter() - pull_started
+            if slot.mode == "thread":
+                work_started = time.time()
+            while True:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    outcome = "timed_out"
+                    raise ExportTimeoutError(f"导出超时（超过 {self.timeout:.0f} 秒）")
+                pull_started = time.perf_counter()
+                try:
+                    chunk = await asyncio.wait_for(
+                        loop.run_in_executor(self._thread_pool, next, iterator, None),
+                        timeout=remaining
+                    )
+                except asyncio.TimeoutError:
+                    outcome = "timed_out"
+                    raise ExportTimeoutError(f"导出超时（超过 {self.timeout:.0f} 秒）")
+                finally:
+                    render_seconds += time.perf_counter() - pull_started
+                if chunk is None:
+                    break
+                output_bytes += len(chunk)
+                yield chunk
+            outcome = "completed"
+        finally:
+            timing.record("render", render_seconds * 1000)
+            slot.release(
+                outcome,
+                rows=count_job_rows(job),
+                output_bytes=output_bytes,
+                seconds=time.time() - started,
+                queue_wait=max(0.0, work_started - started)
+            )
+
+    def stats(self) -> Dict:
+        """执行器配置与指标"""
+        return {
+            "config": {
+                "process_workers": self.process_workers,
+                "thread_workers": self.thread_workers,
+                "max_pending": self.max_pending,
+                "process_row_threshold": self.process_row_threshold,
+                "timeout_seconds": self.timeout
+            },
+            **self.metrics.snapshot()
+        }
+
+    def shutdown(self) -> None:
+        """关闭线程池和进程池"""
+        self._thread_pool.shutdown(wait=False)
+        if self._process_pool is not None:
+            self._process_pool.shutdown(wait=False, cancel_futures=True)
+
+
+class _ExportSlot:
+    """
+    一次导出占用的队列名额
+
+    release 是幂等的；如果响应流从未被消费（例如客户端提前断开），
+    对象被回收时也会自动释放名额并清理片段文件。
+    """
+
+    def __init__(self, executor: ExportExecutor, mode: str):
+        self._executor = executor
+        self.mode = mode
+        self.cleanup_paths = []
+        self._released = False
+
+    def release(self, outcome: str = "failed", **stats) -> None:
+        if self._released:
+            return
+        self._released = True
+        for path in self.cleanup_paths:
+            _remove_file(path)
+        self._executor._release()
+        self._executor.metrics.record_finish(self.mode, outcome, **stats)
+
+    def __del__(self):
+        self.release()
@@ -0,0 +1,210 @@
+"""
+LLM 调用录制 / 回放（cassette）
+所有 Provider 的 /chat/completions 请求都经过 chat_completion，按 LLM_CASSETTE_MODE 决定行为：
+
+- off（默认）：直接请求 API
+- record：请求 API，并把（请求哈希 → 原始响应、耗时、token 用量）写入 LLM_CASSETTE_DIR
+- replay：不访问网络，直接返回录制的原始响应（字节级一致）；未录制的请求抛出 CassetteMissError
+
+请求哈希：模型、messages、temperature、max_tokens 的 SHA-256（不含 API Key），
+同一提示词在录制和回放时得到同一个文件：{LLM_CASSETTE_DIR}/{name}/{哈希}.json
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import tempfile
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+import aiohttp
+
+from app.services import llm_telemetry
+
+# 录制 / 回放模式：off / record / replay
+LLM_CASSETTE_MODE = os.getenv("LLM_CASSETTE_MODE", "off").lower()
+# 录制文件目录（默认 backend_v2/cassettes）
+LLM_CASSETTE_DIR = os.getenv(
+    "LLM_CASSETTE_DIR",
+    str(Path(__file__).resolve().parents[2] / "cassettes")
+)
+# 回放时是否按录制的耗时等待（性能测试中模拟真实的 LLM 延迟）
+LLM_CASSETTE_REPLAY_LATENCY = os.getenv("LLM_CASSETTE_REPLAY_LATENCY", "false").lower() == "true"
+
+CASSETTE_MODES = ("off", "record", "replay")
+
+# 参与请求哈希的字段
+_KEY_FIELDS = ("model", "messages", "temperature", "max_tokens")
+
+
+class CassetteMissError(Exception):
+    """回放模式下没有对应的录制文件"""
+    pass
+
+
+def request_key(payload: Dict) -> str:
+    """
+    计算请求哈希
+
+    Args:
+        payload: /chat/completions 请求体
+
+    Returns:
+        64 位十六进制 SHA-256
+    """
+    canonical = json.dumps(
+        {field: payload.get(field) for field in _KEY_FIELDS},
+        ensure_ascii=False,
+        sort_keys=True,
+        separators=(",", ":")
+    )
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+def _parse_usage(body: str) -> Optional[Dict]:
+    """从原始响应中提取 token 用量（无法解析时返回 None）"""
+    try:
+        return json.loads(body).get("usage")
+    except (ValueError, AttributeError):
+        return None
+
+
+class LLMCassette:
+    """录制文件的读写"""
+
+    def __init__(self, mode: str = LLM_CASSETTE_MODE, directory: str = LLM_CASSETTE_DIR):
+        """
+        Args:
+            mode: off / record / replay
+            directory: 录制文件目录
+
+        Raises:
+            ValueError: 不支持的模式
+        """
+        if mode not in CASSETTE_MODES:
+            raise ValueError(f"不支持的 LLM_CASSETTE_MODE: {mode}（可选：{' / '.join(CASSETTE_MODES)}）")
+        self.mode = mode
+        self.directory = Path(directory)
+
+    @property
+    def replaying(self) -> bool:
+        return self.mode == "replay"
+
+    def path_for(self, name: str, key: str) -> Path:
+        return self.directory / name / f"{key}.json"
+
+    def load(self, name: str, key: str) -> Dict:
+        """
+        读取录制文件
+
+        Raises:
+            CassetteMissError: 文件不存在
+        """
+        path = self.path_for(name, key)
+        if not path.exists():
+            raise CassetteMissError(f"没有录制的 LLM 响应: {path}")
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def save(self, name: str, key: str, record: Dict):
+        """写入录制文件（临时文件 + 原子重命名，并发录制同一请求时后写入的覆盖先写入的）"""
+        path = self.path_for(name, key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(record, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, path)
+
+
+cassette = LLMCassette()
+
+
+async def chat_completion(
+    name: str,
+    url: str,
+    headers: Dict[str, str],
+    payload: Dict,
+    timeout: float
+) -> Tuple[int, str]:
+    """
+    发送 /chat/completions 请求（按 LLM_CASSETTE_MODE 录制或回放）
+
+    Args:
+        name: 调用名称（录制文件的子目录，如 "attribute_expert"）
+        url: 完整请求地址
+        headers: 请求头
+        payload: 请求体
+        timeout: 超时时间（秒）
+
+    Returns:
+        (HTTP 状态码, 原始响应文本)
+
+    Raises:
+        CassetteMissError: 回放模式下没有对应的录制文件
+    """
+    key = request_key(payload)
+    call = llm_telemetry.current_call()
+
+    if cassette.replaying:
+        start = time.perf_counter()
+        # 读写录制文件放到线程池，回放/录制本身不阻塞事件循环
+        record = await asyncio.to_thread(cassette.load, name, key)
+        if LLM_CASSETTE_REPLAY_LATENCY and record.get("latency_ms"):
+            await asyncio.sleep(record["latency_ms"] / 1000)
+        if call is not None:
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            call.add_attempt(record["status"], 0.0, elapsed_ms, elapsed_ms, record.get("usage"), "replay")
+        return record["status"], record["body"]
+
+    # 等待连接的时间（连接池排队）
+    queue_wait = {"start": None, "ms": 0.0}
+
+    async def on_queued_start(session, context, params):
+        queue_wait["start"] = time.perf_counter()
+
+    async def on_queued_end(session, context, params):
+        queue_wait["ms"] += (time.perf_counter() - queue_wait["start"]) * 1000
+
+    trace_config = aiohttp.TraceConfig()
+    trace_config.on_connection_queued_start.append(on_queued_start)
+    trace_config.on_connection_queued_end.append(on_queued_end)
+
+    start = time.perf_counter()
+    ttfb_ms = None
+    try:
+        async with aiohttp.ClientSession(trace_configs=[trace_config]) as session:
+            async with session.post(
+                url,
+                headers=headers,
+                json=payload,
+                timeout=aiohttp.ClientTimeout(total=timeout)
+            ) as response:
+                ttfb_ms = (time.perf_counter() - start) * 1000
+                status = response.status
+                body = await response.text()
+    except Exception:
+        if call is not None:
+            call.add_attempt(None, queue_wait["ms"], ttfb_ms, (time.perf_counter() - start) * 1000, None, cassette.mode)
+        raise
+    latency_ms = (time.perf_counter() - start) * 1000
+    usage = _parse_usage(body)
+
+    if call is not None:
+        call.add_attempt(status, queue_wait["ms"], ttfb_ms, latency_ms, usage, cassette.mode)
+
+    if cassette.mode == "record":
+        await asyncio.to_thread(cassette.save, name, key, {
+            "key": key,
+            "name": name,
+            "model": payload.get("model"),
+            "status": status,
+            "body": body,
+            "latency_ms": round(latency_ms, 1),
+            "usage": usage,
+            "recorded_at": datetime.now(timezone.utc).isoformat()
+        })
+
+    return status, body
@@ -0,0 +1,254 @@
+"""
+LLM 调用遥测
+每次 Provider 调用（含重试）记录一行：等待连接、首字节、请求耗时、总耗时、token 用量、
+重试次数、降级原因，由后台任务批量写入 llm_call_logs 表
+
+- Provider 用 track_call() 包住一次调用；llm_cassette.chat_completion 通过 contextvar
+  找到当前调用并累加每次 HTTP 请求的耗时和 usage
+- 写入：记录先进入内存队列，后台任务攒满 LLM_TELEMETRY_BATCH_SIZE 条或每
+  LLM_TELEMETRY_FLUSH_SECONDS 秒在线程中批量插入一次，不阻塞请求
+- 队列满（数据库写入跟不上）或写入器未启动时丢弃记录并计数，不影响调用本身
+"""
+
+import asyncio
+import contextvars
+import logging
+import os
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Dict, Iterator, List, Optional
+
+from app.observability import metrics, timing
+
+logger = logging.getLogger(__name__)
+
+# 是否启用 LLM 调用遥测
+LLM_TELEMETRY_ENABLED = os.getenv("LLM_TELEMETRY_ENABLED", "true").lower() == "true"
+# 每批写入的最大记录数
+LLM_TELEMETRY_BATCH_SIZE = int(os.getenv("LLM_TELEMETRY_BATCH_SIZE", "100"))
+# 最长写入间隔（秒）
+LLM_TELEMETRY_FLUSH_SECONDS = float(os.getenv("LLM_TELEMETRY_FLUSH_SECONDS", "2"))
+# 内存队列上限（超过则丢弃）
+LLM_TELEMETRY_MAX_QUEUE = int(os.getenv("LLM_TELEMETRY_MAX_QUEUE", "10000"))
+
+
+class LLMCall:
+    """一次 Provider 调用的遥测数据（跨多次 HTTP 请求累加）"""
+
+    def __init__(self, name: str, provider: str, model: str, prompt_version: str):
+        self.call_id = str(uuid.uuid4())
+        self.name = name
+        self.provider = provider
+        self.model = model
+        self.prompt_version = prompt_version
+        self.cassette_mode = "off"
+        self.started = time.perf_counter()
+
+        self.attempts = 0
+        self.status_code: Optional[int] = None
+        self.queue_wait_ms = 0.0
+        self.ttfb_ms: Optional[float] = None
+        self.request_ms = 0.0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.cached_tokens = 0
+        self.fallback_reason: Optional[str] = None
+
+    def add_attempt(
+        self,
+        status_code: Optional[int],
+        queue_wait_ms: float,
+        ttfb_ms: Optional[float],
+        request_ms: float,
+        usage: Optional[Dict],
+        cassette_mode: str = "off"
+    ):
+        """记录一次 HTTP 请求（由 llm_cassette.chat_completion 调用；请求异常时 status_code 为 None）"""
+        self.attempts += 1
+        self.status_code = status_code
+        self.queue_wait_ms += queue_wait_ms
+        self.ttfb_ms = ttfb_ms
+        self.request_ms += request_ms
+        self.cassette_mode = cassette_mode
+        if usage:
+            self.prompt_tokens += int(usage.get("prompt_tokens") or 0)
+            self.completion_tokens += int(usage.get("completion_tokens") or 0)
+            self.cached_tokens += cached_tokens_from_usage(usage)
+
+    def fallback(self, reason: str):
+        """标记本次调用使用了降级结果"""
+        self.fallback_reason = reason[:200]
+
+    def to_record(self, outcome: str) -> Dict:
+        return {
+            "call_id": self.call_id,
+            "name": self.name,
+            "prompt_version": self.prompt_version,
+            "provider": self.provider,
+            "model": self.model,
+            "cassette_mode": self.cassette_mode,
+            "outcome": outcome,
+            "status_code": self.status_code,
+            "attempts": self.attempts,
+            "fallback_reason": self.fallback_reason,
+            "queue_wait_ms": round(self.queue_wait_ms, 2),
+            "ttfb_ms": round(self.ttfb_ms, 2) if self.ttfb_ms is not None else None,
+            "request_ms": round(self.request_ms, 2),
+            "total_ms": round((time.perf_counter() - self.started) * 1000, 2),
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+            "cached_tokens": self.cached_tokens,
+            "created_at": datetime.now(timezone.utc)
+        }
+
+
+def cached_tokens_from_usage(usage: Dict) -> int:
+    """
+    命中提示词缓存的输入 token
+
+    DeepSeek：usage.prompt_cache_hit_tokens；OpenAI 兼容：usage.prompt_tokens_details.cached_tokens
+    """
+    if usage.get("prompt_cache_hit_tokens") is not None:
+        return int(usage["prompt_cache_hit_tokens"] or 0)
+    details = usage.get("prompt_tokens_details") or {}
+    return int(details.get("cached_tokens") or 0)
+
+
+_current_call: contextvars.ContextVar = contextvars.ContextVar("llm_call", default=None)
+
+
+def current_call() -> Optional[LLMCall]:
+    """当前协程中正在进行的 Provider 调用（没有时返回 None）"""
+    return _current_call.get()
+
+
+class LLMTelemetryWriter:
+    """LLM 调用记录的异步批量写入器"""
+
+    def __init__(
+        self,
+        batch_size: int = LLM_TELEMETRY_BATCH_SIZE,
+        flush_seconds: float = LLM_TELEMETRY_FLUSH_SECONDS,
+        max_queue: int = LLM_TELEMETRY_MAX_QUEUE
+    ):
+        self.batch_size = batch_size
+        self.flush_seconds = flush_seconds
+        self.max_queue = max_queue
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self._stats = {"recorded": 0, "written": 0, "dropped": 0, "write_errors": 0}
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    async def start(self):
+        """启动后台写入任务（应用启动时调用）"""
+        if self.running:
+            return
+        self._queue = asyncio.Queue(maxsize=self.max_queue)
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """写入剩余记录并停止后台任务（应用关闭时调用）"""
+        if not self.running:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        remaining = []
+        while not self._queue.empty():
+            remaining.append(self._queue.get_nowait())
+        if remaining:
+            await asyncio.to_thread(self._write, remaining)
+        self._task = None
+
+    def record(self, record: Dict):
+        """加入写入队列（不等待；队列满或写入器未启动时丢弃）"""
+        if not self.running:
+            self._stats["dropped"] += 1
+            return
+        try:
+            self._queue.put_nowait(record)
+            self._stats["recorded"] += 1
+        except asyncio.QueueFull:
+            self._stats["dropped"] += 1
+
+    def stats(self) -> Dict:
+        return {
+            **self._stats,
+            "queued": self._queue.qsize() if self._queue is not None else 0,
+            "running": self.running
+        }
+
+    async def _run(self):
+        while True:
+            batch = [await self._queue.get()]
+            deadline = time.monotonic() + self.flush_seconds
+            while len(batch) < self.batch_size:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            await asyncio.to_thread(self._write, batch)
+
+    def _write(self, batch: List[Dict]):
+        from app.crud import llm_call_log as crud_llm_call_log
+        from app.database import SessionLocal
+
+        db = SessionLocal()
+        try:
+            crud_llm_call_log.create_llm_call_logs(db, batch)
+            self._stats["written"] += len(batch)
+        except Exception:
+            db.rollback()
+            self._stats["write_errors"] += 1
+            self._stats["dropped"] += len(batch)
+            logger.exception("LLM 调用记录写入失败（%d 条）", len(batch))
+        finally:
+            db.close()
+
+
+telemetry_writer = LLMTelemetryWriter()
+
+
+@contextmanager
+def track_call(name: str, provider: str, model: str, prompt_version: str = "v1") -> Iterator[LLMCall]:
+    """
+    记录一次 Provider 调用
+
+    用法：
+        with llm_telemetry.track_call("attribute_expert", "DeepSeekProvider", self.model) as call:
+            ...
+            call.fallback("http_429")   # 返回降级结果时
+
+    结果：调用了 fallback() 为 fallback，抛出异常为 error，否则为 ok
+    """
+    call = LLMCall(name, provider, model, prompt_version)
+    token = _current_call.set(call)
+    outcome = "ok"
+    try:
+        yield call
+        if call.fallback_reason is not None:
+            outcome = "fallback"
+    except BaseException:
+        outcome = "error"
+        raise
+    finally:
+        _current_call.reset(token)
+        elapsed = time.perf_counter() - call.started
+        timing.record("llm", elapsed * 1000)
+        metrics.observe_llm_call(name, outcome, elapsed, call.attempts, {
+            "prompt": call.prompt_tokens,
+            "completion": call.completion_tokens,
+            "cached": call.cached_tokens
+        })
+        if LLM_TELEMETRY_ENABLED:
+            telemetry_writer.record(call.to_record(outcome))
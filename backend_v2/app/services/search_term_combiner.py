@@ -0,0 +1,317 @@
+"""
+搜索词组合服务
+属性词 × 本体词组合生成搜索词；组合数超过上限时可按评分只保留前 K 个
+
+多属性词组合（max_attributes > 1）按类别顺序叠加属性词，惰性枚举，
+当前长度超过 max_length 时整条分支剪枝，不生成完整组合列表
+"""
+
+import heapq
+import os
+import re
+from itertools import islice
+from operator import itemgetter
+from typing import Dict, Iterator, List, Sequence, Tuple
+
+from app.models_db import EntityWord, TaskAttribute
+
+# 多属性词组合中属性词部分的最大长度（与 search_terms.attribute_word 列长度一致）
+ATTRIBUTE_PHRASE_MAX_LENGTH = 100
+# top_k 模式下多属性词组合最多参与评分的候选数量（按枚举顺序，属性词少的组合在前）
+SEARCH_TERM_MAX_CANDIDATES = int(os.getenv("SEARCH_TERM_MAX_CANDIDATES", "200000"))
+
+
+def build_search_term(attribute: TaskAttribute, entity: EntityWord, max_length: int) -> Dict:
+    """
+    组合单个搜索词（create_search_terms_batch 的输入格式）
+
+    Args:
+        attribute: 属性词
+        entity: 本体词
+        max_length: 最大字符长度（超过则 is_valid = False）
+    """
+    term = f"{attribute.word} {entity.entity_word}"
+    length = len(term)
+    return {
+        "term": term,
+        "attribute_id": attribute.id,
+        "attribute_word": attribute.word,
+        "entity_word_id": entity.id,
+        "entity_word": entity.entity_word,
+        "length": length,
+        "is_valid": length <= max_length
+    }
+
+
+def build_combined_search_term(
+    attributes: Sequence[TaskAttribute],
+    entity: EntityWord,
+    max_length: int
+) -> Dict:
+    """
+    组合多属性词搜索词（create_search_terms_batch 的输入格式）
+
+    attribute_word 为按顺序拼接的属性词；attribute_id 关联星级最低的属性词，
+    出价计算沿用 min(属性词星级, 本体词星级)
+
+    Args:
+        attributes: 按类别顺序排列的属性词
+        entity: 本体词
+        max_length: 最大字符长度
+    """
+    attribute_word = " ".join(attribute.word for attribute in attributes)
+    primary = min(attributes, key=lambda attribute: attribute.search_value_stars)
+    term = f"{attribute_word} {entity.entity_word}"
+    length = len(term)
+    return {
+        "term": term,
+        "attribute_id": primary.id,
+        "attribute_word": attribute_word,
+        "entity_word_id": entity.id,
+        "entity_word": entity.entity_word,
+        "length": length,
+        "is_valid": length <= max_length
+    }
+
+
+def iter_search_terms(
+    attributes: Sequence[TaskAttribute],
+    entity_words: Sequence[EntityWord],
+    max_length: int
+) -> Iterator[Dict]:
+    """笛卡尔积组合：属性词 × 本体词（按选择顺序，包含超长的无效搜索词）"""
+    for attribute in attributes:
+        for entity in entity_words:
+            yield build_search_term(attribute, entity, max_length)
+
+
+class SearchTermScorer:
+    """
+    搜索词评分（规则见 app/config/search_term_rules.yaml）
+
+    评分 = stars_weight × (属性词星级 + 本体词星级)
+         + recommended_bonus × (属性词推荐 + 本体词推荐)
+         - length_penalty × 长度 / max_length
+    """
+
+    def __init__(self, scoring: dict):
+        """
+        Args:
+            scoring: 评分权重（search_term_rules 的 scoring 部分）
+        """
+        self.stars_weight = float(scoring.get("stars_weight", 1.0))
+        self.recommended_bonus = float(scoring.get("recommended_bonus", 1.0))
+        self.length_penalty = float(scoring.get("length_penalty", 2.0))
+
+    def word_score(self, word) -> float:
+        """单个属性词/本体词贡献的分数（星级 + 推荐）"""
+        return self.stars_weight * word.search_value_stars + self.recommended_bonus * bool(word.recommended)
+
+    def length_score(self, length: int, max_length: int) -> float:
+        """长度惩罚（负数，越长扣分越多）"""
+        return -self.length_penalty * length / max_length
+
+    def combination_score(
+        self,
+        attributes: Sequence[TaskAttribute],
+        entity: EntityWord,
+        length: int,
+        max_length: int
+    ) -> float:
+        """
+        多属性词组合的评分
+
+        属性词部分取平均分，叠加属性词本身不加分，只由长度惩罚区分；
+        单个属性词时与属性词 × 本体词的评分一致
+        """
+        attribute_score = sum(self.word_score(attribute) for attribute in attributes) / len(attributes)
+        return attribute_score + self.word_score(entity) + self.length_score(length, max_length)
+
+
+class AttributeCategorizer:
+    """
+    属性词类别（规则见 app/config/search_term_rules.yaml 的 combination 部分）
+
+    类别的先后顺序即多属性词组合中属性词的排列顺序
+    """
+
+    def __init__(self, combination: dict):
+        """
+        Args:
+            combination: 组合规则（search_term_rules 的 combination 部分）
+        """
+        categories = combination.get("attribute_categories") or []
+        self.names = [category["name"] for category in categories]
+
+        default_category = combination.get("default_category") or "other"
+        if default_category not in self.names:
+            self.names.append(default_category)
+        self.default_position = self.names.index(default_category)
+
+        # 每个类别的关键词编译为一个整词匹配的正则
+        self.patterns = [
+            (position, re.compile(
+                r"\b(?:" + "|".join(re.escape(str(word).lower()) for word in category["words"]) + r")\b"
+            ))
+            for position, category in enumerate(categories)
+            if category.get("words")
+        ]
+
+    def position(self, word: str) -> int:
+        """属性词所属类别的顺序位置"""
+        word = word.lower()
+        for position, pattern in self.patterns:
+            if pattern.search(word):
+                return position
+        return self.default_position
+
+
+def iter_attribute_combinations(
+    attributes: Sequence[TaskAttribute],
+    entity_words: Sequence[EntityWord],
+    max_length: int,
+    max_attributes: int,
+    categorizer: AttributeCategorizer
+) -> Iterator[Tuple[Tuple[TaskAttribute, ...], EntityWord]]:
+    """
+    惰性枚举多属性词组合：1..max_attributes 个属性词（按类别顺序、每个类别最多一个）+ 本体词
+
+    枚举顺序：属性词少的组合在前（1 个属性词的组合即属性词 × 本体词），截取前 N 个时优先保留简单的组合。
+    类别内属性词、本体词都按长度升序排列，当前长度加上最短的后续部分超过 max_length 时
+    直接结束该分支，超长组合不会被生成。
+
+    Args:
+        attributes: 选中的属性词
+        entity_words: 选中的本体词
+        max_length: 最大字符长度
+        max_attributes: 每个组合最多的属性词数量
+        categorizer: 属性词类别
+
+    Yields:
+        (按类别顺序排列的属性词元组, 本体词)，只包含不超过 max_length 的组合
+    """
+    if not attributes or not entity_words:
+        return
+
+    groups: Dict[int, List[TaskAttribute]] = {}
+    for attribute in attributes:
+        groups.setdefault(categorizer.position(attribute.word), []).append(attribute)
+    categories = [
+        sorted(groups[position], key=lambda attribute: len(attribute.word))
+        for position in sorted(groups)
+    ]
+    entities = sorted(entity_words, key=lambda entity: len(entity.entity_word))
+    entity_lengths = [len(entity.entity_word) for entity in entities]
+    phrase_limit = min(ATTRIBUTE_PHRASE_MAX_LENGTH, max_length - 1 - entity_lengths[0])
+
+    def extend(start: int, chain: Tuple[TaskAttribute, ...], phrase_length: int, remaining: int):
+        # 后续类别不足 remaining 个时无法组成完整组合
+        for index in range(start, len(categories) - remaining + 1):
+            for attribute in categories[index]:
+                length = phrase_length + len(attribute.word) + (1 if chain else 0)
+                if length > phrase_limit:
+                    break  # 同类别后续属性词更长，同样超长
+                next_chain = chain + (attribute,)
+                if remaining > 1:
+                    yield from extend(index + 1, next_chain, length, remaining - 1)
+                    continue
+                for entity, entity_length in zip(entities, entity_lengths):
+                    if length + 1 + entity_length > max_length:
+                        break
+                    yield next_chain, entity
+
+    for size in range(1, min(max_attributes, len(categories)) + 1):
+        yield from extend(0, (), 0, size)
+
+
+def take_combinations(
+    combinations: Iterator[Tuple[Tuple[TaskAttribute, ...], EntityWord]],
+    max_length: int,
+    limit: int
+) -> List[Dict]:
+    """按枚举顺序取前 limit 个多属性词组合（create_search_terms_batch 的输入格式）"""
+    return [
+        build_combined_search_term(attributes, entity, max_length)
+        for attributes, entity in islice(combinations, limit)
+    ]
+
+
+def select_top_k(
+    attributes: Sequence[TaskAttribute],
+    entity_words: Sequence[EntityWord],
+    max_length: int,
+    k: int,
+    scorer: SearchTermScorer
+) -> Tuple[List[Dict], int]:
+    """
+    按评分保留前 K 个有效搜索词
+
+    组合逐个生成并交给 heapq.nlargest（堆大小为 K），不生成完整的笛卡尔积列表；
+    超过 max_length 的组合直接跳过，不占用名额。评分相同时保持选择顺序。
+
+    Args:
+        attributes: 选中的属性词
+        entity_words: 选中的本体词
+        max_length: 最大字符长度
+        k: 保留数量
+        scorer: 评分器
+
+    Returns:
+        (按评分降序排列的搜索词, 丢弃的组合数量)
+    """
+    # 单词部分的分数和长度预先计算，组合时只做加法
+    attribute_parts = [
+        (attribute, scorer.word_score(attribute), len(attribute.word)) for attribute in attributes
+    ]
+    entity_parts = [
+        (entity, scorer.word_score(entity), len(entity.entity_word)) for entity in entity_words
+    ]
+
+    candidates = (
+        (attribute_score + entity_score + scorer.length_score(length, max_length), attribute, entity)
+        for attribute, attribute_score, attribute_length in attribute_parts
+        for entity, entity_score, entity_length in entity_parts
+        for length in (attribute_length + 1 + entity_length,)
+        if length <= max_length
+    )
+    top = heapq.nlargest(k, candidates, key=itemgetter(0))
+
+    total = len(attribute_parts) * len(entity_parts)
+    search_terms = [build_search_term(attribute, entity, max_length) for _, attribute, entity in top]
+    return search_terms, total - len(search_terms)
+
+
+def select_top_k_combinations(
+    combinations: Iterator[Tuple[Tuple[TaskAttribute, ...], EntityWord]],
+    max_length: int,
+    k: int,
+    scorer: SearchTermScorer,
+    max_candidates: int = SEARCH_TERM_MAX_CANDIDATES
+) -> Tuple[List[Dict], int]:
+    """
+    按评分保留前 K 个多属性词组合
+
+    最多对前 max_candidates 个候选评分（枚举顺序中属性词少的组合在前），之后的组合不再枚举。
+
+    Args:
+        combinations: iter_attribute_combinations 的结果
+        max_length: 最大字符长度
+        k: 保留数量
+        scorer: 评分器
+        max_candidates: 参与评分的候选数量上限
+
+    Returns:
+        (按评分降序排列的搜索词, 参与评分但未保留的组合数量)
+    """
+    considered = 0
+
+    def scored():
+        nonlocal considered
+        for attributes, entity in islice(combinations, max_candidates):
+            considered += 1
+            length = sum(len(attribute.word) + 1 for attribute in attributes) + len(entity.entity_word)
+            yield scorer.combination_score(attributes, entity, length, max_length), attributes, entity
+
+    top = heapq.nlargest(k, scored(), key=itemgetter(0))
+    search_terms = [build_combined_search_term(attributes, entity, max_length) for _, attributes, entity in top]
+    return search_terms, considered - len(search_terms)
@@ -0,0 +1,281 @@
+"""
+亚马逊 Search Term Report 导入
+按搜索词汇总点击/花费/订单，关联任务的搜索词并标记表现（winner / neutral / low_performer）
+
+- 分块读取：csv / tsv 用 pandas.read_csv(chunksize)，xlsx 用流式 XML 解析按块组装 DataFrame
+- 每块先按任务搜索词过滤再 groupby 求和，内存占用取决于块大小和任务搜索词数量，与报告行数无关
+- 标签用 NumPy 向量化计算，阈值可通过环境变量调整
+"""
+
+import os
+from operator import itemgetter
+from typing import IO, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from app.services.bulksheet_diff import BulksheetImportError, iter_xlsx_rows, normalize_header
+
+# 每块读取的报告行数
+SEARCH_TERM_REPORT_CHUNK_ROWS = int(os.getenv("SEARCH_TERM_REPORT_CHUNK_ROWS", "100000"))
+# 上传报告的大小上限（字节），默认 500 MB
+SEARCH_TERM_REPORT_MAX_BYTES = int(os.getenv("SEARCH_TERM_REPORT_MAX_BYTES", str(500 * 1024 * 1024)))
+# 目标 ACOS（花费 / 销售额），不超过该值的出单搜索词标记为 winner
+SEARCH_TERM_TARGET_ACOS = float(os.getenv("SEARCH_TERM_TARGET_ACOS", "0.3"))
+# 无订单且点击数达到该值的搜索词标记为 low_performer
+SEARCH_TERM_PRUNE_MIN_CLICKS = int(os.getenv("SEARCH_TERM_PRUNE_MIN_CLICKS", "10"))
+# ACOS 超过该值的搜索词标记为 low_performer（1.0 表示花费超过销售额）
+SEARCH_TERM_PRUNE_MAX_ACOS = float(os.getenv("SEARCH_TERM_PRUNE_MAX_ACOS", "1.0"))
+
+METRICS = ("impressions", "clicks", "spend", "orders", "sales")
+
+# 表现标签（按排序优先级）
+LABELS = ("winner", "neutral", "low_performer")
+
+
+class SearchTermReportError(ValueError):
+    """Search Term Report 无法解析（格式不支持、缺少必需列）"""
+    pass
+
+
+def _match_column(header: str) -> Optional[str]:
+    """
+    报告列名 → 标准字段名
+
+    兼容不同报告版本的列名，如 "Customer Search Term"、"Spend" / "Cost"、
+    "7 Day Total Orders (#)" / "14 Day Total Orders (#)"、"7 Day Total Sales ($)"
+    """
+    if header in ("customer search term", "search term"):
+        return "term"
+    if header == "impressions":
+        return "impressions"
+    if header == "clicks":
+        return "clicks"
+    if header in ("spend", "cost") or header.startswith("spend ("):
+        return "spend"
+    if header.startswith(("7 day total orders", "14 day total orders")) or header == "orders":
+        return "orders"
+    if header.startswith(("7 day total sales", "14 day total sales")) or header == "sales":
+        return "sales"
+    return None
+
+
+def _resolve_columns(header: List) -> Dict[str, int]:
+    """
+    报告表头 → {标准字段名: 列下标}（同一字段出现多次时取第一列）
+
+    Raises:
+        SearchTermReportError: 缺少必需列
+    """
+    positions: Dict[str, int] = {}
+    for position, name in enumerate(header):
+        field = _match_column(normalize_header(name))
+        if field is not None:
+            positions.setdefault(field, position)
+
+    missing = [field for field in ("term", "clicks", "spend", "orders") if field not in positions]
+    if missing:
+        raise SearchTermReportError(f"Search Term Report 缺少必需列: {', '.join(missing)}")
+    return positions
+
+
+def iter_report_chunks(
+    file: IO[bytes],
+    filename: str,
+    chunk_rows: int = SEARCH_TERM_REPORT_CHUNK_ROWS
+) -> Iterator[pd.DataFrame]:
+    """
+    分块读取 Search Term Report
+
+    Args:
+        file: 上传的报告文件对象
+        filename: 原始文件名（按扩展名判断格式）
+        chunk_rows: 每块行数
+
+    Yields:
+        只含标准字段列（term + 已有的指标列）的 DataFrame，值为原始文本
+
+    Raises:
+        SearchTermReportError: 文件格式不支持或缺少必需列
+    """
+    extension = os.path.splitext(filename or "")[1].lower().lstrip(".")
+
+    if extension == "xlsx":
+        try:
+            rows = iter_xlsx_rows(file)
+            header = next(rows, None)
+        except BulksheetImportError as e:
+            raise SearchTermReportError(str(e)) from e
+        if header is None:
+            raise SearchTermReportError("Search Term Report 为空")
+        positions = _resolve_columns(header)
+        fields = list(positions)
+        width = max(positions.values()) + 1
+        get_fields = itemgetter(*positions.values())
+
+        batch = []
+        for row in rows:
+            if len(row) < width:
+                row = row + [None] * (width - len(row))
+            batch.append(get_fields(row))
+            if len(batch) >= chunk_rows:
+                yield pd.DataFrame.from_records(batch, columns=fields)
+                batch = []
+        if batch:
+            yield pd.DataFrame.from_records(batch, columns=fields)
+
+    elif extension in ("csv", "tsv"):
+        try:
+            reader = pd.read_csv(
+                file,
+                sep="\t" if extension == "tsv" else ",",
+                dtype=str,
+                usecols=lambda name: _match_column(normalize_header(name)) is not None,
+                encoding="utf-8-sig",
+                keep_default_na=False,
+                chunksize=chunk_rows
+            )
+            for chunk in reader:
+                positions = _resolve_columns(list(chunk.columns))
+                chunk = chunk.iloc[:, list(positions.values())]
+                chunk.columns = list(positions)
+                yield chunk
+        except (UnicodeDecodeError, pd.errors.ParserError, pd.errors.EmptyDataError) as e:
+            raise SearchTermReportError(f"无法解析 Search Term Report: {e}") from e
+
+    else:
+        raise SearchTermReportError(f"不支持的文件格式: {filename}（仅支持 xlsx / csv / tsv）")
+
+
+def _to_number(values: pd.Series) -> pd.Series:
+    """文本指标 → 数值（去掉货币符号、千分位和百分号，无法解析的按 0 处理）"""
+    if values.dtype == object:
+        values = values.astype(str).str.replace(r"[$,%\s]", "", regex=True)
+    return pd.to_numeric(values, errors="coerce").fillna(0)
+
+
+def aggregate_report(
+    chunks: Iterator[pd.DataFrame],
+    term_index: Dict[str, int]
+) -> Tuple[pd.DataFrame, Dict[str, int]]:
+    """
+    按搜索词汇总报告指标（只保留任务中存在的搜索词）
+
+    Args:
+        chunks: iter_report_chunks 的结果
+        term_index: {规范化搜索词: 搜索词ID}（见 bulksheet_diff.normalize_keyword）
+
+    Returns:
+        (以搜索词ID为索引、METRICS 为列的 DataFrame, {report_rows, matched_rows})
+    """
+    term_ids = pd.Series(term_index, dtype="int64")
+    partials: List[pd.DataFrame] = []
+    report_rows = 0
+    matched_rows = 0
+
+    for chunk in chunks:
+        report_rows += len(chunk)
+        terms = chunk["term"].astype(str).str.strip().str.lower().str.replace(r"\s+", " ", regex=True)
+        ids = terms.map(term_ids)
+        matched = ids.notna()
+        if not matched.any():
+            continue
+
+        chunk = chunk[matched]
+        matched_rows += len(chunk)
+        metrics = pd.DataFrame(
+            {
+                metric: _to_number(chunk[metric]) if metric in chunk else 0
+                for metric in METRICS
+            },
+            index=chunk.index
+        )
+        metrics["search_term_id"] = ids[matched].astype("int64")
+        partials.append(metrics.groupby("search_term_id").sum())
+
+        # 定期合并部分结果，内存只随匹配到的搜索词数量增长
+        if len(partials) >= 8:
+            partials = [pd.concat(partials).groupby(level=0).sum()]
+
+    if partials:
+        totals = pd.concat(partials).groupby(level=0).sum()
+    else:
+        totals = pd.DataFrame(columns=list(METRICS), index=pd.Index([], name="search_term_id"))
+    return totals, {"report_rows": report_rows, "matched_rows": matched_rows}
+
+
+def label_performance(
+    totals: pd.DataFrame,
+    target_acos: float = SEARCH_TERM_TARGET_ACOS,
+    prune_min_clicks: int = SEARCH_TERM_PRUNE_MIN_CLICKS,
+    prune_max_acos: float = SEARCH_TERM_PRUNE_MAX_ACOS
+) -> pd.Series:
+    """
+    向量化计算表现标签
+
+    - winner：有订单且 ACOS <= target_acos
+    - low_performer：无订单且点击数 >= prune_min_clicks，或 ACOS > prune_max_acos
+    - neutral：其他（数据量不足以判断）
+
+    Returns:
+        与 totals 同索引的标签 Series
+    """
+    spend = totals["spend"].to_numpy(dtype=np.float64)
+    sales = totals["sales"].to_numpy(dtype=np.float64)
+    orders = totals["orders"].to_numpy(dtype=np.float64)
+    clicks = totals["clicks"].to_numpy(dtype=np.float64)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        acos = np.where(sales > 0, spend / sales, np.inf)
+
+    labels = np.select(
+        [
+            (orders > 0) & (acos <= target_acos),
+            ((orders == 0) & (clicks >= prune_min_clicks)) | ((orders > 0) & (acos > prune_max_acos))
+        ],
+        ["winner", "low_performer"],
+        default="neutral"
+    )
+    return pd.Series(labels, index=totals.index)
+
+
+def ingest_search_term_report(
+    file: IO[bytes],
+    filename: str,
+    term_index: Dict[str, int]
+) -> Tuple[List[Dict], Dict[str, int]]:
+    """
+    解析报告、汇总并标记任务搜索词的表现
+
+    Args:
+        file: 上传的报告文件对象
+        filename: 原始文件名
+        term_index: {规范化搜索词: 搜索词ID}
+
+    Returns:
+        (每个匹配搜索词一条的记录列表, 统计 {report_rows, matched_rows, matched_terms})
+
+    Raises:
+        SearchTermReportError: 文件无法解析
+    """
+    totals, stats = aggregate_report(iter_report_chunks(file, filename), term_index)
+    labels = label_performance(totals)
+
+    records = [
+        {
+            "search_term_id": int(search_term_id),
+            "impressions": int(impressions),
+            "clicks": int(clicks),
+            "spend": round(float(spend), 2),
+            "orders": int(orders),
+            "sales": round(float(sales), 2),
+            "label": label
+        }
+        for search_term_id, impressions, clicks, spend, orders, sales, label in zip(
+            totals.index,
+            totals["impressions"], totals["clicks"], totals["spend"],
+            totals["orders"], totals["sales"], labels
+        )
+    ]
+    stats["matched_terms"] = len(records)
+    return records, stats
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+关键词出价引擎基准测试
+
+对比向量化 BidEngine 与逐行 Python 规则计算在 1k / 10k / 100k / 1M 个搜索词下的耗时，
+并校验两者结果一致。
+
+用法（在 backend_v2 目录下）：
+    python -m benchmarks.bench_bids
+    python -m benchmarks.bench_bids --terms 100000 --match-types Broad Phrase Exact
+"""
+
+import argparse
+import random
+import time
+from typing import List
+
+DEFAULT_TERMS = [1_000, 10_000, 100_000, 1_000_000]
+
+
+def make_features(count: int, seed: int = 42) -> List[tuple]:
+    """生成 (term, length, 属性词星级, 本体词星级) 样本"""
+    rng = random.Random(seed)
+    features = []
+    for i in range(count):
+        term = f"ocean blue {'wave ' * rng.randint(0, 8)}{i} phone case"
+        features.append((term, len(term), rng.randint(1, 5), rng.randint(1, 5)))
+    return features
+
+
+def compute_per_row(rules: dict, base_bid: float, features: List[tuple], match_types: List[str]) -> List[List[float]]:
+    """逐行 Python 规则计算（对照实现）"""
+    stars_multipliers = {int(k): float(v) for k, v in rules["stars_multipliers"].items()}
+    length_rules = sorted(
+        rules["length_rules"],
+        key=lambda rule: float("inf") if rule["max_length"] is None else rule["max_length"]
+    )
+    match_multipliers = rules["match_type_multipliers"]
+    increment = rules["bid_increment"]
+
+    results = []
+    for _, length, attribute_stars, entity_stars in features:
+        stars = min(attribute_stars, entity_stars)
+        bid = base_bid * stars_multipliers.get(max(stars, 1), 1.0)
+        for rule in length_rules:
+            if rule["max_length"] is None or length <= rule["max_length"]:
+                bid *= rule["multiplier"]
+                break
+        row = []
+        for match_type in match_types:
+            value = bid * match_multipliers.get(match_type, 1.0)
+            value = round(round(value / increment) * increment, 2)
+            row.append(min(max(value, rules["min_bid"]), rules["max_bid"]))
+        results.append(row)
+    return results
+
+
+def main():
+    from app.config import load_bid_rules
+    from app.services.bid_engine import BidEngine
+
+    parser = argparse.ArgumentParser(description="关键词出价引擎基准测试")
+    parser.add_argument("--terms", type=int, nargs="+", default=DEFAULT_TERMS, help="搜索词数量")
+    parser.add_argument(
+        "--match-types", nargs="+", default=["Broad"], choices=["Broad", "Phrase", "Exact"],
+        help="匹配类型"
+    )
+    parser.add_argument("--base-bid", type=float, default=0.75, help="基础出价")
+    args = parser.parse_args()
+
+    rules = load_bid_rules()
+    engine = BidEngine(rules)
+
+    print("=" * 72)
+    print(f"{'terms':>10}{'vectorized(ms)':>18}{'per-row(ms)':>16}{'speedup':>12}{'match':>10}")
+    print("-" * 72)
+    for count in args.terms:
+        features = make_features(count)
+
+        start = time.perf_counter()
+        vectorized = engine.compute_rows(args.base_bid, features, args.match_types)
+        vectorized_ms = (time.perf_counter() - start) * 1000
+
+        start = time.perf_counter()
+        per_row = compute_per_row(rules, args.base_bid, features, args.match_types)
+        per_row_ms = (time.perf_counter() - start) * 1000
+
+        mismatches = sum(
+            1 for a, b in zip(vectorized, per_row)
+            if any(abs(x - y) > 1e-9 for x, y in zip(a, b))
+        )
+        print(
+            f"{count:>10}{vectorized_ms:>18.1f}{per_row_ms:>16.1f}"
+            f"{per_row_ms / vectorized_ms if vectorized_ms else 0:>11.1f}x"
+            f"{'ok' if not mismatches else f'{mismatches} diff':>10}"
+        )
+    print("=" * 72)
+
+
+if __name__ == "__main__":
+    main()
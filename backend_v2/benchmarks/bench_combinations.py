@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""
+多属性词组合基准测试
+
+在常见的选择规模（属性词 10~80 个、本体词 5~15 个）下，对比剪枝的惰性枚举
+（iter_attribute_combinations）与 itertools.combinations 全量生成后过滤的耗时，
+并校验两者生成的组合集合一致；同时给出截取前 max_terms 个和 top_k 评分选择的耗时。
+
+用法（在 backend_v2 目录下）：
+    python -m benchmarks.bench_combinations
+    python -m benchmarks.bench_combinations --attributes 40 --entities 10 --max-attributes 3 --max-length 60
+"""
+
+import argparse
+import random
+import time
+from itertools import combinations, islice
+from types import SimpleNamespace
+from typing import List
+
+DEFAULT_SIZES = [(10, 5), (20, 10), (40, 10), (80, 15)]
+
+# 按 search_term_rules.yaml 的类别准备的样本词（style 类别为不匹配任何关键词的词）
+SAMPLE_WORDS = {
+    "size": ["slim", "thin", "mini", "compact", "lightweight", "heavy duty"],
+    "material": ["leather", "silicone", "tpu", "metal", "wooden", "carbon fiber"],
+    "color": ["clear", "black", "pink", "navy", "rainbow", "glitter"],
+    "style": ["ocean", "marine", "nautical", "wave", "beach", "coastal", "seaside", "tropical"],
+    "function": ["protective", "shockproof", "waterproof", "magnetic", "rugged", "anti slip"]
+}
+ENTITY_WORDS = [
+    "phone case", "iphone case", "phone cover", "case", "cell phone case",
+    "protective case", "bumper case", "phone shell", "mobile case", "smartphone case",
+    "iphone cover", "phone skin", "case cover", "phone protector", "iphone 16 case"
+]
+
+
+def make_attributes(count: int, seed: int = 42) -> List[SimpleNamespace]:
+    """生成属性词样本（轮流取各类别的词，超出样本数时加序号）"""
+    rng = random.Random(seed)
+    pools = list(SAMPLE_WORDS.values())
+    attributes = []
+    for i in range(count):
+        pool = pools[i % len(pools)]
+        word = pool[(i // len(pools)) % len(pool)]
+        if i >= len(pools) * len(pool):
+            word = f"{word} {i}"
+        attributes.append(SimpleNamespace(
+            id=i + 1, word=word, search_value_stars=rng.randint(1, 5), recommended=rng.random() < 0.7
+        ))
+    return attributes
+
+
+def make_entities(count: int, seed: int = 7) -> List[SimpleNamespace]:
+    """生成本体词样本"""
+    rng = random.Random(seed)
+    return [
+        SimpleNamespace(
+            id=i + 1, entity_word=ENTITY_WORDS[i % len(ENTITY_WORDS)],
+            search_value_stars=rng.randint(1, 5), recommended=rng.random() < 0.7
+        )
+        for i in range(count)
+    ]
+
+
+def enumerate_unpruned(attributes, entity_words, max_length, max_attributes, categorizer) -> set:
+    """对照实现：全量生成每种属性词组合后再按类别和长度过滤"""
+    ordered = sorted(attributes, key=lambda attribute: categorizer.position(attribute.word))
+    results = set()
+    for size in range(1, max_attributes + 1):
+        for chain in combinations(ordered, size):
+            positions = [categorizer.position(attribute.word) for attribute in chain]
+            if len(set(positions)) != size:
+                continue
+            phrase = " ".join(attribute.word for attribute in chain)
+            for entity in entity_words:
+                if len(phrase) + 1 + len(entity.entity_word) <= max_length:
+                    results.add((tuple(attribute.id for attribute in chain), entity.id))
+    return results
+
+
+def main():
+    from app.config import load_search_term_rules
+    from app.services.search_term_combiner import (
+        AttributeCategorizer,
+        SearchTermScorer,
+        iter_attribute_combinations,
+        select_top_k_combinations,
+        take_combinations
+    )
+
+    parser = argparse.ArgumentParser(description="多属性词组合基准测试")
+    parser.add_argument("--attributes", type=int, nargs="+", help="属性词数量（与 --entities 一一对应）")
+    parser.add_argument("--entities", type=int, nargs="+", help="本体词数量")
+    parser.add_argument("--max-attributes", type=int, default=3, help="每个搜索词最多的属性词数量")
+    parser.add_argument("--max-length", type=int, default=50, help="最大字符长度")
+    parser.add_argument("--max-terms", type=int, default=1000, help="截取 / top_k 数量")
+    args = parser.parse_args()
+
+    if args.attributes and args.entities:
+        sizes = list(zip(args.attributes, args.entities))
+    else:
+        sizes = DEFAULT_SIZES
+
+    rules = load_search_term_rules()
+    categorizer = AttributeCategorizer(rules.get("combination", {}))
+    scorer = SearchTermScorer(rules.get("scoring", {}))
+
+    print("=" * 96)
+    print(
+        f"{'attrs x ents':>14}{'terms':>10}{'pruned(ms)':>13}{'unpruned(ms)':>15}"
+        f"{'speedup':>10}{'first N(ms)':>14}{'top_k(ms)':>12}{'match':>8}"
+    )
+    print("-" * 96)
+    for attribute_count, entity_count in sizes:
+        attributes = make_attributes(attribute_count)
+        entity_words = make_entities(entity_count)
+
+        def combos():
+            return iter_attribute_combinations(
+                attributes, entity_words, args.max_length, args.max_attributes, categorizer
+            )
+
+        start = time.perf_counter()
+        pruned = {(tuple(a.id for a in chain), entity.id) for chain, entity in combos()}
+        pruned_ms = (time.perf_counter() - start) * 1000
+
+        start = time.perf_counter()
+        unpruned = enumerate_unpruned(attributes, entity_words, args.max_length, args.max_attributes, categorizer)
+        unpruned_ms = (time.perf_counter() - start) * 1000
+
+        start = time.perf_counter()
+        take_combinations(combos(), args.max_length, args.max_terms)
+        first_ms = (time.perf_counter() - start) * 1000
+
+        start = time.perf_counter()
+        select_top_k_combinations(combos(), args.max_length, args.max_terms, scorer)
+        top_k_ms = (time.perf_counter() - start) * 1000
+
+        print(
+            f"{f'{attribute_count} x {entity_count}':>14}{len(pruned):>10}{pruned_ms:>13.1f}{unpruned_ms:>15.1f}"
+            f"{unpruned_ms / pruned_ms if pruned_ms else 0:>9.1f}x{first_ms:>14.1f}{top_k_ms:>12.1f}"
+            f"{'ok' if pruned == unpruned else 'diff':>8}"
+        )
+    print("=" * 96)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+"""
+Bulksheet 导出基准测试
+
+对比不同导出引擎/格式在 1k / 10k / 100k / 1M 行下的耗时和峰值内存（RSS）。
+每个用例在独立子进程中运行，保证峰值 RSS 互不干扰。
+
+用法（在 backend_v2 目录下）：
+    python -m benchmarks.bench_export
+    python -m benchmarks.bench_export --rows 1000 10000 --engines legacy write_only
+    python -m benchmarks.bench_export --rows 100000 --engines stream csv tsv
+    python -m benchmarks.bench_export --rows 100000 --engines stream --match-types Broad Phrase Exact
+    python -m benchmarks.bench_export --json results.json
+
+--rows 为搜索词数量；多个匹配类型时每个搜索词输出多行（output_rows 列为实际数据行数）。
+"""
+
+import argparse
+import json
+import multiprocessing
+import resource
+import sys
+import time
+from types import SimpleNamespace
+from typing import Dict, List
+
+DEFAULT_ROWS = [1_000, 10_000, 100_000, 1_000_000]
+DEFAULT_NEGATIVE_KEYWORDS = 15
+# 多匹配类型时的出价倍数
+BENCH_BID_MULTIPLIERS = {"Phrase": 1.1, "Exact": 1.25}
+
+
+def make_generator(match_types: List[str] = None):
+    """构造固定参数的 BulksheetGenerator"""
+    from app.services.bulksheet_generator import BulksheetGenerator
+
+    task = SimpleNamespace(concept="ocean")
+    product_info = {"sku": "BENCH-SKU-001", "asin": "B000000001", "model": "iPhone 16 Pro Max"}
+    budget_info = {"daily_budget": 20.0, "ad_group_default_bid": 0.8, "keyword_bid": 0.6}
+    return BulksheetGenerator(
+        task=task,
+        product_info=product_info,
+        budget_info=budget_info,
+        match_types=match_types,
+        bid_multipliers=BENCH_BID_MULTIPLIERS
+    )
+
+
+def make_inputs(rows: int):
+    """生成 rows 个搜索词和固定数量的本体词"""
+    keywords = [f"ocean blue wave {i} phone case" for i in range(rows)]
+    negative_keywords = [f"phone case variant {i}" for i in range(DEFAULT_NEGATIVE_KEYWORDS)]
+    return keywords, negative_keywords
+
+
+def run_engine(engine: str, generator, keywords, negative_keywords) -> int:
+    """运行指定引擎，返回输出字节数"""
+    if engine == "legacy":
+        buffer = generator.generate_excel(keywords, negative_keywords, write_only=False)
+        return buffer.getbuffer().nbytes
+    if engine == "write_only":
+        buffer = generator.generate_excel(keywords, negative_keywords, write_only=True)
+        return buffer.getbuffer().nbytes
+    if engine in ("stream", "csv", "tsv"):
+        # 模拟 HTTP 发送：逐块消费后丢弃
+        export_format = "xlsx" if engine == "stream" else engine
+        stream = generator.stream(keywords, negative_keywords, export_format=export_format)
+        return sum(len(chunk) for chunk in stream)
+    raise ValueError(f"未知引擎: {engine}")
+
+
+def _peak_rss_mb() -> float:
+    """当前进程峰值 RSS（MB）；Linux 单位为 KB，macOS 为字节"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == "darwin":
+        return peak / (1024 * 1024)
+    return peak / 1024
+
+
+def _case_worker(engine: str, rows: int, match_types: List[str], queue) -> None:
+    """子进程：构造输入后执行一次导出，回传耗时、输出大小和峰值 RSS"""
+    generator = make_generator(match_types)
+    keywords, negative_keywords = make_inputs(rows)
+    baseline_rss = _peak_rss_mb()
+
+    start = time.perf_counter()
+    output_bytes = run_engine(engine, generator, keywords, negative_keywords)
+    elapsed = time.perf_counter() - start
+
+    peak_rss = _peak_rss_mb()
+    output_rows = rows * len(generator.match_types) + 3 + len(negative_keywords)
+    queue.put({
+        "engine": engine,
+        "rows": rows,
+        "match_types": len(generator.match_types),
+        "output_rows": output_rows,
+        "seconds": round(elapsed, 3),
+        "rows_per_second": round(output_rows / elapsed) if elapsed > 0 else None,
+        "output_bytes": output_bytes,
+        "peak_rss_mb": round(peak_rss, 1),
+        "export_rss_mb": round(peak_rss - baseline_rss, 1)
+    })
+
+
+def run_case(engine: str, rows: int, match_types: List[str] = None) -> Dict:
+    """在独立子进程中运行单个用例"""
+    ctx = multiprocessing.get_context("spawn")
+    queue = ctx.Queue()
+    process = ctx.Process(target=_case_worker, args=(engine, rows, match_types, queue))
+    process.start()
+    result = queue.get()
+    process.join()
+    return result
+
+
+def print_table(results: List[Dict]) -> None:
+    """打印结果表格"""
+    print("\n" + "=" * 102)
+    print(
+        f"{'engine':<14}{'rows':>10}{'match':>6}{'out rows':>10}{'seconds':>10}{'rows/s':>12}"
+        f"{'size(KB)':>12}{'peak RSS':>14}{'export RSS':>14}"
+    )
+    print("-" * 102)
+    for r in results:
+        print(
+            f"{r['engine']:<14}{r['rows']:>10}{r['match_types']:>6}{r['output_rows']:>10}{r['seconds']:>10}"
+            f"{r['rows_per_second'] or '-':>12}{r['output_bytes'] // 1024:>12}"
+            f"{r['peak_rss_mb']:>11} MB{r['export_rss_mb']:>11} MB"
+        )
+    print("=" * 102)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulksheet 导出基准测试")
+    parser.add_argument("--rows", type=int, nargs="+", default=DEFAULT_ROWS, help="搜索词行数")
+    parser.add_argument(
+        "--engines", nargs="+", default=["legacy", "write_only", "stream", "csv", "tsv"],
+        help="导出引擎：legacy / write_only / stream（xlsx）/ csv / tsv"
+    )
+    parser.add_argument(
+        "--legacy-max-rows", type=int, default=100_000,
+        help="legacy 引擎的最大行数（超过则跳过，避免内存耗尽）"
+    )
+    parser.add_argument(
+        "--match-types", nargs="+", default=["Broad"], choices=["Broad", "Phrase", "Exact"],
+        help="每个搜索词生成的匹配类型（多个时行数成倍增加）"
+    )
+    parser.add_argument("--json", dest="json_path", help="将结果写入 JSON 文件")
+    args = parser.parse_args()
+
+    results = []
+    for rows in args.rows:
+        for engine in args.engines:
+            if engine == "legacy" and rows > args.legacy_max_rows:
+                print(f"⏭️  跳过 legacy @ {rows} 行（超过 --legacy-max-rows）")
+                continue
+            print(f"🔵 运行 {engine} @ {rows} 行 × {len(args.match_types)} 种匹配类型 ...")
+            results.append(run_case(engine, rows, args.match_types))
+
+    print_table(results)
+
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+        print(f"✅ 结果已写入 {args.json_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,317 @@
+#!/usr/bin/env python3
+"""
+完整向导流程基准测试（离线，Stage 1 → Stage 4）
+
+进程内通过 httpx ASGITransport 调用 FastAPI 应用，LLM 请求发往本地模拟服务（mock_llm.py），
+数据库为临时 SQLite 文件，不依赖外部网络和真实 DeepSeek。
+
+按步骤分阶段执行：每一步对所有流程以 --concurrency 并发执行完再进入下一步，
+因此每个接口的延迟、吞吐、SQL 查询数和内存峰值可以单独统计。结果以 JSON 输出，便于回归对比。
+
+用法（在 backend_v2 目录下）：
+    python -m benchmarks.bench_pipeline
+    python -m benchmarks.bench_pipeline --flows 50 --concurrency 10 --attributes 40 --entity-words 15 \\
+        --max-attributes 2 --match-types Broad Phrase Exact --llm-latency lognormal:800:0.6 --output bench.json
+    python -m benchmarks.bench_pipeline --llm-error-rate 0.2 --llm-truncate-rate 0.1   # 重试 / 降级路径
+    python -m benchmarks.bench_pipeline --tracemalloc   # 额外统计 Python 堆内存峰值（会拖慢整体耗时）
+
+用真实模型输出离线测试（见 app/services/llm_cassette.py）：
+    LLM_CASSETTE_MODE=record DEEPSEEK_API_KEY=... python -m benchmarks.bench_pipeline --real-llm --flows 5
+    LLM_CASSETTE_MODE=replay python -m benchmarks.bench_pipeline --flows 5
+"""
+
+import argparse
+import asyncio
+import contextlib
+import contextvars
+import json
+import os
+import platform
+import resource
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Dict, List, Optional
+
+# 当前请求所属的步骤（SQL 查询计数按步骤归类）
+current_step: contextvars.ContextVar = contextvars.ContextVar("bench_step", default=None)
+
+
+def percentile(values: List[float], p: float) -> float:
+    """线性插值百分位数（values 已排序）"""
+    if not values:
+        return 0.0
+    position = (len(values) - 1) * p / 100
+    lower = int(position)
+    upper = min(lower + 1, len(values) - 1)
+    return values[lower] + (values[upper] - values[lower]) * (position - lower)
+
+
+def peak_rss_mb() -> float:
+    """进程内存峰值（MB）"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux 单位为 KB，macOS 为字节
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def build_steps(args) -> List[Dict]:
+    """
+    向导流程的步骤定义
+
+    每一步：name / method / path（可含 {task_id}）/ body(ctx) / expect / after(ctx, response)
+    """
+    def remember(key, extract):
+        def after(ctx, data):
+            ctx[key] = extract(data)
+        return after
+
+    return [
+        {
+            "name": "stage1_generate",
+            "method": "POST",
+            "path": "/api/stage1/generate",
+            "body": lambda ctx: {"concept": ctx["concept"]},
+            "after": lambda ctx, data: ctx.update(
+                task_id=data["task_id"], attribute_ids=[a["id"] for a in data["attributes"]]
+            )
+        },
+        {
+            "name": "stage2_get_task",
+            "method": "GET",
+            "path": "/api/stage2/tasks/{task_id}"
+        },
+        {
+            "name": "stage2_selection",
+            "method": "PUT",
+            "path": "/api/stage2/tasks/{task_id}/selection",
+            "body": lambda ctx: {"selected_attribute_ids": ctx["attribute_ids"]}
+        },
+        {
+            "name": "stage3_entity_words",
+            "method": "POST",
+            "path": "/api/stage3/tasks/{task_id}/entity-words/generate",
+            "body": lambda ctx: {},
+            "after": remember("entity_word_ids", lambda data: [e["id"] for e in data["entity_words"]])
+        },
+        {
+            "name": "stage3_entity_selection",
+            "method": "PUT",
+            "path": "/api/stage3/tasks/{task_id}/entity-words/selection",
+            "body": lambda ctx: {"selected_entity_word_ids": ctx["entity_word_ids"]}
+        },
+        {
+            "name": "stage3_search_terms",
+            "method": "POST",
+            "path": "/api/stage3/tasks/{task_id}/search-terms",
+            "body": lambda ctx: {"options": {
+                "selection": "top_k", "max_terms": args.max_terms, "max_attributes": args.max_attributes
+            }}
+        },
+        {
+            "name": "stage3_list_search_terms",
+            "method": "GET",
+            "path": "/api/stage3/tasks/{task_id}/search-terms?page=1&page_size=100"
+        },
+        {
+            "name": "stage4_product_info",
+            "method": "POST",
+            "path": "/api/stage4/save-product-info",
+            "body": lambda ctx: {
+                "task_id": ctx["task_id"], "sku": f"SKU-{ctx['index']}",
+                "asin": f"B{ctx['index']:09d}", "model": "iPhone 16 Pro"
+            }
+        },
+        {
+            "name": "stage4_export",
+            "method": "POST",
+            "path": "/api/stage4/export",
+            "body": lambda ctx: {
+                "task_id": ctx["task_id"], "daily_budget": 10, "ad_group_default_bid": 0.5,
+                "keyword_bid": 0.4, "format": args.format, "match_types": args.match_types,
+                "bid_strategy": args.bid_strategy
+            }
+        }
+    ]
+
+
+async def run_step(client, step: Dict, contexts: List[Dict], concurrency: int, memory: bool) -> Dict:
+    """对所有流程执行一个步骤，返回该步骤的统计"""
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies: List[float] = []
+    errors: List[str] = []
+    response_bytes = 0
+
+    async def call(ctx):
+        nonlocal response_bytes
+        async with semaphore:
+            current_step.set(step["name"])
+            path = step["path"].format(**ctx)
+            body = step["body"](ctx) if "body" in step else None
+            start = time.perf_counter()
+            response = await client.request(step["method"], path, json=body)
+            latencies.append((time.perf_counter() - start) * 1000)
+            response_bytes += len(response.content)
+            if response.status_code != 200:
+                ctx["failed"] = True
+                errors.append(f"{response.status_code}: {response.text[:200]}")
+                return
+            if "after" in step:
+                step["after"](ctx, response.json())
+
+    active = [ctx for ctx in contexts if not ctx.get("failed")]
+    if memory:
+        tracemalloc.reset_peak()
+    start = time.perf_counter()
+    await asyncio.gather(*(call(ctx) for ctx in active))
+    wall = time.perf_counter() - start
+
+    latencies.sort()
+    result = {
+        "method": step["method"],
+        "path": step["path"].split("?")[0],
+        "requests": len(active),
+        "errors": len(errors),
+        "p50_ms": round(percentile(latencies, 50), 2),
+        "p95_ms": round(percentile(latencies, 95), 2),
+        "p99_ms": round(percentile(latencies, 99), 2),
+        "mean_ms": round(sum(latencies) / len(latencies), 2) if latencies else 0.0,
+        "max_ms": round(latencies[-1], 2) if latencies else 0.0,
+        "throughput_rps": round(len(active) / wall, 2) if wall else 0.0,
+        "wall_s": round(wall, 3),
+        "response_bytes": response_bytes,
+        "peak_rss_mb": round(peak_rss_mb(), 1)
+    }
+    if memory:
+        result["tracemalloc_peak_mb"] = round(tracemalloc.get_traced_memory()[1] / (1024 * 1024), 2)
+    if errors:
+        result["error_samples"] = errors[:3]
+    return result
+
+
+async def run(args) -> Dict:
+    from benchmarks.mock_llm import create_app, profile_from_args, start_mock_llm
+
+    profile = profile_from_args(args, "llm-", args.attributes, args.entity_words)
+    mock_app = create_app(profile)
+    runner = None
+    if not args.real_llm:
+        runner, api_base = await start_mock_llm(mock_app)
+        os.environ["DEEPSEEK_API_BASE"] = api_base
+        os.environ["DEEPSEEK_API_KEY"] = "mock"
+
+    workdir = tempfile.mkdtemp(prefix="bench_pipeline_")
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+    os.environ["EXPORT_CACHE_ENABLED"] = "true" if args.export_cache else "false"
+    os.environ["EXPORT_CACHE_DIR"] = os.path.join(workdir, "export_cache")
+
+    # 应用在环境变量设置完成后再导入（数据库地址、LLM 地址在导入时读取）
+    import httpx
+    from sqlalchemy import event
+    from app.database import engine
+    from app.main import app
+
+    query_counts: Dict[Optional[str], int] = {}
+
+    def count_query(*_):
+        step = current_step.get()
+        query_counts[step] = query_counts.get(step, 0) + 1
+
+    event.listen(engine, "before_cursor_execute", count_query)
+
+    if args.tracemalloc:
+        tracemalloc.start()
+
+    contexts = [{"index": i, "concept": f"{args.concept} {i}"} for i in range(args.flows)]
+    endpoints: Dict[str, Dict] = {}
+
+    await app.router.startup()
+    try:
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+            start = time.perf_counter()
+            for step in build_steps(args):
+                result = await run_step(client, step, contexts, args.concurrency, args.tracemalloc)
+                queries = query_counts.get(step["name"], 0)
+                result["queries_total"] = queries
+                result["queries_per_request"] = round(queries / result["requests"], 2) if result["requests"] else 0.0
+                endpoints[step["name"]] = result
+            total_wall = time.perf_counter() - start
+    finally:
+        await app.router.shutdown()
+        if runner is not None:
+            await runner.cleanup()
+        event.remove(engine, "before_cursor_execute", count_query)
+
+    return {
+        "config": {
+            "flows": args.flows,
+            "concurrency": args.concurrency,
+            "attributes": args.attributes,
+            "entity_words": args.entity_words,
+            "max_attributes": args.max_attributes,
+            "max_terms": args.max_terms,
+            "format": args.format,
+            "match_types": args.match_types,
+            "bid_strategy": args.bid_strategy,
+            "llm_responses": args.llm_responses,
+            "llm_latency": args.llm_latency,
+            "llm_error_rate": args.llm_error_rate,
+            "llm_truncate_rate": args.llm_truncate_rate,
+            "llm_seed": args.llm_seed,
+            "export_cache": args.export_cache,
+            "tracemalloc": args.tracemalloc,
+            "real_llm": args.real_llm,
+            "llm_cassette_mode": os.getenv("LLM_CASSETTE_MODE", "off")
+        },
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform()
+        },
+        "endpoints": endpoints,
+        "llm": mock_app["stats"],
+        "completed_flows": sum(1 for ctx in contexts if not ctx.get("failed")),
+        "total_wall_s": round(total_wall, 3),
+        "peak_rss_mb": round(peak_rss_mb(), 1)
+    }
+
+
+def main():
+    from benchmarks.mock_llm import add_profile_arguments
+
+    parser = argparse.ArgumentParser(description="完整向导流程基准测试（离线）")
+    parser.add_argument("--flows", type=int, default=20, help="完整流程（任务）数量")
+    parser.add_argument("--concurrency", type=int, default=5, help="每一步的并发请求数")
+    parser.add_argument("--concept", default="ocean", help="属性词概念前缀（每个流程加序号）")
+    parser.add_argument("--attributes", type=int, default=20, help="模拟 LLM 返回的属性词数量")
+    parser.add_argument("--entity-words", type=int, default=10, help="模拟 LLM 返回的本体词数量")
+    parser.add_argument("--max-attributes", type=int, default=1, help="搜索词最多叠加的属性词数量")
+    parser.add_argument("--max-terms", type=int, default=1000, help="搜索词数量上限（top_k）")
+    parser.add_argument("--format", default="xlsx", choices=["xlsx", "csv", "tsv"], help="导出格式")
+    parser.add_argument(
+        "--match-types", nargs="+", default=["Broad"], choices=["Broad", "Phrase", "Exact"], help="匹配类型"
+    )
+    parser.add_argument("--bid-strategy", default="fixed", choices=["fixed", "rules"], help="出价方式")
+    add_profile_arguments(parser, "llm-")
+    parser.add_argument("--export-cache", action="store_true", help="启用导出缓存（默认关闭，避免命中缓存）")
+    parser.add_argument(
+        "--real-llm", action="store_true",
+        help="不启动模拟服务，使用环境变量中的 DEEPSEEK_API_BASE / DEEPSEEK_API_KEY（配合 LLM_CASSETTE_MODE=record 录制）"
+    )
+    parser.add_argument("--tracemalloc", action="store_true", help="统计每一步的 Python 堆内存峰值")
+    parser.add_argument("--output", help="结果 JSON 文件路径（默认输出到标准输出）")
+    args = parser.parse_args()
+
+    # 应用的启动日志输出到 stderr，标准输出只保留结果 JSON
+    with contextlib.redirect_stdout(sys.stderr):
+        report = asyncio.run(run(args))
+
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    print(text)
+
+
+if __name__ == "__main__":
+    main()
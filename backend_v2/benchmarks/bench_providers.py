@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""
+LLM Provider 基准测试（重试 / 降级行为）
+
+对本地模拟服务（mock_llm.py）按指定的延迟、错误注入和截断配置调用
+DeepSeekProvider.generate_attributes 与 EntityWordProvider.generate_entity_words，
+统计每次调用的耗时分位数、实际发出的 LLM 请求数（含重试）和降级比例。
+相同的 --seed 和参数下，模拟服务每个请求的结果固定，结果可复现。
+
+用法（在 backend_v2 目录下）：
+    python -m benchmarks.bench_providers --calls 50
+    python -m benchmarks.bench_providers --calls 50 --error-rate 0.3 --truncate-rate 0.1 --latency lognormal:500:0.5
+    python -m benchmarks.bench_providers --responses recorded --stream-chunk-chars 8
+"""
+
+import argparse
+import asyncio
+import contextlib
+import json
+import logging
+import sys
+import time
+from typing import Dict, List
+
+from benchmarks.bench_pipeline import percentile
+from benchmarks.mock_llm import add_profile_arguments, create_app, profile_from_args, start_mock_llm
+
+
+async def bench_provider(name: str, call, is_fallback, calls: int, concurrency: int, stats: Dict) -> Dict:
+    """并发调用 calls 次，返回耗时分位数、LLM 请求数和降级比例"""
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies: List[float] = []
+    fallbacks = 0
+    requests_before = stats["requests"]
+
+    async def one(index: int):
+        nonlocal fallbacks
+        async with semaphore:
+            start = time.perf_counter()
+            result = await call(index)
+            latencies.append((time.perf_counter() - start) * 1000)
+            if is_fallback(index, result):
+                fallbacks += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(calls)))
+    wall = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        "provider": name,
+        "calls": calls,
+        "llm_requests": stats["requests"] - requests_before,
+        "fallbacks": fallbacks,
+        "fallback_rate": round(fallbacks / calls, 3) if calls else 0.0,
+        "p50_ms": round(percentile(latencies, 50), 2),
+        "p95_ms": round(percentile(latencies, 95), 2),
+        "p99_ms": round(percentile(latencies, 99), 2),
+        "max_ms": round(latencies[-1], 2) if latencies else 0.0,
+        "wall_s": round(wall, 3)
+    }
+
+
+async def run(args) -> Dict:
+    from app.config import load_ai_config, load_prompt
+    from app.services.deepseek_provider import DeepSeekProvider
+    from app.services.entity_word_provider import EntityWordProvider, convert_entity_word_to_standard
+
+    profile = profile_from_args(args, attribute_count=args.attributes, entity_word_count=args.entity_words)
+    mock_app = create_app(profile)
+    runner, api_base = await start_mock_llm(mock_app)
+    stats = mock_app["stats"]
+
+    config = dict(load_ai_config()["providers"]["deepseek"])
+    config.update(api_base=api_base, api_base_env="", api_key_env="BENCH_UNUSED")
+    attribute_provider = DeepSeekProvider(config=config, prompt_template=load_prompt("attribute_expert"))
+    attribute_provider.api_key = "mock"
+    entity_provider = EntityWordProvider(
+        api_key="mock", api_base=api_base, prompt_template=load_prompt("entity_word_expert")
+    )
+
+    concepts = [f"{args.concept} {i}" for i in range(args.calls)]
+    entity_words = [f"{args.entity_word} {i}" for i in range(args.calls)]
+
+    results = []
+    try:
+        if "attribute" in args.providers:
+            results.append(await bench_provider(
+                "DeepSeekProvider.generate_attributes",
+                lambda i: attribute_provider.generate_attributes(concepts[i]),
+                lambda i, result: result == attribute_provider._get_fallback_attributes(concepts[i]),
+                args.calls, args.concurrency, stats
+            ))
+        if "entity" in args.providers:
+            results.append(await bench_provider(
+                "EntityWordProvider.generate_entity_words",
+                lambda i: entity_provider.generate_entity_words(entity_words[i]),
+                lambda i, result: result == [
+                    convert_entity_word_to_standard(variant)
+                    for variant in entity_provider._get_enhanced_basic_variants(entity_words[i])
+                ][:15],
+                args.calls, args.concurrency, stats
+            ))
+    finally:
+        await runner.cleanup()
+
+    return {
+        "config": {
+            "calls": args.calls,
+            "concurrency": args.concurrency,
+            "responses": args.responses,
+            "latency": args.latency,
+            "error_rate": args.error_rate,
+            "error_statuses": args.error_statuses,
+            "truncate_rate": args.truncate_rate,
+            "seed": args.seed
+        },
+        "providers": results,
+        "llm": stats
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="LLM Provider 基准测试（重试 / 降级行为）")
+    parser.add_argument("--calls", type=int, default=20, help="每个 Provider 的调用次数")
+    parser.add_argument("--concurrency", type=int, default=5, help="并发调用数")
+    parser.add_argument("--providers", nargs="+", default=["attribute", "entity"], choices=["attribute", "entity"])
+    parser.add_argument("--concept", default="ocean", help="属性词概念前缀")
+    parser.add_argument("--entity-word", default="phone case", help="本体词前缀")
+    parser.add_argument("--attributes", type=int, default=20, help="synthetic 模式返回的属性词数量")
+    parser.add_argument("--entity-words", type=int, default=10, help="synthetic 模式返回的本体词数量")
+    add_profile_arguments(parser)
+    args = parser.parse_args()
+
+    # Provider 的调用日志输出到 stderr，标准输出只保留结果 JSON
+    logging.basicConfig(level=logging.WARNING, stream=sys.stderr)
+    with contextlib.redirect_stdout(sys.stderr):
+        report = asyncio.run(run(args))
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
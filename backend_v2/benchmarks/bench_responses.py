@@ -0,0 +1,227 @@
+#!/usr/bin/env python3
+"""
+列表响应编码基准测试
+
+1. 编码：同一个 SearchTermListResponse（默认 10k 搜索词）
+   - rows_json / rows_orjson：已序列化的响应内容分别用标准库 json（JSONResponse）和 orjson
+     （ORJSONResponse，应用默认）编码
+   - rows_validate_orjson：行格式的完整路径（逐行模型校验 + 序列化 + orjson 编码）
+   - columns_orjson：列式编码（?format=columns，直接读取对象属性 + orjson 编码）
+   比较耗时和响应体大小
+2. 端到端：临时 SQLite 中写入搜索词，经 httpx ASGITransport 请求
+   GET /api/stage3/tasks/{task_id}/search-terms（rows / columns），统计延迟分位数和响应体大小
+   （--accept-encoding 指定请求的 Accept-Encoding，默认 identity 不压缩；wire_bytes 为传输的字节数）
+
+用法（在 backend_v2 目录下）：
+    python -m benchmarks.bench_responses
+    python -m benchmarks.bench_responses --terms 10000 50000 --repeat 20 --output responses.json
+    python -m benchmarks.bench_responses --accept-encoding gzip
+"""
+
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+from types import SimpleNamespace
+from typing import Callable, Dict, List
+
+from benchmarks.bench_pipeline import percentile
+
+DEFAULT_TERMS = [10_000]
+ATTRIBUTE_WORDS = [f"attribute {i}" for i in range(100)]
+ENTITY_WORDS = ["phone case", "iphone case", "phone cover", "protective case", "cell phone case"]
+
+
+def make_rows(count: int) -> List[Dict]:
+    """生成搜索词数据（属性词 × 本体词循环取值，与真实组合的重复度相近）"""
+    rows = []
+    for i in range(count):
+        attribute_word = ATTRIBUTE_WORDS[i % len(ATTRIBUTE_WORDS)]
+        entity_word = ENTITY_WORDS[(i // len(ATTRIBUTE_WORDS)) % len(ENTITY_WORDS)]
+        term = f"{attribute_word} {entity_word} {i}"
+        rows.append({
+            "id": i + 1,
+            "term": term,
+            "attribute_id": i % len(ATTRIBUTE_WORDS) + 1,
+            "attribute_word": attribute_word,
+            "entity_word_id": (i // len(ATTRIBUTE_WORDS)) % len(ENTITY_WORDS) + 1,
+            "entity_word": entity_word,
+            "length": len(term),
+            "is_valid": len(term) <= 80
+        })
+    return rows
+
+
+def measure(func: Callable, repeat: int) -> Dict:
+    """重复执行 func（返回响应体），统计耗时分位数（毫秒）和响应体大小"""
+    durations = []
+    body = b""
+    for _ in range(repeat):
+        start = time.perf_counter()
+        body = func()
+        durations.append((time.perf_counter() - start) * 1000)
+    durations.sort()
+    return {
+        "p50_ms": round(percentile(durations, 50), 2),
+        "p95_ms": round(percentile(durations, 95), 2),
+        "bytes": len(body)
+    }
+
+
+def bench_encoding(count: int, repeat: int) -> Dict:
+    """响应体编码：json / orjson / 列式编码"""
+    from fastapi.responses import JSONResponse, ORJSONResponse
+    from pydantic import TypeAdapter
+    from app.main import SEARCH_TERM_COLUMNS, SEARCH_TERM_DICTIONARY_COLUMNS, columnar_response
+    from app.schemas.stage3 import SearchTermItem, SearchTermListResponse
+
+    records = [SimpleNamespace(**row) for row in make_rows(count)]
+    response = SearchTermListResponse(
+        task_id="bench",
+        search_terms=[SearchTermItem.model_validate(record) for record in records],
+        total=count,
+        page=1,
+        page_size=count
+    )
+    # 与 FastAPI 处理 response_model 的方式一致：先序列化为 JSON 兼容的 Python 对象，再由响应类编码
+    adapter = TypeAdapter(SearchTermListResponse)
+    content = adapter.dump_python(response, mode="json")
+
+    def rows_with(response_class):
+        def encode():
+            return response_class(content).body
+        return encode
+
+    def rows_full():
+        # 行格式的完整路径：逐行模型校验 + 序列化 + orjson 编码
+        items = [SearchTermItem.model_validate(record) for record in records]
+        model = response.model_copy(update={"search_terms": items})
+        return ORJSONResponse(adapter.dump_python(model, mode="json")).body
+
+    def columns():
+        empty = response.model_copy(update={"search_terms": []})
+        return columnar_response(
+            empty, "search_terms", records, SEARCH_TERM_COLUMNS, SEARCH_TERM_DICTIONARY_COLUMNS
+        ).body
+
+    return {
+        "rows_json": measure(rows_with(JSONResponse), repeat),
+        "rows_orjson": measure(rows_with(ORJSONResponse), repeat),
+        "rows_validate_orjson": measure(rows_full, repeat),
+        "columns_orjson": measure(columns, repeat)
+    }
+
+
+async def bench_endpoint(count: int, repeat: int, accept_encoding: str) -> Dict:
+    """端到端：GET 搜索词列表（一页取完）"""
+    import httpx
+    from app.crud import search_term as crud_search_term
+    from app.crud import task as crud_task
+    from app.database import SessionLocal
+    from app.main import app
+
+    task_id = f"bench-{count}"
+    db = SessionLocal()
+    try:
+        crud_task.create_task(db, task_id, "bench")
+        rows = make_rows(count)
+        for row in rows:
+            del row["id"]
+        crud_search_term.create_search_terms_batch(db, task_id, rows)
+    finally:
+        db.close()
+
+    url = f"/api/stage3/tasks/{task_id}/search-terms"
+    results = {}
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        for response_format in ("rows", "columns"):
+            params = {"page": 1, "page_size": count, "format": response_format}
+            headers = {"Accept-Encoding": accept_encoding}
+            durations = []
+            size = wire_size = 0
+            for _ in range(repeat):
+                start = time.perf_counter()
+                response = await client.get(url, params=params, headers=headers)
+                durations.append((time.perf_counter() - start) * 1000)
+                response.raise_for_status()
+                size = len(response.content)
+                wire_size = int(response.headers.get("content-length", size))
+            durations.sort()
+            results[response_format] = {
+                "p50_ms": round(percentile(durations, 50), 2),
+                "p95_ms": round(percentile(durations, 95), 2),
+                "bytes": size,
+                "wire_bytes": wire_size,
+                "content_encoding": response.headers.get("content-encoding", "identity")
+            }
+    return results
+
+
+def run(args) -> Dict:
+    workdir = tempfile.mkdtemp(prefix="bench_responses_")
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+    # 请求日志和指标不计入对比
+    os.environ.setdefault("SERVER_TIMING_ENABLED", "false")
+    os.environ.setdefault("METRICS_ENABLED", "false")
+
+    # 应用在环境变量设置完成后再导入（数据库地址在导入时读取）
+    from app.database import init_db
+    init_db()
+
+    cases = []
+    for count in args.terms:
+        case = {"terms": count, "encoding": bench_encoding(count, args.repeat)}
+        if not args.skip_endpoint:
+            case["endpoint"] = asyncio.run(bench_endpoint(count, args.repeat, args.accept_encoding))
+        cases.append(case)
+
+    return {
+        "config": {"terms": args.terms, "repeat": args.repeat, "accept_encoding": args.accept_encoding},
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform()
+        },
+        "cases": cases
+    }
+
+
+def print_table(report: Dict) -> None:
+    print(f"{'terms':>8} {'case':<28} {'p50_ms':>10} {'p95_ms':>10} {'bytes':>12} {'wire_bytes':>12}")
+    for case in report["cases"]:
+        results = {f"encode/{name}": value for name, value in case["encoding"].items()}
+        results.update({f"endpoint/{name}": value for name, value in case.get("endpoint", {}).items()})
+        for name, value in results.items():
+            wire_bytes = value.get("wire_bytes", value["bytes"])
+            print(
+                f"{case['terms']:>8} {name:<28} {value['p50_ms']:>10} {value['p95_ms']:>10} "
+                f"{value['bytes']:>12} {wire_bytes:>12}"
+            )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="列表响应编码基准测试")
+    parser.add_argument("--terms", type=int, nargs="+", default=DEFAULT_TERMS, help="搜索词数量")
+    parser.add_argument("--repeat", type=int, default=10, help="每个用例的重复次数")
+    parser.add_argument("--accept-encoding", default="identity", help="端到端请求的 Accept-Encoding（如 gzip、br）")
+    parser.add_argument("--skip-endpoint", action="store_true", help="只测试编码，不测试端到端请求")
+    parser.add_argument("--output", help="结果 JSON 文件路径（默认输出表格）")
+    args = parser.parse_args()
+
+    # 应用的启动日志输出到 stderr，标准输出只保留结果
+    with contextlib.redirect_stdout(sys.stderr):
+        report = run(args)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(json.dumps(report, ensure_ascii=False, indent=2) + "\n")
+    print_table(report)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,399 @@
+#!/usr/bin/env python3
+"""
+本地 DeepSeek 兼容的模拟 LLM 服务（/chat/completions，支持 stream=true）
+
+根据提示词识别 attribute_expert / entity_word_expert，返回与真实模型相同格式的内容：
+- synthetic：按数量生成属性词 / 本体词（数量可配置）
+- recorded：返回 benchmarks/fixtures/ 下录制的真实响应（按概念 / 本体词匹配，未匹配时用第一条）
+
+可配置延迟分布、429 / 5xx 注入和 JSON 截断，用于复现服务商变慢、限流和输出不完整，
+测试 Provider 的重试、降级行为。每个请求的结果只由 seed 和请求序号决定，并发顺序不影响结果。
+
+延迟分布（毫秒）：
+    200 / fixed:200        固定延迟
+    uniform:100:400        均匀分布
+    normal:300:50          正态分布（均值、标准差，小于 0 按 0）
+    lognormal:300:0.5      对数正态分布（中位数、sigma），长尾更接近真实服务
+
+用法（在 backend_v2 目录下）：
+    python -m benchmarks.mock_llm --port 8901 --latency lognormal:800:0.6 --error-rate 0.1 --truncate-rate 0.05
+    DEEPSEEK_API_BASE=http://127.0.0.1:8901/v1 DEEPSEEK_API_KEY=mock uvicorn app.main:app
+    curl http://127.0.0.1:8901/stats
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import random
+import re
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, Sequence, Tuple
+
+from aiohttp import web
+
+FIXTURES_DIR = Path(__file__).parent / "fixtures"
+
+# 生成属性词用的样本词（覆盖 search_term_rules.yaml 的各个类别）
+ATTRIBUTE_WORDS = [
+    "slim", "clear", "protective", "leather", "black", "shockproof", "thin", "silicone",
+    "pink", "magnetic", "compact", "wooden", "glitter", "rugged", "navy", "waterproof"
+]
+ENTITY_SUFFIXES = ["", "s", " cover", " shell", " skin", " protector", " sleeve", " bumper"]
+
+STARS = ["⭐⭐⭐⭐⭐ 高", "⭐⭐⭐⭐ 中高", "⭐⭐⭐ 中", "⭐⭐ 低"]
+
+_CONCEPT_PATTERN = re.compile(r'针对属性词概念 "(.+?)"')
+_ENTITY_WORD_PATTERN = re.compile(r"\*\*本体词\*\*：(.+)")
+
+
+def detect_prompt(prompt: str) -> Tuple[str, str]:
+    """
+    识别提示词类型
+
+    Returns:
+        ("attribute_expert", 属性概念) / ("entity_word_expert", 本体词) / ("unknown", "")
+    """
+    match = _CONCEPT_PATTERN.search(prompt)
+    if match:
+        return "attribute_expert", match.group(1)
+    match = _ENTITY_WORD_PATTERN.search(prompt)
+    if match:
+        return "entity_word_expert", match.group(1).strip()
+    return "unknown", ""
+
+
+def make_attributes(concept: str, count: int) -> List[Dict]:
+    """attribute_expert 格式的属性词列表（第一个为概念本身）"""
+    words = [concept.lower()] + [
+        ATTRIBUTE_WORDS[i % len(ATTRIBUTE_WORDS)] + ("" if i < len(ATTRIBUTE_WORDS) else f" {i // len(ATTRIBUTE_WORDS)}")
+        for i in range(count - 1)
+    ]
+    return [
+        {
+            "序号": i + 1,
+            "原始属性词概念": concept,
+            "属性词": word,
+            "词汇类型": "原词" if i == 0 else "同义词",
+            "中文翻译说明": f"{word} 的中文说明",
+            "适用场景": "手机壳商品标题和广告关键词",
+            "搜索价值": STARS[i % len(STARS)],
+            "推荐度": "✅" if i % 3 else "⚠️"
+        }
+        for i, word in enumerate(words[:count])
+    ]
+
+
+def make_entity_words(entity_word: str, count: int) -> List[Dict]:
+    """entity_word_expert 格式的本体词列表（第一个为原词）"""
+    words = [
+        entity_word + ENTITY_SUFFIXES[i % len(ENTITY_SUFFIXES)]
+        + ("" if i < len(ENTITY_SUFFIXES) else f" {i // len(ENTITY_SUFFIXES)}")
+        for i in range(count)
+    ]
+    return [
+        {
+            "本体词": word,
+            "词汇类型": "原词" if i == 0 else "变体",
+            "中文说明": f"{word} 的中文说明",
+            "适用场景": "用户搜索手机壳",
+            "推荐度": "✅",
+            "搜索价值": "⭐" * (5 - i % 3)
+        }
+        for i, word in enumerate(words)
+    ]
+
+
+def parse_latency(spec: str) -> Callable[[random.Random], float]:
+    """
+    解析延迟分布（见模块说明）
+
+    Returns:
+        rng → 延迟毫秒数
+
+    Raises:
+        ValueError: 格式不正确
+    """
+    parts = str(spec).split(":")
+    if len(parts) == 1:
+        parts = ["fixed"] + parts
+    kind = parts[0]
+    try:
+        values = [float(value) for value in parts[1:]]
+    except ValueError:
+        values = []
+
+    if kind == "fixed" and len(values) == 1:
+        return lambda rng: values[0]
+    if kind == "uniform" and len(values) == 2:
+        return lambda rng: rng.uniform(values[0], values[1])
+    if kind == "normal" and len(values) == 2:
+        return lambda rng: max(rng.gauss(values[0], values[1]), 0.0)
+    if kind == "lognormal" and len(values) == 2:
+        return lambda rng: rng.lognormvariate(math.log(values[0]), values[1])
+    raise ValueError(f"无法解析延迟分布: {spec}（示例：200 / uniform:100:400 / normal:300:50 / lognormal:300:0.5）")
+
+
+def load_recorded_responses(fixtures_dir: Path = FIXTURES_DIR) -> Dict[str, Dict[str, str]]:
+    """加载录制的响应：{提示词类型: {概念或本体词: 原始响应内容}}"""
+    recorded = {}
+    for kind in ("attribute_expert", "entity_word_expert"):
+        path = Path(fixtures_dir) / f"{kind}.json"
+        if path.exists():
+            with open(path, "r", encoding="utf-8") as f:
+                recorded[kind] = json.load(f)
+    return recorded
+
+
+class MockLLMProfile:
+    """模拟服务的响应配置"""
+
+    def __init__(
+        self,
+        responses: str = "synthetic",
+        attribute_count: int = 20,
+        entity_word_count: int = 10,
+        latency: str = "fixed:0",
+        error_rate: float = 0.0,
+        error_statuses: Sequence[int] = (429, 500, 503),
+        truncate_rate: float = 0.0,
+        stream_chunk_chars: int = 16,
+        stream_interval_ms: float = 0.0,
+        seed: int = 42,
+        fixtures_dir: Path = FIXTURES_DIR
+    ):
+        """
+        Args:
+            responses: synthetic（按数量生成）/ recorded（录制的真实响应）
+            attribute_count: synthetic 模式每次返回的属性词数量
+            entity_word_count: synthetic 模式每次返回的本体词数量
+            latency: 延迟分布（stream=true 时为首个 token 的延迟）
+            error_rate: 返回错误状态码的比例
+            error_statuses: 注入的错误状态码（随机选择）
+            truncate_rate: 响应内容截断为一半（JSON 不完整）的比例
+            stream_chunk_chars: stream=true 时每个 chunk 的字符数
+            stream_interval_ms: stream=true 时 chunk 之间的间隔
+            seed: 随机种子
+            fixtures_dir: 录制响应的目录
+        """
+        if responses not in ("synthetic", "recorded"):
+            raise ValueError(f"不支持的响应模式: {responses}")
+        self.responses = responses
+        self.attribute_count = attribute_count
+        self.entity_word_count = entity_word_count
+        self.latency = latency
+        self.sample_latency = parse_latency(latency)
+        self.error_rate = error_rate
+        self.error_statuses = tuple(error_statuses)
+        self.truncate_rate = truncate_rate
+        self.stream_chunk_chars = max(stream_chunk_chars, 1)
+        self.stream_interval_ms = stream_interval_ms
+        self.seed = seed
+        self.recorded = load_recorded_responses(fixtures_dir) if responses == "recorded" else {}
+
+    def content_for(self, kind: str, value: str) -> str:
+        """提示词对应的响应内容"""
+        if self.responses == "recorded" and self.recorded.get(kind):
+            recorded = self.recorded[kind]
+            return recorded.get(value.lower(), next(iter(recorded.values())))
+        if kind == "attribute_expert":
+            return "```json\n" + json.dumps(make_attributes(value, self.attribute_count), ensure_ascii=False) + "\n```"
+        if kind == "entity_word_expert":
+            return json.dumps(make_entity_words(value, self.entity_word_count), ensure_ascii=False)
+        return "[]"
+
+    def outcome(self, sequence: int) -> Tuple[float, int, bool]:
+        """
+        第 sequence 个请求的结果（只由 seed 和序号决定）
+
+        Returns:
+            (延迟毫秒, 状态码, 是否截断)
+        """
+        rng = random.Random(self.seed * 1_000_003 + sequence)
+        latency_ms = self.sample_latency(rng)
+        status = 200
+        if self.error_statuses and rng.random() < self.error_rate:
+            status = rng.choice(self.error_statuses)
+        truncated = status == 200 and rng.random() < self.truncate_rate
+        return latency_ms, status, truncated
+
+
+def _usage(prompt: str, content: str) -> Dict[str, int]:
+    """粗略的 token 用量（约 4 个字符一个 token）"""
+    prompt_tokens = len(prompt) // 4
+    completion_tokens = len(content) // 4
+    return {
+        "prompt_tokens": prompt_tokens,
+        "completion_tokens": completion_tokens,
+        "total_tokens": prompt_tokens + completion_tokens
+    }
+
+
+def create_app(profile: MockLLMProfile = None) -> web.Application:
+    """
+    创建模拟 LLM 应用
+
+    Args:
+        profile: 响应配置（默认 synthetic、无延迟、无错误）
+    """
+    profile = profile or MockLLMProfile()
+    stats = {"requests": 0, "streamed": 0, "truncated": 0, "by_kind": {}, "by_status": {}}
+
+    def error_response(status: int) -> web.Response:
+        if status == 429:
+            return web.json_response(
+                {"error": {"message": "Rate limit reached for requests", "type": "rate_limit_error"}},
+                status=429,
+                headers={"Retry-After": "1"}
+            )
+        return web.json_response(
+            {"error": {"message": "The server is overloaded or not ready yet.", "type": "server_error"}},
+            status=status
+        )
+
+    async def stream_response(request: web.Request, body: Dict, prompt: str, content: str, finish_reason: str):
+        response = web.StreamResponse(headers={"Content-Type": "text/event-stream", "Cache-Control": "no-cache"})
+        await response.prepare(request)
+        completion_id = f"mock-{stats['requests']}"
+        created = int(time.time())
+
+        def event(delta: Dict, reason=None, usage=None) -> bytes:
+            chunk = {
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "created": created,
+                "model": body.get("model", "deepseek-chat"),
+                "choices": [{"index": 0, "delta": delta, "finish_reason": reason}]
+            }
+            if usage:
+                chunk["usage"] = usage
+            return f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n".encode("utf-8")
+
+        await response.write(event({"role": "assistant", "content": ""}))
+        size = profile.stream_chunk_chars
+        for start in range(0, len(content), size):
+            if start and profile.stream_interval_ms:
+                await asyncio.sleep(profile.stream_interval_ms / 1000)
+            await response.write(event({"content": content[start:start + size]}))
+        await response.write(event({}, finish_reason, _usage(prompt, content)))
+        await response.write(b"data: [DONE]\n\n")
+        await response.write_eof()
+        return response
+
+    async def chat_completions(request: web.Request) -> web.StreamResponse:
+        body = await request.json()
+        sequence = stats["requests"]
+        stats["requests"] += 1
+
+        prompt = body["messages"][-1]["content"]
+        kind, value = detect_prompt(prompt)
+        stats["by_kind"][kind] = stats["by_kind"].get(kind, 0) + 1
+
+        latency_ms, status, truncated = profile.outcome(sequence)
+        stats["by_status"][str(status)] = stats["by_status"].get(str(status), 0) + 1
+        if latency_ms:
+            await asyncio.sleep(latency_ms / 1000)
+
+        if status != 200:
+            return error_response(status)
+
+        content = profile.content_for(kind, value)
+        finish_reason = "stop"
+        if truncated:
+            stats["truncated"] += 1
+            content = content[:len(content) // 2]
+            finish_reason = "length"
+
+        if body.get("stream"):
+            stats["streamed"] += 1
+            return await stream_response(request, body, prompt, content, finish_reason)
+
+        return web.json_response({
+            "id": f"mock-{sequence}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model", "deepseek-chat"),
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": content},
+                "finish_reason": finish_reason
+            }],
+            "usage": _usage(prompt, content)
+        })
+
+    async def get_stats(request: web.Request) -> web.Response:
+        return web.json_response(stats)
+
+    app = web.Application()
+    app["stats"] = stats
+    app["profile"] = profile
+    app.router.add_post("/v1/chat/completions", chat_completions)
+    app.router.add_post("/chat/completions", chat_completions)
+    app.router.add_get("/stats", get_stats)
+    return app
+
+
+async def start_mock_llm(app: web.Application, host: str = "127.0.0.1", port: int = 0) -> Tuple[web.AppRunner, str]:
+    """
+    在当前事件循环中启动模拟服务
+
+    Returns:
+        (runner, api_base)，结束时调用 await runner.cleanup()
+    """
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    site = web.TCPSite(runner, host, port)
+    await site.start()
+    actual_port = site._server.sockets[0].getsockname()[1]
+    return runner, f"http://{host}:{actual_port}/v1"
+
+
+def add_profile_arguments(parser: argparse.ArgumentParser, prefix: str = ""):
+    """添加响应配置的命令行参数（bench_pipeline 等脚本复用，prefix 如 "llm-"）"""
+    parser.add_argument(f"--{prefix}responses", default="synthetic", choices=["synthetic", "recorded"], help="响应内容")
+    parser.add_argument(f"--{prefix}latency", default="fixed:0", help="延迟分布（毫秒），如 lognormal:800:0.6")
+    parser.add_argument(f"--{prefix}error-rate", type=float, default=0.0, help="错误注入比例")
+    parser.add_argument(
+        f"--{prefix}error-statuses", type=int, nargs="+", default=[429, 500, 503], help="注入的错误状态码"
+    )
+    parser.add_argument(f"--{prefix}truncate-rate", type=float, default=0.0, help="JSON 截断比例")
+    parser.add_argument(f"--{prefix}stream-chunk-chars", type=int, default=16, help="流式响应每个 chunk 的字符数")
+    parser.add_argument(f"--{prefix}stream-interval-ms", type=float, default=0.0, help="流式响应 chunk 间隔")
+    parser.add_argument(f"--{prefix}seed", type=int, default=42, help="随机种子")
+
+
+def profile_from_args(args, prefix: str = "", attribute_count: int = 20, entity_word_count: int = 10) -> MockLLMProfile:
+    """由 add_profile_arguments 的参数创建响应配置"""
+    prefix = prefix.replace("-", "_")
+    return MockLLMProfile(
+        responses=getattr(args, f"{prefix}responses"),
+        attribute_count=attribute_count,
+        entity_word_count=entity_word_count,
+        latency=getattr(args, f"{prefix}latency"),
+        error_rate=getattr(args, f"{prefix}error_rate"),
+        error_statuses=getattr(args, f"{prefix}error_statuses"),
+        truncate_rate=getattr(args, f"{prefix}truncate_rate"),
+        stream_chunk_chars=getattr(args, f"{prefix}stream_chunk_chars"),
+        stream_interval_ms=getattr(args, f"{prefix}stream_interval_ms"),
+        seed=getattr(args, f"{prefix}seed")
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="本地 DeepSeek 兼容的模拟 LLM 服务")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8901)
+    parser.add_argument("--attributes", type=int, default=20, help="synthetic 模式每次返回的属性词数量")
+    parser.add_argument("--entity-words", type=int, default=10, help="synthetic 模式每次返回的本体词数量")
+    add_profile_arguments(parser)
+    args = parser.parse_args()
+
+    profile = profile_from_args(args, attribute_count=args.attributes, entity_word_count=args.entity_words)
+    app = create_app(profile)
+    print(f"模拟 LLM 服务: http://{args.host}:{args.port}/v1/chat/completions（统计：/stats）")
+    web.run_app(app, host=args.host, port=args.port, access_log=None, print=None)
+
+
+if __name__ == "__main__":
+    main()
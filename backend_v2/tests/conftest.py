@@ -0,0 +1,14 @@
+"""
+单元测试公共配置
+
+在导入 app 之前设置环境变量：数据库和导出缓存使用临时目录，不读写开发环境的数据
+运行（在 backend_v2 目录下）：python -m pytest
+"""
+
+import os
+import tempfile
+
+_TMP_DIR = tempfile.mkdtemp(prefix="bulksheet_tests_")
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(_TMP_DIR, 'test.db')}")
+os.environ.setdefault("EXPORT_CACHE_DIR", os.path.join(_TMP_DIR, "export_cache"))
+os.environ.setdefault("LOG_LEVEL", "WARNING")
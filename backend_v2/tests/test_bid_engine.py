@@ -0,0 +1,91 @@
+"""BidEngine：按规则表向量化计算逐词出价"""
+
+import numpy as np
+import pytest
+
+from app.config import load_bid_rules
+from app.services.bid_engine import BidEngine
+
+RULES = {
+    "stars_source": "min",
+    "stars_multipliers": {1: 0.5, 2: 0.75, 3: 1.0, 4: 1.2, 5: 1.5},
+    "length_rules": [
+        {"max_length": 30, "multiplier": 1.0},
+        {"max_length": 10, "multiplier": 1.2},
+        {"max_length": None, "multiplier": 0.8},
+    ],
+    "match_type_multipliers": {"Broad": 1.0, "Exact": 1.5},
+    "min_bid": 0.1,
+    "max_bid": 3.0,
+    "bid_increment": 0.05,
+}
+
+
+def test_compute_rows_applies_stars_length_and_match_type():
+    engine = BidEngine(RULES)
+    features = [
+        # (term, length, 属性词星级, 本体词星级)
+        ("a", 8, 5, 4),    # 星级 min=4 → 1.2；长度 ≤10 → 1.2：1.44
+        ("b", 30, 3, 5),   # 星级 3 → 1.0；长度 ≤30（含边界）→ 1.0
+        ("c", 31, 1, 1),   # 星级 1 → 0.5；超过所有上限 → 0.8
+        ("d", 5, 0, 5),    # 0 星按 1 星处理
+    ]
+
+    bids = engine.compute_rows(1.0, features, ["Broad", "Exact"])
+
+    # 按 bid_increment（0.05）取整
+    np.testing.assert_allclose(bids, [
+        [1.45, 2.15],
+        [1.0, 1.5],
+        [0.4, 0.6],
+        [0.6, 0.9],
+    ])
+
+
+def test_compute_rows_clamps_to_min_and_max_bid():
+    engine = BidEngine(RULES)
+
+    np.testing.assert_allclose(engine.compute_rows(5.0, [("b", 30, 3, 3)], ["Broad", "Exact"]), [[3.0, 3.0]])
+    np.testing.assert_allclose(engine.compute_rows(0.05, [("c", 31, 1, 1)], ["Broad"]), [[0.1]])
+
+
+def test_request_multipliers_override_rule_table():
+    engine = BidEngine(RULES)
+
+    bids = engine.compute_rows(1.0, [("b", 30, 3, 3)], ["Broad", "Exact", "Phrase"], {"Exact": 2.0})
+    # Phrase 不在规则表和请求中：系数 1.0
+    np.testing.assert_allclose(bids, [[1.0, 2.0, 1.0]])
+
+
+@pytest.mark.parametrize("stars_source, expected", [
+    ("min", 1.0),
+    ("max", 1.5),
+    ("mean", 1.2),
+    ("attribute", 1.5),
+    ("entity", 1.0),
+])
+def test_stars_source(stars_source, expected):
+    engine = BidEngine({**RULES, "stars_source": stars_source})
+
+    np.testing.assert_allclose(engine.compute_rows(1.0, [("b", 30, 5, 3)], ["Broad"]), [[expected]])
+
+
+def test_empty_features():
+    assert BidEngine(RULES).compute_rows(1.0, [], ["Broad"]) == []
+
+
+@pytest.mark.parametrize("override", [
+    {"stars_source": "median"},
+    {"min_bid": 5.0, "max_bid": 1.0},
+])
+def test_invalid_rules_are_rejected(override):
+    with pytest.raises(ValueError):
+        BidEngine({**RULES, **override})
+
+
+def test_shipped_rule_table_loads():
+    engine = BidEngine(load_bid_rules())
+
+    bids = engine.compute_rows(1.0, [("ocean phone case", 16, 3, 3)], ["Broad", "Phrase", "Exact"])
+    assert len(bids) == 1 and len(bids[0]) == 3
+    assert all(engine.min_bid <= bid <= engine.max_bid for bid in bids[0])
@@ -0,0 +1,85 @@
+"""BulksheetGenerator：匹配类型行、固定出价（keyword_bid × 倍数）、逐词出价、名称后缀"""
+
+import pytest
+
+from app.models_db import Task
+from app.services.bulksheet_generator import BulksheetGenerator
+
+ENTITY = BulksheetGenerator.COLUMN_INDEX["Entity"]
+CAMPAIGN_NAME = BulksheetGenerator.COLUMN_INDEX["Campaign Name"]
+AD_GROUP_NAME = BulksheetGenerator.COLUMN_INDEX["Ad Group Name"]
+BID = BulksheetGenerator.COLUMN_INDEX["Bid"]
+KEYWORD_TEXT = BulksheetGenerator.COLUMN_INDEX["Keyword Text"]
+MATCH_TYPE = BulksheetGenerator.COLUMN_INDEX["Match Type"]
+
+
+def make_generator(keyword_bid, match_types=None, bid_multipliers=None, name_suffix=""):
+    return BulksheetGenerator(
+        task=Task(concept="ocean"),
+        product_info={"sku": "SKU-1", "asin": "B000000001", "model": "iPhone 15"},
+        budget_info={"daily_budget": 10.0, "ad_group_default_bid": 0.5, "keyword_bid": keyword_bid},
+        match_types=match_types,
+        bid_multipliers=bid_multipliers,
+        name_suffix=name_suffix
+    )
+
+
+def keyword_rows(generator, keywords, keyword_bids=None):
+    rows = generator.iter_rows(keywords, [], keyword_bids=keyword_bids)
+    return [
+        (row[KEYWORD_TEXT], row[MATCH_TYPE], row[BID])
+        for row in rows if row[ENTITY] == "Keyword"
+    ]
+
+
+def test_one_row_per_keyword_and_match_type():
+    generator = make_generator(0.4, match_types=["Broad", "Exact"])
+
+    assert keyword_rows(generator, ["a", "b"]) == [
+        ("a", "Broad", 0.4), ("a", "Exact", 0.4),
+        ("b", "Broad", 0.4), ("b", "Exact", 0.4)
+    ]
+
+
+@pytest.mark.parametrize("keyword_bid, multiplier, expected", [
+    # 倍数结果保留 2 位小数
+    (0.4, 1.25, 0.5),
+    (0.33, 1.1, 0.36),
+    # 低于 Amazon 最低出价时按最低出价导出
+    (0.04, 0.1, BulksheetGenerator.MIN_BID),
+    (0.01, 1.0, BulksheetGenerator.MIN_BID),
+    # 固定出价不设上限（bid_rules.yaml 的 max_bid 只用于按规则出价）
+    (25.0, 1.0, 25.0),
+    (15.0, 10.0, 150.0),
+])
+def test_fixed_bid_applies_multiplier_and_floor(keyword_bid, multiplier, expected):
+    generator = make_generator(keyword_bid, match_types=["Exact"], bid_multipliers={"Exact": multiplier})
+
+    assert keyword_rows(generator, ["a"]) == [("a", "Exact", expected)]
+
+
+def test_unlisted_match_type_uses_base_bid():
+    generator = make_generator(0.4, match_types=["Broad", "Phrase"], bid_multipliers={"Phrase": 2.0})
+
+    assert [bid for _, _, bid in keyword_rows(generator, ["a"])] == [0.4, 0.8]
+
+
+def test_keyword_bids_override_fixed_bid():
+    generator = make_generator(0.4, match_types=["Broad", "Exact"])
+
+    rows = keyword_rows(generator, ["a", "b"], keyword_bids=[[0.3, 0.45], [0.5, 0.62]])
+    assert rows == [
+        ("a", "Broad", 0.3), ("a", "Exact", 0.45),
+        ("b", "Broad", 0.5), ("b", "Exact", 0.62)
+    ]
+
+
+def test_row_order_and_name_suffix():
+    generator = make_generator(0.4, name_suffix=" part02")
+    rows = list(generator.iter_rows(["a"], ["phone case"]))
+
+    assert [row[ENTITY] for row in rows] == [
+        "Campaign", "Ad Group", "Product Ad", "Keyword", "Campaign negative keyword"
+    ]
+    assert all(row[CAMPAIGN_NAME].endswith(" part02") for row in rows)
+    assert all(row[AD_GROUP_NAME].endswith(" part02") for row in rows[1:])
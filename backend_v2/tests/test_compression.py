@@ -0,0 +1,120 @@
+"""响应压缩：Accept-Encoding 协商、CompressionMiddleware、导出缓存预压缩副本"""
+
+import gzip
+import json
+
+import pytest
+from starlette.applications import Starlette
+from starlette.responses import JSONResponse, Response, StreamingResponse
+from starlette.routing import Route
+from starlette.testclient import TestClient
+
+from app.services.compression import CPUGuard, CompressionMiddleware, negotiate, parse_accept_encoding
+from app.services.export_cache import ExportCache
+
+PAYLOAD = {"search_terms": [{"id": i, "term": f"ocean phone case {i}"} for i in range(500)]}
+
+
+@pytest.mark.parametrize("header, expected", [
+    (None, None),
+    ("", None),
+    ("gzip", "gzip"),
+    ("GZIP;q=0.5", "gzip"),
+    # q 值相同时按服务端顺序
+    ("gzip, br", "br"),
+    # 客户端 q 值优先
+    ("gzip;q=1, br;q=0.5", "gzip"),
+    ("br;q=0, gzip", "gzip"),
+    ("*", "br"),
+    ("*;q=0.2, br;q=0", "gzip"),
+    ("identity", None),
+    ("gzip;q=0", None),
+])
+def test_negotiate(header, expected):
+    assert negotiate(header, ["br", "gzip"]) == expected
+
+
+def test_parse_accept_encoding_tolerates_bad_q():
+    assert parse_accept_encoding("gzip;q=abc, br ;q=0.8, ,deflate") == {"gzip": 0.0, "br": 0.8, "deflate": 1.0}
+
+
+def make_client(min_size=100, guard=None):
+    async def large(request):
+        return JSONResponse(PAYLOAD, headers={"ETag": '"abc"'})
+
+    async def small(request):
+        return JSONResponse({"ok": True})
+
+    async def binary(request):
+        return Response(b"\x89PNG" + b"\x00" * 5000, media_type="image/png")
+
+    async def stream(request):
+        async def chunks():
+            for _ in range(3):
+                yield b"x" * 2000
+        return StreamingResponse(chunks(), media_type="text/csv")
+
+    app = Starlette(routes=[
+        Route("/large", large), Route("/small", small), Route("/binary", binary), Route("/stream", stream)
+    ])
+    middleware = CompressionMiddleware(app, min_size=min_size, guard=guard)
+    # 不依赖 brotli / zstandard 是否安装
+    middleware.encodings = ["gzip"]
+    return TestClient(middleware)
+
+
+def test_compresses_large_json():
+    response = make_client().get("/large", headers={"Accept-Encoding": "gzip"})
+
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.headers["vary"] == "Accept-Encoding"
+    assert response.headers["etag"] == 'W/"abc"'
+    raw_size = len(json.dumps(PAYLOAD, separators=(",", ":")))
+    assert int(response.headers["content-length"]) < raw_size / 4
+    # TestClient 已按 Content-Encoding 解压
+    assert response.json() == PAYLOAD
+
+
+def test_identity_request_is_untouched():
+    response = make_client().get("/large", headers={"Accept-Encoding": "identity"})
+
+    assert "content-encoding" not in response.headers
+    assert response.headers["etag"] == '"abc"'
+    assert response.json() == PAYLOAD
+
+
+@pytest.mark.parametrize("path", ["/small", "/binary", "/stream"])
+def test_small_binary_and_streaming_responses_are_not_compressed(path):
+    response = make_client(min_size=1024).get(path, headers={"Accept-Encoding": "gzip"})
+
+    assert response.status_code == 200
+    assert "content-encoding" not in response.headers
+
+
+def test_busy_guard_skips_compression():
+    response = make_client(guard=CPUGuard(max_concurrent=0)).get("/large", headers={"Accept-Encoding": "gzip"})
+
+    assert "content-encoding" not in response.headers
+    assert response.headers["vary"] == "Accept-Encoding"
+    assert response.json() == PAYLOAD
+
+
+def test_export_cache_precompressed_variant(tmp_path):
+    cache = ExportCache(cache_dir=str(tmp_path), max_bytes=1024 * 1024)
+    data = b"Product,Entity,Keyword Text\r\n" + b"Sponsored Products,Keyword,ocean phone case\r\n" * 200
+    source = tmp_path / "upload.tmp"
+    source.write_bytes(data)
+    cache._commit("a.csv", str(source))
+
+    assert cache.open_variant("a.csv", "gzip") is None
+    cache.precompress("a.csv", "gzip")
+    f, size = cache.open_variant("a.csv", "gzip")
+    with f:
+        compressed = f.read()
+
+    assert size == len(compressed) < len(data)
+    assert gzip.decompress(compressed) == data
+    assert cache.stats()["precompressed"] == 1
+    # 副本已存在时不重复生成
+    cache.precompress("a.csv", "gzip")
+    assert cache.stats()["precompressed"] == 1
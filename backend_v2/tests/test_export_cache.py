@@ -0,0 +1,104 @@
+"""ExportCache：写入、LRU 淘汰、重启恢复、tee 中断时丢弃"""
+
+import asyncio
+import os
+
+import pytest
+
+from app.services.export_cache import ExportCache, compute_job_hash
+
+
+def _put(cache: ExportCache, key: str, data: bytes) -> None:
+    """通过 tee 完整消费字节流写入缓存"""
+    async def stream():
+        for i in range(0, len(data), 4):
+            yield data[i:i + 4]
+
+    async def consume():
+        return b"".join([chunk async for chunk in cache.tee(key, stream())])
+
+    assert asyncio.run(consume()) == data
+
+
+def _read(cache: ExportCache, key: str):
+    opened = cache.open(key)
+    if opened is None:
+        return None
+    f, size = opened
+    with f:
+        data = f.read()
+    assert len(data) == size
+    return data
+
+
+def test_tee_commits_and_open_hits(tmp_path):
+    cache = ExportCache(cache_dir=str(tmp_path), max_bytes=1000)
+    _put(cache, "a.csv", b"hello,world\r\n")
+
+    assert _read(cache, "a.csv") == b"hello,world\r\n"
+    assert _read(cache, "missing.csv") is None
+    stats = cache.stats()
+    assert (stats["entries"], stats["bytes"], stats["hits"], stats["misses"]) == (1, 13, 1, 1)
+    # 临时文件已原子重命名
+    assert os.listdir(tmp_path) == ["a.csv"]
+
+
+def test_evicts_least_recently_used(tmp_path):
+    cache = ExportCache(cache_dir=str(tmp_path), max_bytes=25)
+    _put(cache, "a.csv", b"a" * 10)
+    _put(cache, "b.csv", b"b" * 10)
+    # 读取 a 后 b 成为最久未使用
+    assert _read(cache, "a.csv") == b"a" * 10
+    _put(cache, "c.csv", b"c" * 10)
+
+    assert _read(cache, "b.csv") is None
+    assert _read(cache, "a.csv") == b"a" * 10
+    assert _read(cache, "c.csv") == b"c" * 10
+    assert cache.stats()["evictions"] == 1
+    assert cache.stats()["bytes"] == 20
+    assert sorted(os.listdir(tmp_path)) == ["a.csv", "c.csv"]
+
+
+def test_entry_larger_than_limit_is_not_kept(tmp_path):
+    cache = ExportCache(cache_dir=str(tmp_path), max_bytes=5)
+    _put(cache, "big.csv", b"x" * 6)
+
+    assert _read(cache, "big.csv") is None
+    assert os.listdir(tmp_path) == []
+
+
+def test_reload_restores_entries_and_removes_tmp_files(tmp_path):
+    cache = ExportCache(cache_dir=str(tmp_path), max_bytes=100)
+    _put(cache, "a.csv", b"a" * 10)
+    (tmp_path / "b.csv.0123.tmp").write_bytes(b"partial")
+
+    reloaded = ExportCache(cache_dir=str(tmp_path), max_bytes=100)
+    assert _read(reloaded, "a.csv") == b"a" * 10
+    assert reloaded.stats()["bytes"] == 10
+    assert os.listdir(tmp_path) == ["a.csv"]
+
+
+def test_interrupted_tee_discards_partial_file(tmp_path):
+    cache = ExportCache(cache_dir=str(tmp_path), max_bytes=100)
+
+    async def failing_stream():
+        yield b"first chunk"
+        raise RuntimeError("render failed")
+
+    async def consume():
+        async for _ in cache.tee("a.csv", failing_stream()):
+            pass
+
+    with pytest.raises(RuntimeError):
+        asyncio.run(consume())
+    assert _read(cache, "a.csv") is None
+    assert os.listdir(tmp_path) == []
+
+
+def test_job_hash_depends_on_content_only():
+    job = {"campaigns": [{"keywords": ["a", "b"]}], "format": "csv"}
+    same = {"format": "csv", "campaigns": [{"keywords": ["a", "b"]}]}
+    changed = {"campaigns": [{"keywords": ["a", "c"]}], "format": "csv"}
+
+    assert compute_job_hash(job) == compute_job_hash(same)
+    assert compute_job_hash(job) != compute_job_hash(changed)
@@ -0,0 +1,125 @@
+"""plan_shards：按行数/大小切分导出任务，每个分片可单独上传"""
+
+from app.services.bulksheet_generator import BulksheetGenerator
+from app.services.export_executor import (
+    build_campaign,
+    build_export_job,
+    count_job_rows,
+    iter_campaign_rows,
+    iter_job_chunks,
+    plan_shards
+)
+
+ENTITY = BulksheetGenerator.COLUMN_INDEX["Entity"]
+CAMPAIGN_NAME = BulksheetGenerator.COLUMN_INDEX["Campaign Name"]
+AD_GROUP_NAME = BulksheetGenerator.COLUMN_INDEX["Ad Group Name"]
+KEYWORD_TEXT = BulksheetGenerator.COLUMN_INDEX["Keyword Text"]
+BID = BulksheetGenerator.COLUMN_INDEX["Bid"]
+
+
+def make_campaign(keyword_count, negative_count=2, match_types=None, model="iPhone 15", keyword_bids=None):
+    return build_campaign(
+        "ocean",
+        {"sku": "SKU-1", "asin": "B000000001", "model": model},
+        {"daily_budget": 10.0, "ad_group_default_bid": 0.5, "keyword_bid": 0.4},
+        [f"ocean phone case {i}" for i in range(keyword_count)],
+        [f"negative {i}" for i in range(negative_count)],
+        match_types=match_types,
+        keyword_bids=keyword_bids
+    )
+
+
+def shard_rows(shard):
+    return [row for segment in shard for row in iter_campaign_rows(segment)]
+
+
+def assert_self_contained(rows):
+    """每个 Keyword / 否定词行引用的 Campaign 和 Ad Group 都在同一文件中创建"""
+    assert rows[0][ENTITY] == "Campaign"
+    campaigns = {row[CAMPAIGN_NAME] for row in rows if row[ENTITY] == "Campaign"}
+    ad_groups = {(row[CAMPAIGN_NAME], row[AD_GROUP_NAME]) for row in rows if row[ENTITY] == "Ad Group"}
+    for row in rows:
+        assert row[CAMPAIGN_NAME] in campaigns
+        if row[ENTITY] == "Keyword":
+            assert (row[CAMPAIGN_NAME], row[AD_GROUP_NAME]) in ad_groups
+
+
+def test_small_job_is_one_shard():
+    campaign = make_campaign(10)
+    shards = plan_shards(build_export_job([campaign], "csv", max_rows_per_file=100))
+
+    assert len(shards) == 1
+    assert [segment["keywords"] for segment in shards[0]] == [campaign["keywords"]]
+    assert shards[0][0]["name_suffix"] == ""
+
+
+def test_row_limit_splits_into_uploadable_shards():
+    campaign = make_campaign(100, negative_count=5)
+    job = build_export_job([campaign], "csv", max_rows_per_file=30)
+    shards = plan_shards(job)
+
+    assert len(shards) > 1
+    keywords = []
+    for index, shard in enumerate(shards):
+        rows = shard_rows(shard)
+        assert len(rows) <= 30
+        assert_self_contained(rows)
+        # 否定词复制到每一段 Campaign
+        assert sum(row[ENTITY] == "Campaign negative keyword" for row in rows) == 5
+        keywords += [row[KEYWORD_TEXT] for row in rows if row[ENTITY] == "Keyword"]
+        suffix = shard[0]["name_suffix"]
+        assert suffix == ("" if index == 0 else f" part{index + 1:02d}")
+        assert rows[0][CAMPAIGN_NAME].endswith(suffix)
+    # 关键词不丢失、不重复、顺序不变
+    assert keywords == campaign["keywords"]
+    # 每个分片额外的结构行和否定词计入总行数
+    assert sum(len(shard_rows(shard)) for shard in shards) == count_job_rows(job) + (len(shards) - 1) * 8
+
+
+def test_match_type_rows_stay_in_one_shard():
+    campaign = make_campaign(20, negative_count=0, match_types=["Broad", "Phrase", "Exact"])
+    shards = plan_shards(build_export_job([campaign], "csv", max_rows_per_file=13))
+
+    for shard in shards:
+        rows = shard_rows(shard)
+        assert len(rows) <= 13
+        keyword_rows = [row for row in rows if row[ENTITY] == "Keyword"]
+        assert len(keyword_rows) == 3 * sum(len(segment["keywords"]) for segment in shard)
+
+
+def test_multiple_campaigns_pack_into_shards():
+    campaigns = [make_campaign(5, model=model) for model in ("iPhone 15", "iPhone 14", "iPhone 13")]
+    # 每个 Campaign 3 + 5 + 2 = 10 行：两个一组
+    shards = plan_shards(build_export_job(campaigns, "csv", max_rows_per_file=20))
+
+    assert [[segment["product_info"]["model"] for segment in shard] for shard in shards] == [
+        ["iPhone 15", "iPhone 14"],
+        ["iPhone 13"]
+    ]
+    assert all(segment["name_suffix"] == "" for shard in shards for segment in shard)
+
+
+def test_keyword_bids_are_sliced_with_keywords():
+    keyword_bids = [[round(0.1 + i / 100, 2)] for i in range(40)]
+    campaign = make_campaign(40, negative_count=0, keyword_bids=keyword_bids)
+    shards = plan_shards(build_export_job([campaign], "csv", max_rows_per_file=15))
+
+    exported = {}
+    for shard in shards:
+        for row in shard_rows(shard):
+            if row[ENTITY] == "Keyword":
+                exported[row[KEYWORD_TEXT]] = row[BID]
+    assert exported == {keyword: bids[0] for keyword, bids in zip(campaign["keywords"], keyword_bids)}
+
+
+def test_byte_limit_bounds_rendered_file_size():
+    campaign = make_campaign(300, negative_count=3)
+    max_bytes = 8000
+    job = build_export_job([campaign], "csv", max_bytes_per_file=max_bytes)
+    shards = plan_shards(job)
+
+    assert len(shards) > 1
+    for shard in shards:
+        rendered = b"".join(iter_job_chunks(build_export_job(shard, "csv")))
+        assert len(rendered) <= max_bytes
+        assert_self_contained(shard_rows(shard))